@@ -285,7 +285,7 @@ const estadosFirebase: { [key: string]: string } = {
   'Espírito Santo': 'espirito_santo',
   'Goiás': 'goias',
   'Maranhão': 'maranhao',
-  'MatoGrosso': 'mato_grosso',
+  'Mato Grosso': 'mato_grosso',
   'Mato Grosso do Sul': 'mato_grosso_do_sul',
   'Minas Gerais': 'minas_gerais',
   'Pará': 'para',
@@ -469,6 +469,13 @@ export const alterarDadosEstados = onDocumentWritten("projetos/{projetoId}", asy
   const beforeData = change.before.exists ? (change.before.data() as Projetos) : null;
   const afterData = change.after.exists ? (change.after.data() as Projetos) : null;
 
+  // Projetos gravados por uma importação em lote (scripts Python) trazem o campo 'loteImportacao'.
+  // Na escrita que define esse campo o recálculo é pulado: o script recalcula todos os estados ao final.
+  if (afterData?.loteImportacao && afterData.loteImportacao !== beforeData?.loteImportacao) {
+    console.log(`Projeto gravado pela importação em lote ${afterData.loteImportacao}. Recálculo ignorado.`);
+    return;
+  }
+
   const affectedStates = new Set<string>();
 
   if (beforeData?.estados) {
@@ -30,6 +30,8 @@ export interface Projetos {
   indicacao?: string;
   ultimoFormulario?: string;
   valorAprovado: number;
+  loteImportacao?: string;
+  atualizadoEm?: Timestamp;
 }
 
 export interface formsCadastroDados {
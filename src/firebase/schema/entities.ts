@@ -21,6 +21,8 @@ export interface Projetos {
   instituicao: string;
   estados: string[];
   municipios: string[];
+  codigosEstados?: number[];
+  codigosMunicipios?: number[];
   lei: string;
   status: "pendente" | "aprovado" | "reprovado";
   dataAprovado?: Timestamp;
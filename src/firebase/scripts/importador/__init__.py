@@ -0,0 +1,3 @@
+"""
+Código compartilhado pelos scripts de importação de planilhas para o Firestore.
+"""
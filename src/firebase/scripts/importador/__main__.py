@@ -0,0 +1,121 @@
+"""
+Linha de comando do importador de planilhas.
+
+Exemplos:
+    python -m importador planilha2024.xlsx --layout geral
+    python -m importador planilhageral.xlsx --layout anual --abas 2005-2013 2014-2025 --simulacao
+    python -m importador planilhageral.xlsx --layout anual --resume
+    python -m importador planilhageral.xlsx --layout anual --modo-escrita async --vazao-inicial 200
+    python -m importador planilhageral.xlsx --layout anual --deduplicar --simulacao --snapshot exportacao/
+    python -m importador exportacao_2024.csv --layout geral --abas Geral
+    python -m importador exportacao/ --layout anual   # pasta com 2005-2013.parquet e 2014-2025.parquet
+"""
+import argparse
+from importador.duplicados import ARQUIVO_DECISOES
+from importador.escrita import MODOS_ESCRITA, TAMANHO_MAXIMO_LOTE
+from importador.escrita_async import COMMITS_EM_ANDAMENTO
+from importador.ibge import ARQUIVO_CACHE_IBGE, TTL_CACHE_IBGE_DIAS
+from importador.layouts import LAYOUTS
+from importador.leitura import TAMANHO_BLOCO
+from importador.paralelo import workers_padrao
+from importador.pipeline import ARQUIVO_CREDENCIAL, importar
+from importador.planejamento import ARQUIVO_PLANO
+from importador.registro import ARQUIVO_ERROS, VERBOSIDADES
+from importador.retomada import ARQUIVO_CHECKPOINT, ARQUIVO_FALHAS
+from importador.vazao import VAZAO_INICIAL
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m importador",
+        description="Importa planilhas de projetos para a coleção 'projetos' do Firestore.",
+    )
+    parser.add_argument("planilha", help="planilha (.xlsx, .ods, .csv ou .parquet) ou pasta com um .csv/.parquet por aba")
+    parser.add_argument("--layout", required=True, choices=sorted(LAYOUTS),
+                        help="; ".join(f"{nome}: {layout.descricao}" for nome, layout in LAYOUTS.items()))
+    parser.add_argument("--abas", nargs="+", help="abas a importar (padrão: as abas do layout)")
+    parser.add_argument("--simulacao", "--dry-run", action="store_true",
+                        help="processa a planilha sem gravar nada no Firestore e sem acessar a rede, grava os "
+                             "documentos em --arquivo-plano e estima escritas e recálculos do trigger")
+    parser.add_argument("--arquivo-plano", default=ARQUIVO_PLANO,
+                        help="documentos que seriam gravados na simulação, em JSON Lines")
+    parser.add_argument("--modo-escrita", choices=MODOS_ESCRITA + ("async",), default="lote",
+                        help="'async' grava os lotes com o AsyncClient enquanto a planilha é processada")
+    parser.add_argument("--commits-em-andamento", type=int, default=COMMITS_EM_ANDAMENTO,
+                        help="máximo de commits simultâneos no modo 'async'")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_MAXIMO_LOTE,
+                        help=f"documentos por commit no modo 'lote' (máximo {TAMANHO_MAXIMO_LOTE})")
+    parser.add_argument("--vazao-inicial", type=int, default=VAZAO_INICIAL, metavar="ESCRITAS_POR_S",
+                        help="limite inicial de escritas/s, que cresce 50%% a cada 5 minutos sem erros (regra "
+                             "500/50/5) e cai pela metade a cada erro de sobrecarga; 0 desliga o controle")
+    parser.add_argument("--vazao-maxima", type=int, metavar="ESCRITAS_POR_S",
+                        help="teto para o crescimento do limite de escritas/s")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO,
+                        help="linhas lidas por bloco; 0 lê cada aba inteira de uma vez")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos usados na limpeza e correção dos blocos; 0 usa um por núcleo de CPU")
+    parser.add_argument("--importacao-em-lote", action="store_true",
+                        help="marca os projetos para o trigger não recalcular 'dadosEstados' a cada escrita "
+                             "e recalcula os 27 estados uma vez ao final")
+    parser.add_argument("--resume", "--retomar", dest="retomar", action="store_true",
+                        help="continua uma importação interrompida a partir do checkpoint")
+    parser.add_argument("--checkpoint", default=ARQUIVO_CHECKPOINT, help="arquivo de checkpoint da importação")
+    parser.add_argument("--arquivo-falhas", default=ARQUIVO_FALHAS,
+                        help="documentos que falharam de vez, para reenviar com 'python -m importador.retomada'")
+    parser.add_argument("--deduplicar", action="store_true",
+                        help="limpa a planilha inteira antes de gravar e pula ou mescla os projetos quase duplicados "
+                             "(entre abas e contra os projetos existentes)")
+    parser.add_argument("--snapshot", metavar="PASTA",
+                        help="lê os projetos existentes de uma exportação local (python -m importador.exportacao) "
+                             "em vez do Firestore, para --deduplicar e para a estimativa da simulação")
+    parser.add_argument("--arquivo-decisoes", default=ARQUIVO_DECISOES,
+                        help="decisões sobre as duplicatas (pular, mesclar, revisar), em JSON Lines")
+    parser.add_argument("--sem-manifesto", action="store_true",
+                        help="usa IDs aleatórios e grava todas as linhas, mesmo as inalteradas")
+    parser.add_argument("--verbosidade", choices=VERBOSIDADES, default="normal",
+                        help="detalhado: uma linha por projeto; normal: andamento e avisos agrupados; "
+                             "resumo: apenas o resumo final")
+    parser.add_argument("--log-json", help="grava todos os eventos neste arquivo, em JSON Lines")
+    parser.add_argument("--arquivo-erros", default=ARQUIVO_ERROS, help="arquivo JSON Lines com os erros da importação")
+    parser.add_argument("--credencial", default=ARQUIVO_CREDENCIAL, help="chave de serviço do Firebase")
+    parser.add_argument("--cache-ibge", default=ARQUIVO_CACHE_IBGE, help="arquivo de cache dos dados do IBGE")
+    parser.add_argument("--ttl-ibge", type=int, default=TTL_CACHE_IBGE_DIAS, metavar="DIAS",
+                        help="dias até revalidar o cache do IBGE na API; 0 revalida a cada execução")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    resumo = importar(
+        args.planilha,
+        args.layout,
+        abas=args.abas,
+        simulacao=args.simulacao,
+        modo_escrita=args.modo_escrita,
+        tamanho_lote=args.tamanho_lote,
+        tamanho_bloco=args.tamanho_bloco or None,
+        idempotente=not args.sem_manifesto,
+        credencial=args.credencial,
+        arquivo_cache_ibge=args.cache_ibge,
+        ttl_ibge_dias=args.ttl_ibge,
+        workers=args.workers or workers_padrao(),
+        commits_em_andamento=args.commits_em_andamento,
+        importacao_em_lote=args.importacao_em_lote,
+        verbosidade=args.verbosidade,
+        arquivo_eventos=args.log_json,
+        arquivo_erros=args.arquivo_erros,
+        retomar=args.retomar,
+        arquivo_checkpoint=args.checkpoint,
+        arquivo_falhas=args.arquivo_falhas,
+        deduplicar=args.deduplicar,
+        snapshot=args.snapshot,
+        arquivo_decisoes=args.arquivo_decisoes,
+        vazao_inicial=args.vazao_inicial or None,
+        vazao_maxima=args.vazao_maxima,
+        arquivo_plano=args.arquivo_plano,
+    )
+    return 1 if resumo is None or resumo["falhas"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
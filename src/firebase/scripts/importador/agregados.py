@@ -0,0 +1,311 @@
+"""
+Indicadores por estado (coleção 'dadosEstados') calculados no próprio script.
+
+O trigger `alterarDadosEstados` (functions/src/index.ts) recalcula os estados
+de um projeto a cada escrita, consultando todos os projetos do estado. Em uma
+importação em lote isso custa O(n²) leituras; aqui os 27 documentos são
+montados com uma única leitura de 'projetos' e gravados em um único lote.
+
+Exemplos:
+    python -m importador.agregados --simulacao
+    python -m importador.agregados --snapshot exportacao/
+"""
+import argparse
+from functools import partial
+from importador.conexao import conectar_firestore
+from importador.escrita import CAMPO_ATUALIZADO_EM, carimbar
+from importador.registro import registro
+
+# Nome do estado (como no IBGE) -> ID do documento em 'dadosEstados'
+ESTADOS_FIREBASE = {
+    'Acre': 'acre',
+    'Alagoas': 'alagoas',
+    'Amapá': 'amapa',
+    'Amazonas': 'amazonas',
+    'Bahia': 'bahia',
+    'Ceará': 'ceara',
+    'Distrito Federal': 'distrito_federal',
+    'Espírito Santo': 'espirito_santo',
+    'Goiás': 'goias',
+    'Maranhão': 'maranhao',
+    'Mato Grosso': 'mato_grosso',
+    'Mato Grosso do Sul': 'mato_grosso_do_sul',
+    'Minas Gerais': 'minas_gerais',
+    'Pará': 'para',
+    'Paraíba': 'paraiba',
+    'Paraná': 'parana',
+    'Pernambuco': 'pernambuco',
+    'Piauí': 'piaui',
+    'Rio de Janeiro': 'rio_de_janeiro',
+    'Rio Grande do Norte': 'rio_grande_do_norte',
+    'Rio Grande do Sul': 'rio_grande_do_sul',
+    'Rondônia': 'rondonia',
+    'Roraima': 'roraima',
+    'Santa Catarina': 'santa_catarina',
+    'São Paulo': 'sao_paulo',
+    'Sergipe': 'sergipe',
+    'Tocantins': 'tocantins',
+}
+
+# Campo gravado nos projetos de uma importação em lote; o trigger não recalcula
+# os estados na escrita que o define, pois o script faz isso ao final
+CAMPO_LOTE_IMPORTACAO = "loteImportacao"
+
+QTD_ODS = 17
+# Projetos lidos por página ao percorrer a coleção
+TAMANHO_PAGINA = 500
+# Formulários lidos por chamada de get_all
+TAMANHO_LEITURA_FORMULARIOS = 300
+
+
+class IndicadoresEstado:
+    """Acumula os indicadores de um estado, na mesma regra de recalculateStateIndicators."""
+
+    def __init__(self, nome_estado):
+        self.nome_estado = nome_estado
+        self.id_projetos = []
+        self.valor_total = 0
+        self.beneficiarios_diretos = 0
+        self.beneficiarios_indiretos = 0
+        self.instituicoes = set()
+        self.municipios = set()
+        self.ods = [0] * QTD_ODS
+        self.segmentos = {}
+        self.leis = {}
+        self.maior_aporte = {'nome': '', 'valorAportado': 0}
+
+    def adicionar(self, doc_id, projeto, formulario=None):
+        valor = numero(projeto.get('valorAprovado'))
+        self.id_projetos.append(doc_id)
+        self.valor_total += valor
+        self.instituicoes.add(projeto.get('instituicao'))
+        self.municipios.update(projeto.get('municipios') or [])
+        if valor > self.maior_aporte['valorAportado']:
+            self.maior_aporte = {'nome': projeto.get('nome'), 'valorAportado': valor}
+        lei = projeto.get('lei')
+        self.leis[lei] = self.leis.get(lei, 0) + 1
+
+        if formulario:
+            self.beneficiarios_diretos += numero(formulario.get('beneficiariosDiretos'))
+            self.beneficiarios_indiretos += numero(formulario.get('beneficiariosIndiretos'))
+            for ods in formulario.get('ods') or []:
+                if isinstance(ods, int) and 0 <= ods < QTD_ODS:
+                    self.ods[ods] += 1
+            segmento = formulario.get('segmento')
+            self.segmentos[segmento] = self.segmentos.get(segmento, 0) + 1
+
+    def documento(self):
+        return {
+            'nomeEstado': self.nome_estado,
+            'qtdProjetos': len(self.id_projetos),
+            'qtdMunicipios': len(self.municipios),
+            'idProjects': list(self.id_projetos),
+            'municipios': sorted(self.municipios),
+            'valorTotal': self.valor_total,
+            'maiorAporte': dict(self.maior_aporte),
+            'beneficiariosDireto': self.beneficiarios_diretos,
+            'beneficiariosIndireto': self.beneficiarios_indiretos,
+            'qtdOrganizacoes': len(self.instituicoes),
+            'projetosODS': list(self.ods),
+            'segmento': [{'nome': nome, 'qtdProjetos': qtd} for nome, qtd in self.segmentos.items()],
+            'lei': [{'nome': nome, 'qtdProjetos': qtd} for nome, qtd in self.leis.items()],
+        }
+
+
+class AgregadorEstados:
+    """
+    Calcula os documentos de 'dadosEstados' em uma única passada pelos projetos.
+
+    Como o trigger, considera apenas projetos ativos e aprovados; estados sem
+    projetos ficam zerados. Estados fora de ESTADOS_FIREBASE são ignorados.
+    """
+
+    def __init__(self):
+        self.estados = {nome: IndicadoresEstado(nome) for nome in ESTADOS_FIREBASE}
+        self.projetos_considerados = 0
+
+    @staticmethod
+    def conta(projeto):
+        return projeto.get('ativo') is True and projeto.get('status') == "aprovado"
+
+    def adicionar(self, doc_id, projeto, formulario=None):
+        if not self.conta(projeto):
+            return
+        self.projetos_considerados += 1
+        # Um projeto com o mesmo estado repetido conta uma vez, como no array-contains
+        for nome_estado in dict.fromkeys(projeto.get('estados') or []):
+            if nome_estado in self.estados:
+                self.estados[nome_estado].adicionar(doc_id, projeto, formulario)
+
+    def documentos(self):
+        """Retorna {id do documento em 'dadosEstados': dados} para os 27 estados."""
+        return {ESTADOS_FIREBASE[nome]: indicadores.documento() for nome, indicadores in self.estados.items()}
+
+
+def numero(valor):
+    """Equivalente ao `Number(valor) || 0` do trigger."""
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (int, float)):
+        return valor if valor == valor else 0  # NaN vira 0
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return 0
+
+
+def ler_formularios(db, ids_formularios):
+    """
+    Busca os formulários dos projetos como o getFormData do trigger: primeiro em
+    'forms-acompanhamento', depois em 'forms-cadastro'. As leituras são feitas em
+    lotes com get_all, em vez de duas consultas por projeto.
+    """
+    formularios = {}
+    faltando = list(dict.fromkeys(i for i in ids_formularios if i))
+    for colecao in ("forms-acompanhamento", "forms-cadastro"):
+        for inicio in range(0, len(faltando), TAMANHO_LEITURA_FORMULARIOS):
+            refs = [db.collection(colecao).document(i) for i in faltando[inicio:inicio + TAMANHO_LEITURA_FORMULARIOS]]
+            for snapshot in db.get_all(refs):
+                if snapshot.exists:
+                    formularios[snapshot.id] = snapshot.to_dict()
+        faltando = [i for i in faltando if i not in formularios]
+    return formularios
+
+
+def ler_paginas(db, colecao, tamanho_pagina=TAMANHO_PAGINA, campos=None, atualizados_apos=None):
+    """
+    Percorre uma coleção em páginas (listas de snapshots) ordenadas pelo ID do
+    documento; cada página continua a partir do último documento lido (cursor),
+    sem manter uma única consulta aberta durante toda a leitura. Com `campos`,
+    só esses campos são lidos (["__name__"] lê apenas os IDs). Com
+    `atualizados_apos` (datetime), só os documentos gravados pelo importador
+    depois desse instante, ordenados por CAMPO_ATUALIZADO_EM.
+    """
+    consulta = db.collection(colecao)
+    if campos is not None:
+        consulta = consulta.select(campos)
+    if atualizados_apos is not None:
+        consulta = consulta.where(CAMPO_ATUALIZADO_EM, ">", atualizados_apos).order_by(CAMPO_ATUALIZADO_EM)
+    consulta = consulta.order_by("__name__").limit(tamanho_pagina)
+    ultimo = None
+    while True:
+        pagina = list((consulta.start_after(ultimo) if ultimo is not None else consulta).stream())
+        if pagina:
+            yield pagina
+        if len(pagina) < tamanho_pagina:
+            return
+        ultimo = pagina[-1]
+
+
+def ler_colecao(db, colecao, tamanho_pagina=TAMANHO_PAGINA, campos=None):
+    """Percorre uma coleção documento a documento, lendo-a em páginas (ver ler_paginas)."""
+    for pagina in ler_paginas(db, colecao, tamanho_pagina, campos):
+        yield from pagina
+
+
+def agregar_dados_estados(projetos, buscar_formularios):
+    """
+    Monta os documentos de 'dadosEstados' a partir de pares (id, projeto).
+    `buscar_formularios(ids)` retorna {id: formulário} dos projetos considerados.
+    """
+    lidos = 0
+    considerados = []
+    for doc_id, projeto in projetos:
+        lidos += 1
+        if AgregadorEstados.conta(projeto):
+            considerados.append((doc_id, projeto))
+    formularios = buscar_formularios([projeto.get('ultimoFormulario') for _, projeto in considerados])
+
+    agregador = AgregadorEstados()
+    for doc_id, projeto in considerados:
+        agregador.adicionar(doc_id, projeto, formularios.get(projeto.get('ultimoFormulario')))
+    registro.info("agregados_calculados", f"{lidos} projetos lidos, {agregador.projetos_considerados} ativos e aprovados, "
+                  f"{len(formularios)} formulários encontrados.", projetos=lidos,
+                  considerados=agregador.projetos_considerados, formularios=len(formularios))
+    return agregador.documentos()
+
+
+def calcular_dados_estados(db, tamanho_pagina=TAMANHO_PAGINA):
+    """Lê a coleção 'projetos' uma vez e retorna os documentos de 'dadosEstados'."""
+    projetos = ((snapshot.id, snapshot.to_dict()) for snapshot in ler_colecao(db, "projetos", tamanho_pagina))
+    return agregar_dados_estados(projetos, partial(ler_formularios, db))
+
+
+def calcular_dados_estados_local(pasta):
+    """
+    Calcula 'dadosEstados' a partir de uma exportação local (importador.exportacao),
+    sem acessar o Firestore. Os formulários vêm das coleções 'forms-acompanhamento'
+    e 'forms-cadastro', se também tiverem sido exportadas.
+    """
+    # Importado aqui porque a exportação usa a leitura paginada deste módulo
+    from importador.exportacao import exportacao_existe, ler_exportacao
+
+    formularios = {}
+    # Como no getFormData, o formulário de acompanhamento prevalece sobre o de cadastro
+    for colecao in ("forms-cadastro", "forms-acompanhamento"):
+        if exportacao_existe(pasta, colecao):
+            formularios.update(ler_exportacao(pasta, colecao))
+        else:
+            registro.aviso("formularios_nao_exportados", f"A coleção '{colecao}' não está em '{pasta}'; "
+                           f"os indicadores que dependem dos formulários podem ficar zerados.", colecao=colecao)
+
+    def buscar_formularios(ids):
+        return {i: formularios[i] for i in ids if i in formularios}
+
+    return agregar_dados_estados(ler_exportacao(pasta, "projetos"), buscar_formularios)
+
+
+def gravar_dados_estados(db, documentos):
+    """Grava todos os documentos de 'dadosEstados' em um único commit."""
+    batch = db.batch()
+    for doc_id, dados in documentos.items():
+        batch.set(db.collection("dadosEstados").document(doc_id), carimbar(dados))
+    batch.commit()
+    registro.info("dados_estados_gravados", f"{len(documentos)} documentos de 'dadosEstados' atualizados em um único lote.",
+                  documentos=len(documentos))
+
+
+def imprimir_dados_estados(documentos):
+    for dados in documentos.values():
+        if dados['qtdProjetos']:
+            registro.resumo("dados_estado", f"  - {dados['nomeEstado']}: {dados['qtdProjetos']} projetos, valor total "
+                            f"{dados['valorTotal']}", estado=dados['nomeEstado'], projetos=dados['qtdProjetos'],
+                            valor_total=dados['valorTotal'])
+
+
+def atualizar_dados_estados(db, simulacao=False):
+    documentos = calcular_dados_estados(db)
+    if simulacao:
+        imprimir_dados_estados(documentos)
+        registro.resumo("dados_estados_simulacao", "Simulação: nada foi gravado em 'dadosEstados'.")
+    else:
+        gravar_dados_estados(db, documentos)
+    return documentos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.agregados",
+        description="Recalcula os 27 documentos de 'dadosEstados' a partir da coleção 'projetos'.",
+    )
+    parser.add_argument("--simulacao", "--dry-run", action="store_true", help="calcula sem gravar")
+    parser.add_argument("--snapshot", metavar="PASTA",
+                        help="calcula a partir de uma exportação local (python -m importador.exportacao), "
+                             "sem acessar o Firestore e sem gravar")
+    parser.add_argument("--credencial", default="serviceAccountKey.json", help="chave de serviço do Firebase")
+    parser.add_argument("--log-json", help="grava todos os eventos neste arquivo, em JSON Lines")
+    args = parser.parse_args(argv)
+
+    registro.configurar(arquivo_eventos=args.log_json)
+    try:
+        if args.snapshot:
+            imprimir_dados_estados(calcular_dados_estados_local(args.snapshot))
+        else:
+            atualizar_dados_estados(conectar_firestore(args.credencial), simulacao=args.simulacao)
+    finally:
+        registro.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,405 @@
+"""
+Benchmark do importador com planilhas sintéticas.
+
+Gera planilhas no formato das abas "Geral" e "2005-2013"/"2014-2025" (valores
+em reais em vários formatos, células com mais de um estado, municípios com
+erros de digitação e leis escritas de formas variadas) e mede cada etapa do
+pipeline: leitura, conversão de valores, mapeamento de leis, correção de
+estados/municípios, limpeza completa e escrita. A escrita usa um Firestore em
+memória ou, com --emulador, o emulador do Firestore.
+
+Cada etapa roda uma vez para aquecer (imports, caches do pandas) e depois
+`--repeticoes` vezes; são informados a mediana do tempo, a vazão (linhas/s)
+correspondente e o pico de memória. Os resultados podem ser salvos como base
+e comparados em execuções futuras, com o mesmo layout e a mesma semente.
+
+Exemplos:
+    python -m importador.benchmark --linhas 1000 10000
+    python -m importador.benchmark --linhas 1000 10000 100000 --salvar-base base_benchmark.json
+    python -m importador.benchmark --comparar base_benchmark.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+import openpyxl
+import pandas as pd
+from importador.escrita import EscritorFirestore
+from importador.geografia import Gazetteer
+from importador.ibge import ARQUIVO_CACHE_IBGE, carregar_dados_ibge
+from importador.layouts import obter_layout
+from importador.leitura import ler_planilha
+from importador.limpeza import (
+    converter_valores, corrigir_estados_por_nome, corrigir_estados_por_sigla, corrigir_municipios, separar_valores,
+)
+from importador.manifesto import GeradorIds
+from importador.registro import registro
+
+TAMANHOS_PADRAO = [1000, 10000]
+# Execuções medidas de cada etapa, depois do aquecimento; o tempo informado é a mediana
+REPETICOES_PADRAO = 5
+VERSAO_BASE = 2
+# Queda de vazão, em relação à base, a partir da qual a etapa é marcada como regressão
+TOLERANCIA_PADRAO = 0.2
+
+# Grafias encontradas nas planilhas reais, inclusive uma sem mapeamento
+LEIS_SINTETICAS = [
+    "Lei Rouanet", "LEI DE INCENTIVO À CULTURA", "Lei de Incentivo ao Esporte", "LIE", "FIA",
+    "Fundo da Infância e Adolescência", "Fundo do Idoso", "ICMS RJ", "ICMS - RJ Esporte", "ICMS RJ Cultura",
+    "ICMS MG", "ICMS - MG Esporte", "ICMS MG Cultura", "PROAC", "Pronas/PCD", "PRONON", "PIE",
+    "Lei Municipal de Incentivo",
+]
+PROPONENTES = ["Instituto", "Associação", "Fundação", "Centro Cultural", "Clube", "Projeto Social"]
+
+
+# --- Planilhas sintéticas ---
+
+def valor_brl(rng):
+    """Um valor aportado em um dos formatos que aparecem nas planilhas."""
+    valor = rng.randint(5_000, 5_000_000) + rng.choice([0, 0.5, 0.25, 0.99])
+    formato = rng.random()
+    if formato < 0.4:
+        return valor
+    if formato < 0.7:
+        inteiro, centavos = f"{valor:.2f}".split(".")
+        return f"R$ {int(inteiro):,}".replace(",", ".") + f",{centavos}"
+    if formato < 0.9:
+        return f"{int(valor):,}".replace(",", ".")
+    return f"R$ {int(valor)}"
+
+
+def com_erro(nome, rng):
+    """Introduz um erro de digitação comum: letra faltando, letras trocadas ou sem acentos."""
+    tipo = rng.random()
+    if tipo < 0.35 and len(nome) > 4:
+        i = rng.randrange(1, len(nome) - 1)
+        return nome[:i] + nome[i + 1:]
+    if tipo < 0.7 and len(nome) > 4:
+        i = rng.randrange(1, len(nome) - 2)
+        return nome[:i] + nome[i + 1] + nome[i] + nome[i + 2:]
+    sem_acentos = unicodedata.normalize('NFD', nome).encode('ascii', 'ignore').decode('ascii')
+    return sem_acentos.upper() if tipo < 0.85 else sem_acentos.lower()
+
+
+def gerar_linhas(layout, quantidade, gazetteer, semente=0, taxa_erros=0.2):
+    """Gera `quantidade` linhas (dicts com os cabeçalhos da planilha) para o layout."""
+    rng = random.Random(semente)
+    # Municípios com hífen seriam quebrados pelos separadores, como nas planilhas reais
+    municipios = {
+        estado: [m for m in candidatos.originais if "-" not in m]
+        for estado, candidatos in gazetteer.municipios_por_estado.items()
+    }
+    estados = [estado for estado, nomes in municipios.items() if nomes]
+    por_sigla = layout.estados_por_sigla
+
+    linhas = []
+    for i in range(quantidade):
+        estados_linha = rng.sample(estados, k=min(len(estados), rng.choice([1, 1, 1, 2, 3])))
+        municipios_linha = []
+        for estado in estados_linha:
+            for nome in rng.sample(municipios[estado], k=min(len(municipios[estado]), rng.choice([1, 1, 2]))):
+                municipios_linha.append(com_erro(nome, rng) if rng.random() < taxa_erros else nome)
+        if por_sigla:
+            celula_estados = "/".join(gazetteer.estado_para_sigla[e] for e in estados_linha)
+        else:
+            celula_estados = ", ".join(com_erro(e, rng) if rng.random() < taxa_erros / 4 else e for e in estados_linha)
+
+        linha = {
+            "Projeto": f"Projeto {i} {rng.choice(['Cultura', 'Esporte', 'Saúde', 'Educação'])}",
+            "Proponente": f"{rng.choice(PROPONENTES)} {rng.randrange(quantidade // 3 + 1)}",
+            "Indicação": rng.choice(["CSN", "Fundação CSN", None]),
+            "Lei": rng.choice(LEIS_SINTETICAS),
+            "Aportado": valor_brl(rng),
+            "Estado": celula_estados,
+            "Município": ", ".join(municipios_linha),
+        }
+        if por_sigla:
+            linha["Ano"] = rng.randint(2005, 2025)
+        linhas.append(linha)
+    return linhas
+
+
+def gerar_planilha(caminho, layout, quantidade, gazetteer, semente=0):
+    """Grava uma planilha sintética .xlsx; no layout anual, as linhas são divididas pelas abas de período."""
+    linhas = gerar_linhas(layout, quantidade, gazetteer, semente)
+    planilha = openpyxl.Workbook(write_only=True)
+    if len(layout.abas) == 1:
+        grupos = {layout.abas[0]: linhas}
+    else:
+        grupos = {aba: [] for aba in layout.abas}
+        for linha in linhas:
+            grupos[layout.abas[0] if linha["Ano"] <= 2013 else layout.abas[-1]].append(linha)
+
+    for aba, linhas_aba in grupos.items():
+        folha = planilha.create_sheet(aba)
+        cabecalho = list(linhas[0]) if linhas else ["Projeto"]
+        folha.append(cabecalho)
+        for linha in linhas_aba:
+            folha.append([linha[coluna] for coluna in cabecalho])
+    planilha.save(caminho)
+    return caminho
+
+
+# --- Firestore em memória ---
+
+class _DocumentoEmMemoria:
+    def __init__(self, colecao, doc_id):
+        self.colecao = colecao
+        self.id = doc_id
+
+
+class _ColecaoEmMemoria:
+    def __init__(self, banco, nome):
+        self.banco = banco
+        self.nome = nome
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.banco.contador += 1
+            doc_id = f"auto{self.banco.contador:015d}"
+        return _DocumentoEmMemoria(self.nome, doc_id)
+
+
+class _LoteEmMemoria:
+    def __init__(self, banco):
+        self.banco = banco
+        self.operacoes = []
+
+    def set(self, doc_ref, dados, merge=False):
+        self.operacoes.append((doc_ref, dados))
+
+    create = set
+
+    def commit(self):
+        for doc_ref, dados in self.operacoes:
+            self.banco.colecoes.setdefault(doc_ref.colecao, {})[doc_ref.id] = dict(dados)
+        self.banco.commits += 1
+        return []
+
+
+class FirestoreEmMemoria:
+    """Destino de escrita em memória, com a parte da API usada pelo EscritorFirestore no modo "lote"."""
+
+    def __init__(self):
+        self.colecoes = {}
+        self.commits = 0
+        self.contador = 0
+
+    def collection(self, nome):
+        return _ColecaoEmMemoria(self, nome)
+
+    def batch(self):
+        return _LoteEmMemoria(self)
+
+
+# --- Medição ---
+
+def medir(funcao, com_memoria=True, repeticoes=REPETICOES_PADRAO):
+    """
+    Executa `funcao` uma vez para aquecer e mais `repeticoes` vezes, e retorna
+    (resultado, mediana dos segundos, pico de memória em MB). O pico é medido
+    em uma execução à parte, com tracemalloc, para não distorcer o tempo.
+    """
+    resultado = funcao()
+    duracoes = []
+    for _ in range(max(1, repeticoes)):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        duracoes.append(time.perf_counter() - inicio)
+    duracao = statistics.median(duracoes)
+
+    pico = None
+    if com_memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return resultado, duracao, pico
+
+
+def executar_etapas(caminho, layout, dados_geo, conectar=FirestoreEmMemoria, com_memoria=True,
+                    repeticoes=REPETICOES_PADRAO):
+    """Mede cada etapa do pipeline sobre a planilha e retorna {etapa: métricas}."""
+    def ler():
+        return pd.concat([df for _, df in ler_planilha(caminho, layout.abas, colunas=layout.colunas)], ignore_index=True)
+
+    df, duracao, pico = medir(ler, com_memoria, repeticoes)
+    df.columns = [str(col).lower().strip() for col in df.columns]
+    total = len(df)
+    metricas = {"leitura": (duracao, pico)}
+
+    _, duracao, pico = medir(lambda: converter_valores(df['aportado']), com_memoria, repeticoes)
+    metricas["converter_valores"] = (duracao, pico)
+
+    _, duracao, pico = medir(lambda: layout.leis.mapear_coluna(df['lei']), com_memoria, repeticoes)
+    metricas["mapear_lei"] = (duracao, pico)
+
+    def corrigir():
+        # Gazetteer novo e sem cache de correções: cada execução faz o trabalho fuzzy inteiro
+        gazetteer = Gazetteer(dados_geo)
+        estados = separar_valores(df['estado'])
+        if layout.estados_por_sigla:
+            estados = corrigir_estados_por_sigla(estados, gazetteer)
+        else:
+            estados = corrigir_estados_por_nome(estados, gazetteer)
+        listas = estados.groupby(level=0).agg(lambda valores: sorted(set(valores))).reindex(df.index)
+        listas = listas.apply(lambda v: v if isinstance(v, list) else [])
+        return corrigir_municipios(separar_valores(df['município']), listas, gazetteer)
+
+    _, duracao, pico = medir(corrigir, com_memoria, repeticoes)
+    metricas["corrigir_nome"] = (duracao, pico)
+
+    projetos, duracao, pico = medir(lambda: layout.limpar(df, Gazetteer(dados_geo)), com_memoria, repeticoes)
+    metricas["limpeza"] = (duracao, pico)
+    registros = projetos.to_dict('records')
+
+    def escrever():
+        escritor = EscritorFirestore(conectar(), colecao="benchmark")
+        gerador = GeradorIds()
+        for dados in registros:
+            escritor.adicionar(dados, dados['nome'], gerador.gerar("benchmark", dados))
+        escritor.finalizar()
+
+    _, duracao, pico = medir(escrever, com_memoria, repeticoes)
+    metricas["escrita"] = (duracao, pico)
+
+    return {
+        etapa: {
+            "linhas": total,
+            "segundos": duracao,
+            "linhas_por_segundo": total / duracao if duracao > 0 else 0.0,
+            "pico_memoria_mb": pico,
+        }
+        for etapa, (duracao, pico) in metricas.items()
+    }
+
+
+def executar_benchmark(tamanhos, layout="anual", arquivo_cache_ibge=ARQUIVO_CACHE_IBGE, conectar=FirestoreEmMemoria,
+                       com_memoria=True, pasta_planilhas=None, semente=0, repeticoes=REPETICOES_PADRAO):
+    """Gera uma planilha por tamanho, mede as etapas e retorna {tamanho: {etapa: métricas}}."""
+    layout = obter_layout(layout) if isinstance(layout, str) else layout
+    # Só o cache local: o benchmark nunca consulta a API do IBGE
+    dados_geo = carregar_dados_ibge(arquivo_cache_ibge, ttl_dias=None)
+    gazetteer = Gazetteer(dados_geo)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = pasta_planilhas or temporaria
+        for tamanho in tamanhos:
+            caminho = os.path.join(pasta, f"benchmark_{layout.nome}_{tamanho}.xlsx")
+            if not os.path.exists(caminho):
+                print(f"Gerando planilha sintética com {tamanho} linhas ({caminho})...")
+                gerar_planilha(caminho, layout, tamanho, gazetteer, semente)
+            print(f"Medindo {tamanho} linhas...")
+            resultados[str(tamanho)] = executar_etapas(caminho, layout, dados_geo, conectar, com_memoria, repeticoes)
+    return resultados
+
+
+# --- Base de comparação ---
+
+def salvar_base(resultados, caminho, layout, semente=0, repeticoes=REPETICOES_PADRAO):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({"versao": VERSAO_BASE, "layout": layout, "semente": semente, "repeticoes": repeticoes,
+                   "resultados": resultados}, f, indent=2)
+    print(f"Base salva em '{caminho}'.")
+
+
+def ler_base(caminho, layout, semente=0):
+    """
+    Lê os resultados de uma base salva. Levanta ValueError se ela for de outra
+    versão ou tiver sido medida com outro layout ou outra semente: as planilhas
+    seriam diferentes e a comparação não faria sentido.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    if base.get("versao") != VERSAO_BASE:
+        raise ValueError(f"A base '{caminho}' está em uma versão desconhecida; salve uma nova com --salvar-base.")
+    if base.get("layout") != layout:
+        raise ValueError(f"A base '{caminho}' foi medida com o layout '{base.get('layout')}', e não '{layout}'.")
+    if base.get("semente") != semente:
+        raise ValueError(f"A base '{caminho}' foi medida com a semente {base.get('semente')}, e não {semente}.")
+    return base["resultados"]
+
+
+def imprimir_resultados(resultados, base=None, tolerancia=TOLERANCIA_PADRAO):
+    """Imprime a tabela de resultados e retorna as etapas que regrediram em relação à base."""
+    regressoes = []
+    print(f"\n{'Linhas':>8} {'Etapa':<18} {'Tempo (s)':>10} {'Linhas/s':>12} {'Pico (MB)':>10} {'vs. base':>10}")
+    for tamanho, etapas in resultados.items():
+        for etapa, m in etapas.items():
+            pico = f"{m['pico_memoria_mb']:.1f}" if m['pico_memoria_mb'] is not None else "-"
+            comparacao = ""
+            anterior = (base or {}).get(tamanho, {}).get(etapa)
+            if anterior and anterior["linhas"] != m["linhas"]:
+                # Outra planilha (ex.: gerada por outra versão do benchmark): não há o que comparar
+                comparacao = "linhas ≠"
+            elif anterior and anterior["linhas_por_segundo"]:
+                variacao = m["linhas_por_segundo"] / anterior["linhas_por_segundo"] - 1
+                comparacao = f"{variacao:+.0%}"
+                if variacao < -tolerancia:
+                    comparacao += " REGRESSÃO"
+                    regressoes.append((tamanho, etapa, variacao))
+            print(f"{tamanho:>8} {etapa:<18} {m['segundos']:>10.3f} {m['linhas_por_segundo']:>12.1f} "
+                  f"{pico:>10} {comparacao:>10}")
+    if base is not None:
+        print(f"\n{len(regressoes)} etapa(s) com queda de vazão acima de {tolerancia:.0%}.")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.benchmark",
+        description="Mede as etapas do importador com planilhas sintéticas.",
+    )
+    parser.add_argument("--linhas", type=int, nargs="+", default=TAMANHOS_PADRAO,
+                        help="tamanhos das planilhas (ex.: 1000 10000 100000)")
+    parser.add_argument("--layout", default="anual", choices=["anual", "geral"])
+    parser.add_argument("--cache-ibge", default=ARQUIVO_CACHE_IBGE, help="arquivo de cache dos dados do IBGE")
+    parser.add_argument("--emulador", action="store_true",
+                        help="grava no emulador do Firestore (FIRESTORE_EMULATOR_HOST) em vez de na memória")
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória (mais rápido)")
+    parser.add_argument("--planilhas", help="pasta onde guardar e reaproveitar as planilhas geradas")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO,
+                        help="execuções medidas de cada etapa, após uma de aquecimento (vale a mediana)")
+    parser.add_argument("--salvar-base", help="salva os resultados neste arquivo JSON")
+    parser.add_argument("--comparar", help="compara os resultados com uma base salva")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="queda de vazão tolerada em relação à base (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    conectar = FirestoreEmMemoria
+    if args.emulador:
+        if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+            parser.error("--emulador exige a variável FIRESTORE_EMULATOR_HOST.")
+        from importador.conexao import conectar_firestore
+        conectar = conectar_firestore
+
+    base = None
+    if args.comparar:
+        try:
+            base = ler_base(args.comparar, args.layout, args.semente)
+        except ValueError as e:
+            parser.error(str(e))
+
+    registro.configurar("resumo")
+    resultados = executar_benchmark(
+        args.linhas, args.layout, args.cache_ibge, conectar,
+        com_memoria=not args.sem_memoria, pasta_planilhas=args.planilhas, semente=args.semente,
+        repeticoes=args.repeticoes,
+    )
+    regressoes = imprimir_resultados(resultados, base, args.tolerancia)
+    if args.salvar_base:
+        salvar_base(resultados, args.salvar_base, args.layout, args.semente, args.repeticoes)
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+import json
+import os
+from collections import OrderedDict
+from importador.registro import registro
+
+# Arquivo salvo ao lado do cache do IBGE
+ARQUIVO_CACHE_CORRECOES = 'cache_correcoes.json'
+CAPACIDADE_PADRAO = 50000
+
+
+class CacheCorrecoes:
+    """
+    Memoização das correspondências fuzzy, com descarte LRU em memória e
+    persistência em disco entre importações.
+
+    A chave é (nome normalizado, identificador do conjunto de candidatos) e o
+    valor é o melhor candidato com o seu score. O limiar não entra na chave
+    porque o valor guardado não depende dele: a decisão de aceitar ou não a
+    correção é tomada depois, em corrigir_nome.
+
+    O cache é descartado quando a versão do gazetteer (dados do IBGE) muda.
+    """
+
+    def __init__(self, caminho=ARQUIVO_CACHE_CORRECOES, capacidade=CAPACIDADE_PADRAO):
+        self.caminho = caminho
+        self.capacidade = capacidade
+        self.versao = None
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._versao_arquivo = None
+        self._novos = None  # entradas criadas desde a última exportação, quando capturadas (workers)
+
+        if caminho and os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+            self._versao_arquivo = conteudo.get('versao')
+            for texto, conjunto, original, chave, score in conteudo.get('itens', []):
+                self._itens[(texto, conjunto)] = (original, chave, score)
+
+    def validar(self, versao):
+        """Associa o cache a uma versão do gazetteer, descartando entradas de outra versão."""
+        self.versao = versao
+        if self._itens and self._versao_arquivo != versao:
+            registro.info("cache_correcoes_invalidado", "Dados do IBGE mudaram desde a última importação. O cache de correções será recriado.")
+            self._itens.clear()
+        self._versao_arquivo = versao
+
+    def obter(self, chave):
+        valor = self._itens.get(chave)
+        if valor is None:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        self._itens.move_to_end(chave)
+        return valor
+
+    def guardar(self, chave, valor):
+        self._itens[chave] = valor
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+        if self._novos is not None:
+            self._novos[chave] = valor
+
+    def iniciar_captura(self):
+        """Passa a guardar as entradas novas e zera acertos e falhas (usado nos processos workers)."""
+        self.acertos = 0
+        self.falhas = 0
+        self._novos = {}
+
+    def exportar_captura(self):
+        """Entradas criadas, acertos e falhas desde a última exportação, para o processo principal."""
+        captura = {"itens": list(self._novos.items()), "acertos": self.acertos, "falhas": self.falhas}
+        self.iniciar_captura()
+        return captura
+
+    def incorporar(self, captura):
+        """Acrescenta as entradas e soma os acertos e falhas capturados em um worker."""
+        for chave, valor in captura["itens"]:
+            self.guardar(chave, valor)
+        self.acertos += captura["acertos"]
+        self.falhas += captura["falhas"]
+
+    def salvar(self):
+        if not self.caminho:
+            return
+        itens = [[texto, conjunto, *valor] for (texto, conjunto), valor in self._itens.items()]
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'versao': self.versao, 'itens': itens}, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+
+    def resumo(self):
+        consultas = self.acertos + self.falhas
+        taxa = 100 * self.acertos / consultas if consultas else 0.0
+        return f"Cache de correções: {self.acertos} acertos, {self.falhas} falhas ({taxa:.1f}% de acerto), {len(self._itens)} entradas."
@@ -0,0 +1,103 @@
+"""
+Acrescenta os códigos do IBGE ('codigosEstados' e 'codigosMunicipios') aos
+projetos já gravados, a partir dos nomes em 'estados' e 'municipios'.
+
+A coleção é lida em páginas, só com esses quatro campos, e apenas os projetos
+cujos códigos faltam ou mudaram são gravados, em lotes de até 500 escritas
+com merge (os demais campos não são tocados). Os projetos recebem
+'loteImportacao', para que o trigger não recalcule 'dadosEstados' a cada
+escrita: os códigos não mudam os indicadores. Rodar de novo só grava o que
+ainda falta, inclusive os projetos de lotes que falharam.
+
+Exemplos:
+    python -m importador.codigos --simulacao
+    python -m importador.codigos --tamanho-lote 200
+"""
+import argparse
+import datetime
+from importador.agregados import CAMPO_LOTE_IMPORTACAO, TAMANHO_PAGINA, ler_paginas
+from importador.conexao import conectar_firestore
+from importador.escrita import TAMANHO_MAXIMO_LOTE, EscritorFirestore, EscritorSimulado
+from importador.ibge import ARQUIVO_CACHE_IBGE, TTL_CACHE_IBGE_DIAS, obter_gazetteer
+from importador.registro import registro
+from importador.vazao import ControladorVazao
+
+CAMPOS_LIDOS = ['estados', 'municipios', 'codigosEstados', 'codigosMunicipios']
+CONTADOR_SEM_CODIGO = "Nomes sem código do IBGE (campo: nome)"
+
+
+def _sem_codigo(dados, gazetteer):
+    """Nomes do projeto que não têm código do IBGE, como (campo, nome)."""
+    estados = [gazetteer.estado_oficial(estado) for estado in dados.get('estados') or []]
+    faltando = [('estados', estado) for estado in estados if gazetteer.codigo_estado(estado) is None]
+    faltando += [('municipios', municipio) for municipio in dados.get('municipios') or []
+                 if gazetteer.codigo_municipio(municipio, estados) is None]
+    return [(campo, nome) for campo, nome in faltando if nome and nome != "Indefinido"]
+
+
+def codigos_projeto(dados, gazetteer):
+    """Campos com os códigos do IBGE de um projeto (dicionário do Firestore)."""
+    codigos_estados, codigos_municipios = gazetteer.codigos(dados.get('estados') or [], dados.get('municipios') or [])
+    return {'codigosEstados': codigos_estados, 'codigosMunicipios': codigos_municipios}
+
+
+def preencher_codigos(db, gazetteer, simulacao=False, tamanho_lote=TAMANHO_MAXIMO_LOTE, tamanho_pagina=TAMANHO_PAGINA):
+    """
+    Percorre 'projetos' e grava os códigos do IBGE nos documentos em que eles
+    faltam ou diferem dos calculados. Retorna o resumo do escritor, com
+    'inalterados' = projetos que já tinham os códigos certos.
+    """
+    if simulacao:
+        escritor = EscritorSimulado(tamanho_lote=tamanho_lote)
+    else:
+        lote = datetime.datetime.now().isoformat(timespec='seconds')
+        escritor = EscritorFirestore(db, tamanho_lote=tamanho_lote, campos_fixos={CAMPO_LOTE_IMPORTACAO: lote},
+                                     controlador=ControladorVazao())
+
+    inalterados = 0
+    for pagina in registro.iterar("leitura_projetos", ler_paginas(db, "projetos", tamanho_pagina, CAMPOS_LIDOS)):
+        for snapshot in pagina:
+            dados = snapshot.to_dict() or {}
+            for campo, nome in _sem_codigo(dados, gazetteer):
+                registro.contar(CONTADOR_SEM_CODIGO, f"{campo}: {nome}")
+            codigos = codigos_projeto(dados, gazetteer)
+            if all(dados.get(campo) == valor for campo, valor in codigos.items()):
+                inalterados += 1
+                continue
+            escritor.adicionar(codigos, rotulo=snapshot.id, doc_id=snapshot.id)
+
+    escritor.inalterados += inalterados
+    return escritor.finalizar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.codigos",
+        description="Acrescenta 'codigosEstados' e 'codigosMunicipios' (códigos do IBGE) aos projetos já gravados.",
+    )
+    parser.add_argument("--simulacao", "--dry-run", action="store_true",
+                        help="conta os projetos que seriam atualizados, sem gravar")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_MAXIMO_LOTE,
+                        help=f"documentos por commit (máximo {TAMANHO_MAXIMO_LOTE})")
+    parser.add_argument("--tamanho-pagina", type=int, default=TAMANHO_PAGINA, help="projetos lidos por página")
+    parser.add_argument("--credencial", default="serviceAccountKey.json", help="chave de serviço do Firebase")
+    parser.add_argument("--cache-ibge", default=ARQUIVO_CACHE_IBGE, help="arquivo de cache dos dados do IBGE")
+    parser.add_argument("--ttl-ibge", type=int, default=TTL_CACHE_IBGE_DIAS, metavar="DIAS",
+                        help="dias até o cache do IBGE ser revalidado na API")
+    args = parser.parse_args(argv)
+
+    try:
+        gazetteer = obter_gazetteer(args.cache_ibge, ttl_dias=args.ttl_ibge)
+        if not gazetteer.codigos_estados:
+            registro.erro("ibge_sem_codigos", "Os dados do IBGE não têm os códigos numéricos; nada foi gravado.")
+            return 1
+        resumo = preencher_codigos(conectar_firestore(args.credencial), gazetteer, simulacao=args.simulacao,
+                                   tamanho_lote=args.tamanho_lote, tamanho_pagina=args.tamanho_pagina)
+    finally:
+        registro.imprimir_resumo()
+        registro.fechar()
+    return 1 if resumo["falhas"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,46 @@
+import os
+from importador.registro import registro
+
+# Projeto padrão do .firebaserc, usado quando o emulador está ativo
+PROJETO_PADRAO = "csn-fbs"
+
+
+def conectar_firestore(caminho_credencial="serviceAccountKey.json"):
+    """
+    Retorna um cliente do Firestore.
+    Se a variável FIRESTORE_EMULATOR_HOST estiver definida, conecta no emulador
+    local (que não exige credenciais); caso contrário, usa a chave de serviço.
+    """
+    # Importado aqui para que importar os scripts (em testes ou notebooks) não carregue o SDK do Firebase
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        projeto = os.environ.get("GCLOUD_PROJECT", PROJETO_PADRAO)
+        registro.info("emulador", f"Usando o emulador do Firestore em {os.environ['FIRESTORE_EMULATOR_HOST']} (projeto '{projeto}')")
+        return firestore.Client(project=projeto)
+
+    cred = credentials.Certificate(caminho_credencial)
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+
+def conectar_firestore_async(caminho_credencial="serviceAccountKey.json"):
+    """
+    Retorna um AsyncClient do Firestore, com as mesmas regras de conectar_firestore.
+    Deve ser chamada dentro do event loop em que o cliente será usado.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore_async
+    from google.cloud import firestore
+
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        projeto = os.environ.get("GCLOUD_PROJECT", PROJETO_PADRAO)
+        registro.info("emulador", f"Usando o emulador do Firestore em {os.environ['FIRESTORE_EMULATOR_HOST']} (projeto '{projeto}')")
+        return firestore.AsyncClient(project=projeto)
+
+    cred = credentials.Certificate(caminho_credencial)
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(cred)
+    return firestore_async.client()
@@ -0,0 +1,147 @@
+"""
+Verifica se os documentos de 'dadosEstados' batem com a coleção 'projetos'.
+
+Os indicadores são recalculados em memória com uma única leitura paginada de
+'projetos' e comparados, campo a campo, com os documentos gravados.
+
+Exemplos:
+    python -m importador.consistencia
+    python -m importador.consistencia --corrigir
+"""
+import argparse
+import math
+from importador.agregados import TAMANHO_PAGINA, calcular_dados_estados, gravar_dados_estados
+from importador.conexao import conectar_firestore
+from importador.registro import registro
+
+# Diferença tolerada entre valores numéricos (somas de valores em reais)
+TOLERANCIA = 1e-6
+
+
+def _contagens(itens):
+    """
+    Converte a lista [{nome, qtdProjetos}] em {nome: qtd}, ignorando contagens
+    zeradas (os documentos criados por criarDocsDadosEstados listam todas as
+    leis e segmentos com 0). Aceita também o `{}` gravado pelo trigger.
+    """
+    if isinstance(itens, dict):
+        itens = [{'nome': nome, 'qtdProjetos': qtd} for nome, qtd in itens.items()]
+    contagens = {}
+    for item in itens or []:
+        if item.get('qtdProjetos'):
+            contagens[item.get('nome')] = contagens.get(item.get('nome'), 0) + item['qtdProjetos']
+    return contagens
+
+
+def _numeros_iguais(a, b):
+    try:
+        return math.isclose(float(a or 0), float(b or 0), rel_tol=TOLERANCIA, abs_tol=TOLERANCIA)
+    except (TypeError, ValueError):
+        return a == b
+
+
+# Como comparar cada campo; os demais são comparados diretamente
+_NORMALIZADORES = {
+    'idProjects': lambda valor: sorted(valor or []),
+    'municipios': lambda valor: sorted(m for m in valor or [] if m),
+    'segmento': _contagens,
+    'lei': _contagens,
+    'projetosODS': lambda valor: list(valor or []),
+}
+_CAMPOS_NUMERICOS = ('qtdProjetos', 'qtdMunicipios', 'valorTotal', 'beneficiariosDireto',
+                     'beneficiariosIndireto', 'qtdOrganizacoes')
+
+
+def comparar_documento(armazenado, calculado):
+    """Retorna a lista de (campo, valor armazenado, valor calculado) que diferem."""
+    armazenado = armazenado or {}
+    diferencas = []
+    for campo, valor_calculado in calculado.items():
+        valor_armazenado = armazenado.get(campo)
+        if campo in _CAMPOS_NUMERICOS:
+            iguais = _numeros_iguais(valor_armazenado, valor_calculado)
+        elif campo == 'maiorAporte':
+            atual = valor_armazenado or {}
+            iguais = _numeros_iguais(atual.get('valorAportado'), valor_calculado['valorAportado']) and (
+                not valor_calculado['valorAportado'] or atual.get('nome') == valor_calculado['nome']
+            )
+        elif campo in _NORMALIZADORES:
+            normalizar = _NORMALIZADORES[campo]
+            iguais = normalizar(valor_armazenado) == normalizar(valor_calculado)
+        else:
+            iguais = valor_armazenado == valor_calculado
+        if not iguais:
+            diferencas.append((campo, valor_armazenado, valor_calculado))
+    return diferencas
+
+
+def ler_dados_estados(db, ids):
+    refs = [db.collection("dadosEstados").document(doc_id) for doc_id in ids]
+    return {snapshot.id: snapshot.to_dict() if snapshot.exists else None for snapshot in db.get_all(refs)}
+
+
+def _resumir(valor, limite=80):
+    texto = repr(valor)
+    return texto if len(texto) <= limite else f"{texto[:limite - 3]}..."
+
+
+def verificar_dados_estados(db, corrigir=False, tamanho_pagina=TAMANHO_PAGINA):
+    """
+    Recalcula 'dadosEstados' e imprime as diferenças encontradas, campo a campo.
+    Com `corrigir`, grava em um único lote apenas os documentos que diferem.
+    Retorna {id do documento: [(campo, armazenado, calculado), ...]}.
+    """
+    calculados = calcular_dados_estados(db, tamanho_pagina)
+    armazenados = ler_dados_estados(db, calculados)
+
+    divergentes = {}
+    for doc_id, calculado in calculados.items():
+        armazenado = armazenados.get(doc_id)
+        if armazenado is None:
+            divergentes[doc_id] = [('(documento)', None, 'ausente em dadosEstados')]
+            continue
+        diferencas = comparar_documento(armazenado, calculado)
+        if diferencas:
+            divergentes[doc_id] = diferencas
+
+    for doc_id, diferencas in divergentes.items():
+        estado = calculados[doc_id]['nomeEstado']
+        registro.resumo("estado_divergente", f"\n{estado} ({doc_id}):", estado=estado, id=doc_id,
+                        campos=[campo for campo, _, _ in diferencas])
+        for campo, armazenado, calculado in diferencas:
+            registro.resumo("campo_divergente", f"  - {campo}: armazenado {_resumir(armazenado)} | "
+                            f"calculado {_resumir(calculado)}", estado=estado, id=doc_id, campo=campo,
+                            armazenado=_resumir(armazenado), calculado=_resumir(calculado))
+
+    registro.resumo("resumo_consistencia", f"\n{len(calculados) - len(divergentes)} estados consistentes, "
+                    f"{len(divergentes)} com diferenças.", consistentes=len(calculados) - len(divergentes),
+                    divergentes=len(divergentes))
+    if corrigir and divergentes:
+        gravar_dados_estados(db, {doc_id: calculados[doc_id] for doc_id in divergentes})
+    return divergentes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.consistencia",
+        description="Compara 'dadosEstados' com os indicadores recalculados a partir de 'projetos'.",
+    )
+    parser.add_argument("--corrigir", action="store_true", help="grava apenas os documentos que diferem")
+    parser.add_argument("--tamanho-pagina", type=int, default=TAMANHO_PAGINA,
+                        help="projetos lidos por página")
+    parser.add_argument("--credencial", default="serviceAccountKey.json", help="chave de serviço do Firebase")
+    parser.add_argument("--log-json", help="grava todos os eventos neste arquivo, em JSON Lines")
+    args = parser.parse_args(argv)
+
+    registro.configurar(arquivo_eventos=args.log_json)
+    try:
+        divergentes = verificar_dados_estados(
+            conectar_firestore(args.credencial), corrigir=args.corrigir, tamanho_pagina=args.tamanho_pagina
+        )
+    finally:
+        registro.fechar()
+    return 1 if divergentes and not args.corrigir else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,293 @@
+"""
+Detecção de projetos quase duplicados: entre abas e planilhas da mesma
+importação e contra os projetos que já estão no Firestore.
+
+Comparar todos os pares seria quadrático. Os projetos são agrupados em blocos
+pela chave (ano, lei normalizada); dentro de cada bloco, são ordenados pelo
+proponente e pelo nome normalizados (e, numa segunda passada, pelo nome e pelo
+proponente) e cada projeto é comparado só com os JANELA vizinhos seguintes
+(sorted neighbourhood). Assim, diferenças de grafia no início ou no fim dos
+nomes não separam as duplicatas.
+
+Dois projetos são duplicatas quando nome e proponente passam dos limiares de
+similaridade, têm os mesmos números (ex.: "Etapa 1" e "Etapa 2" não são
+duplicatas) e os valores aprovados coincidem. Em cada grupo de duplicatas,
+fica o projeto que já existe no Firestore ou, se nenhum existir, o primeiro
+na ordem de leitura. As decisões sobre os demais são tomadas antes de
+qualquer escrita e gravadas em ARQUIVO_DECISOES:
+
+- "pular": a duplicata não acrescenta nada e não é gravada;
+- "mesclar": a duplicata traz estados ou municípios novos, que são somados
+  ao projeto mantido (só dentro da importação: projetos existentes nunca são
+  alterados; as duplicatas deles são puladas e as novidades, registradas);
+- "revisar": nome e proponente coincidem, mas o valor não. Os dois projetos
+  são gravados e o par fica no arquivo para conferência.
+
+Exemplo (decisões sem gravar nada, usando uma exportação local dos projetos):
+    python -m importador planilhageral.xlsx --layout anual --simulacao --deduplicar --snapshot exportacao/
+"""
+import datetime
+import json
+import os
+import re
+from collections import defaultdict
+from rapidfuzz import fuzz
+from importador.agregados import ler_colecao
+from importador.registro import registro
+from importador.texto import normalizar
+
+ARQUIVO_DECISOES = 'decisoes_duplicados.jsonl'
+
+# Similaridade mínima (0 a 100, token_sort_ratio) entre os nomes e entre os proponentes
+LIMIAR_NOME = 90
+LIMIAR_INSTITUICAO = 85
+# Quantos vizinhos, na ordem de cada passada, cada projeto é comparado
+JANELA = 8
+# Diferença relativa tolerada entre os valores aprovados de duas duplicatas
+TOLERANCIA_VALOR = 0.01
+
+# Campos lidos dos projetos existentes para montar o índice
+CAMPOS_INDICE = ['nome', 'instituicao', 'lei', 'valorAprovado', 'dataAprovado', 'estados', 'municipios']
+# Listas que a mescla une: a duplicata acrescenta ao projeto mantido o que ele ainda não tem
+CAMPOS_MESCLADOS = ('estados', 'municipios', 'codigosEstados', 'codigosMunicipios')
+CONTADOR_DUPLICATAS = "Duplicatas (decisão)"
+NUMEROS = re.compile(r"\d+")
+
+
+class Candidato:
+    """Um projeto, novo (aba, linha) ou existente (doc_id), preparado para a comparação."""
+
+    __slots__ = ('ordem', 'aba', 'linha', 'doc_id', 'dados', 'nome', 'instituicao', 'numeros', 'bloco')
+
+    def __init__(self, ordem, dados, aba=None, linha=None, doc_id=None):
+        self.ordem = ordem
+        self.aba = aba
+        self.linha = linha
+        self.doc_id = doc_id
+        self.dados = dados
+        self.nome = " ".join(normalizar(dados.get('nome')).split())
+        self.instituicao = " ".join(normalizar(dados.get('instituicao')).split())
+        self.numeros = (NUMEROS.findall(self.nome), NUMEROS.findall(self.instituicao))
+        data = dados.get('dataAprovado')
+        ano = str(data.year) if isinstance(data, datetime.datetime) else "indefinido"
+        self.bloco = (ano, normalizar(dados.get('lei')))
+
+    @property
+    def existente(self):
+        return self.doc_id is not None
+
+    @property
+    def comparavel(self):
+        """Projetos sem nome ou sem proponente coincidiriam com qualquer outro na mesma situação."""
+        return self.nome not in ("", "indefinido") and self.instituicao not in ("", "indefinido")
+
+    def descricao(self):
+        # Linha como no arquivo: o índice começa em 0 e não conta o cabeçalho
+        origem = {"id": self.doc_id} if self.existente else {"aba": self.aba, "linha": int(self.linha) + 2}
+        return {**origem, "nome": self.dados.get('nome'), "instituicao": self.dados.get('instituicao'),
+                "valorAprovado": self.dados.get('valorAprovado')}
+
+
+# Ordens das passadas do sorted neighbourhood
+ORDENACOES = (
+    lambda candidato: (candidato.instituicao, candidato.nome),
+    lambda candidato: (candidato.nome, candidato.instituicao),
+)
+
+
+def pares_candidatos(candidatos, janela=JANELA):
+    """Pares (a, b), com a.ordem < b.ordem, comparados dentro de cada bloco; cada par aparece uma vez."""
+    blocos = defaultdict(list)
+    for candidato in candidatos:
+        if candidato.comparavel:
+            blocos[candidato.bloco].append(candidato)
+
+    vistos = set()
+    for membros in blocos.values():
+        if len(membros) < 2:
+            continue
+        for ordenacao in ORDENACOES:
+            ordenados = sorted(membros, key=ordenacao)
+            for i, a in enumerate(ordenados):
+                for b in ordenados[i + 1:i + janela + 1]:
+                    if a.existente and b.existente:
+                        continue
+                    par = (a, b) if a.ordem < b.ordem else (b, a)
+                    if (par[0].ordem, par[1].ordem) not in vistos:
+                        vistos.add((par[0].ordem, par[1].ordem))
+                        yield par
+
+
+def similaridade(a, b):
+    """(similaridade dos nomes, dos proponentes), ou None se algum ficar abaixo do limiar ou os números diferirem."""
+    if a.numeros != b.numeros:
+        return None
+    nome = fuzz.token_sort_ratio(a.nome, b.nome, score_cutoff=LIMIAR_NOME)
+    if not nome:
+        return None
+    instituicao = fuzz.token_sort_ratio(a.instituicao, b.instituicao, score_cutoff=LIMIAR_INSTITUICAO)
+    if not instituicao:
+        return None
+    return nome, instituicao
+
+
+def pontuacoes(a, b):
+    """Similaridades dos nomes e dos proponentes, sem limiar, para o arquivo de decisões."""
+    return {"nome": round(fuzz.token_sort_ratio(a.nome, b.nome), 1),
+            "instituicao": round(fuzz.token_sort_ratio(a.instituicao, b.instituicao), 1)}
+
+
+def valores_compativeis(a, b):
+    """Valores iguais (na tolerância) ou algum deles ausente (0)."""
+    va, vb = float(a.dados.get('valorAprovado') or 0), float(b.dados.get('valorAprovado') or 0)
+    if not va or not vb:
+        return True
+    return abs(va - vb) <= TOLERANCIA_VALOR * max(abs(va), abs(vb))
+
+
+def _novidades(mantido, duplicata):
+    """Estados e municípios (nomes e códigos) da duplicata que o projeto mantido ainda não tem."""
+    return {
+        campo: sorted(set(duplicata.dados.get(campo) or []) - set(mantido.dados.get(campo) or []))
+        for campo in CAMPOS_MESCLADOS
+    }
+
+
+def detectar_duplicatas(novos, existentes=(), janela=JANELA):
+    """
+    Compara os projetos `novos` ((aba, linha, dados), na ordem de leitura)
+    entre si e com os `existentes` ((doc_id, dados)).
+
+    Retorna (decisões, mesclas): a lista de decisões, uma por projeto novo
+    que é duplicata ou precisa de revisão, e {(aba, linha): {campo: lista}}
+    com as listas de estados e municípios a gravar nos projetos mantidos.
+    """
+    candidatos = [Candidato(ordem, dados, doc_id=doc_id) for ordem, (doc_id, dados) in enumerate(existentes)]
+    candidatos += [Candidato(len(candidatos) + i, dados, aba=aba, linha=linha)
+                   for i, (aba, linha, dados) in enumerate(novos)]
+
+    # Grupos de duplicatas (union-find); o representante é sempre o de menor ordem,
+    # então os existentes vêm antes dos novos e, entre os novos, vale a ordem de leitura
+    pais = {}
+
+    def raiz(ordem):
+        while pais.get(ordem, ordem) != ordem:
+            ordem = pais[ordem]
+        return ordem
+
+    revisar = []
+    with registro.etapa("duplicatas", linhas=len(candidatos)):
+        for a, b in pares_candidatos(candidatos, janela):
+            if similaridade(a, b) is None:
+                continue
+            if not valores_compativeis(a, b):
+                revisar.append((a, b))
+                continue
+            ra, rb = raiz(a.ordem), raiz(b.ordem)
+            if ra != rb:
+                pais[max(ra, rb)] = min(ra, rb)
+
+    grupos = defaultdict(list)
+    for candidato in candidatos:
+        if candidato.ordem in pais:
+            grupos[raiz(candidato.ordem)].append(candidato)
+
+    decisoes, mesclas = [], {}
+    for ordem_mantido, membros in grupos.items():
+        mantido = candidatos[ordem_mantido]
+        listas = {campo: set(mantido.dados.get(campo) or []) for campo in CAMPOS_MESCLADOS}
+        for duplicata in sorted(membros, key=lambda c: c.ordem):
+            if duplicata is mantido or duplicata.existente:
+                continue
+            novidades = _novidades(mantido, duplicata)
+            if mantido.existente or not any(novidades.values()):
+                decisao = "pular"
+            else:
+                decisao = "mesclar"
+                for campo, valores in novidades.items():
+                    listas[campo].update(valores)
+                mesclas[(mantido.aba, mantido.linha)] = {campo: sorted(valores) for campo, valores in listas.items()}
+            decisoes.append({
+                "decisao": decisao, **duplicata.descricao(), "duplicata_de": mantido.descricao(),
+                "similaridade": pontuacoes(mantido, duplicata),
+                **({"novidades": novidades} if any(novidades.values()) else {}),
+            })
+
+    for a, b in revisar:
+        # Ligados como duplicatas por outro caminho: já têm decisão
+        if raiz(a.ordem) == raiz(b.ordem):
+            continue
+        decisoes.append({
+            "decisao": "revisar", **b.descricao(), "duplicata_de": a.descricao(), "similaridade": pontuacoes(a, b),
+        })
+
+    for decisao in decisoes:
+        registro.contar(CONTADOR_DUPLICATAS, decisao["decisao"])
+    return decisoes, mesclas
+
+
+def gravar_decisoes(decisoes, caminho=ARQUIVO_DECISOES):
+    """Grava as decisões em JSON Lines (substituindo as de uma execução anterior)."""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        for decisao in decisoes:
+            f.write(json.dumps(decisao, ensure_ascii=False, default=str) + "\n")
+    os.replace(temporario, caminho)
+
+
+def indice_existentes(db=None, pasta_snapshot=None):
+    """
+    Pares (doc_id, dados) dos projetos já gravados, só com os campos de
+    CAMPOS_INDICE: de uma exportação local (importador.exportacao), se
+    `pasta_snapshot` for informada, ou de uma leitura paginada de 'projetos'.
+    """
+    if pasta_snapshot is not None:
+        from importador.exportacao import ler_exportacao
+        return [(doc_id, {campo: dados.get(campo) for campo in CAMPOS_INDICE})
+                for doc_id, dados in ler_exportacao(pasta_snapshot, "projetos")]
+    with registro.etapa("indice_existentes"):
+        return [(snapshot.id, snapshot.to_dict()) for snapshot in ler_colecao(db, "projetos", campos=CAMPOS_INDICE)]
+
+
+def deduplicar_blocos(blocos, existentes=(), arquivo_decisoes=ARQUIVO_DECISOES, ids_proprios=frozenset()):
+    """
+    Recebe a lista de blocos limpos (aba, df, projetos) de toda a importação,
+    decide o que fazer com as duplicatas e devolve os mesmos blocos sem as
+    linhas puladas ou mescladas e com as listas mescladas nos projetos mantidos.
+
+    Os existentes cujo ID está em `ids_proprios` (os IDs determinísticos desta
+    importação) são as próprias linhas gravadas antes e não contam como duplicatas.
+    """
+    existentes = [(doc_id, dados) for doc_id, dados in existentes if doc_id not in ids_proprios]
+    novos = [
+        (aba, linha, dados)
+        for aba, _, projetos in blocos if projetos is not None
+        for linha, dados in zip(projetos.index, projetos.to_dict('records'))
+    ]
+    decisoes, mesclas = detectar_duplicatas(novos, existentes)
+    gravar_decisoes(decisoes, arquivo_decisoes)
+
+    quantidades = {decisao: sum(d["decisao"] == decisao for d in decisoes) for decisao in ("pular", "mesclar", "revisar")}
+    registro.info("duplicatas", f"Duplicatas: {quantidades['pular']} pulada(s), {quantidades['mesclar']} mesclada(s) e "
+                  f"{quantidades['revisar']} para revisar, entre {len(novos)} projetos e {len(existentes)} existentes. "
+                  f"Decisões em '{arquivo_decisoes}'.", **quantidades, arquivo=arquivo_decisoes)
+
+    removidas = {(d["aba"], d["linha"] - 2) for d in decisoes if d["decisao"] in ("pular", "mesclar")}
+    resultado = []
+    for aba, df, projetos in blocos:
+        if projetos is not None:
+            projetos = projetos[[(aba, linha) not in removidas for linha in projetos.index]].copy()
+            for campo in CAMPOS_MESCLADOS:
+                projetos[campo] = [mesclas.get((aba, linha), {}).get(campo, valor)
+                                   for linha, valor in zip(projetos.index, projetos[campo])]
+        resultado.append((aba, df, projetos))
+    return resultado
+
+
+def ids_da_importacao(blocos, gerador_ids):
+    """IDs determinísticos que as linhas dos blocos receberiam (todas, inclusive as duplicatas)."""
+    return {
+        gerador_ids.gerar(aba, dados)
+        for aba, _, projetos in blocos if projetos is not None
+        for dados in projetos.to_dict('records')
+    }
@@ -0,0 +1,409 @@
+import random
+import time
+from importador.manifesto import hash_conteudo
+from importador.registro import registro
+
+# Limite de operações por commit imposto pelo Firestore
+TAMANHO_MAXIMO_LOTE = 500
+
+MODOS_ESCRITA = ("individual", "lote", "bulk")
+
+# Quantas vezes o BulkWriter tenta reenviar um documento antes de desistir
+MAX_TENTATIVAS_BULK = 5
+
+# Tentativas de cada commit (modos "individual", "lote" e "async") diante de erros transitórios
+TENTATIVAS_ESCRITA = 5
+# Espera antes da segunda tentativa, em segundos; dobra a cada nova tentativa, até BACKOFF_MAXIMO
+BACKOFF_ESCRITA = 0.5
+BACKOFF_MAXIMO = 30.0
+
+# Campo com a hora do servidor na última gravação feita pelo importador; a
+# exportação incremental lê só os documentos em que ele passou da marca d'água
+CAMPO_ATUALIZADO_EM = "atualizadoEm"
+
+
+def erro_transitorio(erro):
+    """Indica se o erro costuma passar sozinho (indisponibilidade, timeout, cota) e vale uma nova tentativa."""
+    # Importado aqui, como o SDK do Firebase em conexao.py
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return isinstance(erro, (ConnectionError, TimeoutError))
+    return isinstance(erro, (
+        exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.Aborted,
+        exceptions.ResourceExhausted, exceptions.TooManyRequests, exceptions.InternalServerError,
+        ConnectionError, TimeoutError,
+    ))
+
+
+def espera_backoff(tentativa):
+    """Espera antes da tentativa seguinte à `tentativa` (0 = primeira), com jitter."""
+    return min(BACKOFF_MAXIMO, BACKOFF_ESCRITA * 2 ** tentativa) * random.uniform(0.5, 1.0)
+
+
+def registrar_nova_tentativa(erro, tentativa, espera):
+    registro.aviso("nova_tentativa", f"Erro transitório do Firestore ({type(erro).__name__}); tentando de novo.",
+                   erro=str(erro), tentativa=tentativa + 1, espera=round(espera, 2))
+
+
+def com_tentativas(funcao):
+    """Executa `funcao`, repetindo-a com backoff exponencial enquanto o erro for transitório."""
+    for tentativa in range(TENTATIVAS_ESCRITA):
+        try:
+            return funcao()
+        except Exception as e:
+            if tentativa + 1 >= TENTATIVAS_ESCRITA or not erro_transitorio(e):
+                raise
+            espera = espera_backoff(tentativa)
+            registrar_nova_tentativa(e, tentativa, espera)
+            time.sleep(espera)
+
+
+def validar_escrita(modo, tamanho_lote):
+    """Levanta ValueError se o modo de escrita ou o tamanho do lote forem inválidos."""
+    if modo not in MODOS_ESCRITA:
+        raise ValueError(f"Modo de escrita '{modo}' inválido. Use um de: {', '.join(MODOS_ESCRITA)}.")
+    if not 1 <= tamanho_lote <= TAMANHO_MAXIMO_LOTE:
+        raise ValueError(f"O tamanho do lote deve estar entre 1 e {TAMANHO_MAXIMO_LOTE}.")
+
+
+def carimbar(dados):
+    """Cópia de `dados` com CAMPO_ATUALIZADO_EM definido pelo servidor na gravação."""
+    # Importado aqui, como o SDK do Firebase em conexao.py
+    from google.cloud import firestore
+    return {**dados, CAMPO_ATUALIZADO_EM: firestore.SERVER_TIMESTAMP}
+
+
+def incluir_no_lote(batch, doc_ref, dados, upsert):
+    """Acrescenta ao lote a operação de um item pendente: remoção (dados None), merge (upsert) ou criação."""
+    if dados is None:
+        batch.delete(doc_ref)
+    elif upsert:
+        batch.set(doc_ref, carimbar(dados), merge=True)
+    else:
+        batch.create(doc_ref, carimbar(dados))
+
+
+class EscritorFirestore:
+    """
+    Acumula os documentos de uma importação e os grava no Firestore.
+
+    Modos disponíveis:
+    - "individual": um .add() por documento (comportamento antigo);
+    - "lote": agrupa os documentos em WriteBatch de até `tamanho_lote` escritas;
+    - "bulk": usa o BulkWriter do SDK, que paraleliza e reenvia sozinho.
+
+    Documentos com `doc_id` são gravados com set(..., merge=True) (upsert);
+    `remover()` apaga um documento, no mesmo lote das gravações. Se um
+    `manifesto` for informado, documentos cujo conteúdo não mudou desde a última
+    importação são pulados sem nenhuma chamada de rede.
+
+    `campos_fixos` são acrescentados a todos os documentos gravados, mas não
+    entram no hash do manifesto (ex.: o marcador de importação em lote). Toda
+    gravação também define CAMPO_ATUALIZADO_EM com a hora do servidor, usada
+    pela exportação incremental.
+
+    Commits que falham com erros transitórios são repetidos com backoff
+    exponencial. As falhas restantes são registradas por documento e, se houver
+    `arquivo_falhas` (ArquivoFalhas), gravadas nele para reenvio. Um
+    `checkpoint` (Checkpoint) é avisado do resultado de cada documento e
+    gravado depois dos commits. Ao final, `finalizar()` imprime um resumo com a
+    vazão (linhas/s) da importação.
+
+    Com um `controlador` (ControladorVazao), cada commit espera a sua vez
+    dentro do limite de escritas/s, e os erros de sobrecarga reduzem esse
+    limite. O modo "bulk" não o usa: o BulkWriter já controla a própria vazão.
+    """
+
+    def __init__(self, db, colecao="projetos", modo="lote", tamanho_lote=TAMANHO_MAXIMO_LOTE, manifesto=None,
+                 campos_fixos=None, checkpoint=None, arquivo_falhas=None, controlador=None):
+        validar_escrita(modo, tamanho_lote)
+
+        self.db = db
+        self.colecao = db.collection(colecao)
+        self.modo = modo
+        self.tamanho_lote = tamanho_lote
+        self.manifesto = manifesto
+        self.campos_fixos = dict(campos_fixos or {})
+        self.checkpoint = checkpoint
+        self.arquivo_falhas = arquivo_falhas
+        self.controlador = controlador if modo != "bulk" else None
+
+        self.gravados = 0
+        self.inalterados = 0
+        self.removidos = 0
+        self.falhas = []  # lista de (rotulo, erro)
+        # lista de (doc_ref, dados, rotulo, hash, upsert) do lote atual; dados None apaga o documento
+        self._pendentes = []
+        self._inicio = time.perf_counter()
+
+        self._bulk = None
+        self._rotulos_bulk = {}
+        self._enviados_bulk = 0
+        self._hashes_bulk = {}
+        self._dados_bulk = {}
+        self._remocoes_bulk = set()
+        if modo == "bulk":
+            self._bulk = db.bulk_writer()
+            self._bulk.on_write_result(self._sucesso_bulk)
+            self._bulk.on_write_error(self._erro_bulk)
+
+    def adicionar(self, dados, rotulo=None, doc_id=None):
+        """
+        Enfileira um documento para gravação. `rotulo` identifica o documento nos logs.
+        Com `doc_id`, o documento é criado ou atualizado (merge) nesse ID.
+        """
+        rotulo = rotulo or dados.get("nome", "sem nome")
+
+        hash_atual = None
+        if doc_id and self.manifesto is not None:
+            hash_atual = hash_conteudo(dados)
+            if self.manifesto.inalterado(doc_id, hash_atual):
+                self.inalterados += 1
+                if self.checkpoint is not None:
+                    self.checkpoint.resolver(doc_id, gravado=False)
+                return
+        if self.campos_fixos:
+            dados = {**dados, **self.campos_fixos}
+
+        if self.modo == "individual":
+            try:
+                with registro.etapa("escrita", linhas=1):
+                    if doc_id:
+                        com_tentativas(self._controlado(
+                            lambda: self.colecao.document(doc_id).set(carimbar(dados), merge=True), 1))
+                    else:
+                        doc_id = com_tentativas(self._controlado(lambda: self.colecao.add(carimbar(dados)), 1))[1].id
+                self._confirmar(doc_id, rotulo, hash_atual)
+            except Exception as e:
+                self._registrar_falha(rotulo, e, doc_id, dados)
+            self._salvar_checkpoint()
+            return
+
+        # Sem doc_id, o ID é gerado no cliente, sem ida ao servidor
+        doc_ref = self.colecao.document(doc_id) if doc_id else self.colecao.document()
+
+        if self.modo == "bulk":
+            self._rotulos_bulk[doc_ref.id] = rotulo
+            self._enviados_bulk += 1
+            self._hashes_bulk[doc_ref.id] = hash_atual
+            if self.arquivo_falhas is not None:
+                self._dados_bulk[doc_ref.id] = dados
+            if doc_id:
+                self._bulk.set(doc_ref, carimbar(dados), merge=True)
+            else:
+                self._bulk.create(doc_ref, carimbar(dados))
+            return
+
+        self._pendentes.append((doc_ref, dados, rotulo, hash_atual, bool(doc_id)))
+        if len(self._pendentes) >= self.tamanho_lote:
+            self._enviar_lote()
+
+    def remover(self, doc_id, rotulo=None):
+        """Enfileira a remoção do documento `doc_id`; no modo "lote", ela entra no mesmo commit das gravações."""
+        rotulo = rotulo or doc_id
+        doc_ref = self.colecao.document(doc_id)
+
+        if self.modo == "individual":
+            try:
+                with registro.etapa("escrita", linhas=1):
+                    com_tentativas(self._controlado(doc_ref.delete, 1))
+                self._confirmar_remocao(doc_id, rotulo)
+            except Exception as e:
+                self._registrar_falha(rotulo, e, doc_id)
+            return
+
+        if self.modo == "bulk":
+            self._rotulos_bulk[doc_id] = rotulo
+            self._remocoes_bulk.add(doc_id)
+            self._enviados_bulk += 1
+            self._bulk.delete(doc_ref)
+            return
+
+        self._pendentes.append((doc_ref, None, rotulo, None, True))
+        if len(self._pendentes) >= self.tamanho_lote:
+            self._enviar_lote()
+
+    def _enviar_lote(self):
+        """Grava o lote pendente com um único commit."""
+        if not self._pendentes:
+            return
+
+        batch = self.db.batch()
+        for doc_ref, dados, _, _, upsert in self._pendentes:
+            incluir_no_lote(batch, doc_ref, dados, upsert)
+
+        try:
+            with registro.etapa("escrita", linhas=len(self._pendentes)):
+                com_tentativas(self._controlado(batch.commit, len(self._pendentes)))
+            for doc_ref, dados, rotulo, hash_atual, _ in self._pendentes:
+                if dados is None:
+                    self._confirmar_remocao(doc_ref.id, rotulo)
+                else:
+                    self._confirmar(doc_ref.id, rotulo, hash_atual)
+        except Exception as e:
+            # O commit é atômico: se falhar, nenhum documento do lote foi gravado
+            for doc_ref, dados, rotulo, _, _ in self._pendentes:
+                self._registrar_falha(rotulo, e, doc_ref.id, dados)
+        finally:
+            self._pendentes = []
+        self._salvar_checkpoint()
+
+    def _controlado(self, funcao, escritas):
+        """Envolve um commit de `escritas` escritas com a espera e o registro do controlador de vazão."""
+        if self.controlador is None:
+            return funcao
+
+        def executar():
+            self.controlador.aguardar(escritas)
+            try:
+                resultado = funcao()
+            except Exception as e:
+                self.controlador.falha(e)
+                raise
+            self.controlador.sucesso(escritas)
+            return resultado
+        return executar
+
+    def _confirmar(self, doc_id, rotulo, hash_atual):
+        """Contabiliza um documento gravado e o registra no manifesto, se houver."""
+        self.gravados += 1
+        if hash_atual and self.manifesto is not None:
+            self.manifesto.registrar(doc_id, hash_atual)
+        if self.checkpoint is not None:
+            self.checkpoint.resolver(doc_id)
+        registro.debug("projeto_gravado", f"Projeto '{rotulo}' adicionado com o ID: {doc_id}", projeto=rotulo, id=doc_id)
+
+    def _confirmar_remocao(self, doc_id, rotulo):
+        """Contabiliza um documento removido e o tira do manifesto, se houver."""
+        self.removidos += 1
+        if self.manifesto is not None:
+            self.manifesto.remover(doc_id)
+        registro.debug("projeto_removido", f"Projeto '{rotulo}' removido (ID: {doc_id})", projeto=rotulo, id=doc_id)
+
+    def _sucesso_bulk(self, doc_ref, resultado, bulk_writer):
+        rotulo = self._rotulos_bulk.pop(doc_ref.id, doc_ref.id)
+        if doc_ref.id in self._remocoes_bulk:
+            self._remocoes_bulk.discard(doc_ref.id)
+            self._confirmar_remocao(doc_ref.id, rotulo)
+            return
+        self._dados_bulk.pop(doc_ref.id, None)
+        self._confirmar(doc_ref.id, rotulo, self._hashes_bulk.pop(doc_ref.id, None))
+        self._salvar_checkpoint()
+
+    def _erro_bulk(self, falha, bulk_writer):
+        if falha.attempts < MAX_TENTATIVAS_BULK:
+            return True  # pede ao BulkWriter para tentar de novo
+        doc_ref = falha.operation.reference
+        rotulo = self._rotulos_bulk.pop(doc_ref.id, doc_ref.id)
+        self._hashes_bulk.pop(doc_ref.id, None)
+        self._remocoes_bulk.discard(doc_ref.id)
+        self._registrar_falha(rotulo, f"{falha.message} (código {falha.code})", doc_ref.id,
+                              self._dados_bulk.pop(doc_ref.id, None))
+        self._salvar_checkpoint()
+        return False
+
+    def _registrar_falha(self, rotulo, erro, doc_id=None, dados=None):
+        self.falhas.append((rotulo, str(erro)))
+        registro.erro("falha_escrita", f"Falha ao adicionar o projeto '{rotulo}' ao Firestore: {erro}",
+                      projeto=rotulo, erro=str(erro))
+        if self.arquivo_falhas is not None and dados is not None:
+            self.arquivo_falhas.registrar(doc_id, rotulo, dados, erro)
+        if self.checkpoint is not None and doc_id:
+            self.checkpoint.resolver(doc_id, gravado=False)
+
+    def _salvar_checkpoint(self):
+        if self.checkpoint is not None:
+            self.checkpoint.salvar()
+
+    def finalizar(self):
+        """Envia o que ainda estiver pendente e imprime o resumo da importação."""
+        if self.modo == "bulk":
+            # O BulkWriter envia em segundo plano; mede-se a espera até o último envio
+            with registro.etapa("escrita", linhas=self._enviados_bulk):
+                self._bulk.close()
+        else:
+            self._enviar_lote()
+        if self.manifesto is not None:
+            self.manifesto.salvar()
+        if self.checkpoint is not None:
+            self.checkpoint.salvar(forcar=True)
+        if self.arquivo_falhas is not None:
+            self.arquivo_falhas.fechar()
+
+        duracao = time.perf_counter() - self._inicio
+        total = self.gravados + self.inalterados + self.removidos + len(self.falhas)
+        vazao = total / duracao if duracao > 0 else 0.0
+        removidos = f"{self.removidos} removidos, " if self.removidos else ""
+
+        registro.resumo("resumo_escrita", f"\nResumo da escrita ({self.modo}): {self.gravados} documentos gravados, "
+                        f"{removidos}{self.inalterados} inalterados (pulados), {len(self.falhas)} falhas, "
+                        f"{total} linhas em {duracao:.1f}s ({vazao:.1f} linhas/s).",
+                        gravados=self.gravados, inalterados=self.inalterados, removidos=self.removidos,
+                        falhas=len(self.falhas))
+        vazao_controlada = self.controlador.resumir() if self.controlador is not None else None
+        if self.falhas:
+            registro.info("falhas_escrita", "Documentos que falharam:\n" + "\n".join(
+                f"  - '{rotulo}': {erro}" for rotulo, erro in self.falhas
+            ))
+            if self.arquivo_falhas is not None and self.arquivo_falhas.quantidade:
+                registro.info("arquivo_falhas", f"Os documentos que falharam foram gravados em "
+                              f"'{self.arquivo_falhas.caminho}'. Para reenviá-los: "
+                              f"python -m importador.retomada {self.arquivo_falhas.caminho}")
+
+        return {
+            "gravados": self.gravados,
+            "inalterados": self.inalterados,
+            "removidos": self.removidos,
+            "falhas": list(self.falhas),
+            "duracao": duracao,
+            "linhas_por_segundo": vazao,
+            "vazao": vazao_controlada,
+        }
+
+
+class EscritorSimulado:
+    """
+    Substitui o EscritorFirestore em simulações (dry-run): conta o que seria
+    gravado, sem conectar ao Firestore e sem alterar o manifesto.
+    """
+
+    def __init__(self, tamanho_lote=TAMANHO_MAXIMO_LOTE, manifesto=None, campos_fixos=None):
+        self.tamanho_lote = tamanho_lote
+        self.manifesto = manifesto
+        self.gravados = 0
+        self.inalterados = 0
+        self.removidos = 0
+        self.falhas = []
+        self._inicio = time.perf_counter()
+
+    def adicionar(self, dados, rotulo=None, doc_id=None):
+        if doc_id and self.manifesto is not None and self.manifesto.inalterado(doc_id, hash_conteudo(dados)):
+            self.inalterados += 1
+            return
+        self.gravados += 1
+
+    def remover(self, doc_id, rotulo=None):
+        self.removidos += 1
+
+    def finalizar(self):
+        duracao = time.perf_counter() - self._inicio
+        total = self.gravados + self.inalterados + self.removidos
+        vazao = total / duracao if duracao > 0 else 0.0
+        lotes = -(-(self.gravados + self.removidos) // self.tamanho_lote)
+        removidos = f" e {self.removidos} removidos" if self.removidos else ""
+
+        registro.resumo("resumo_simulacao", f"\nSimulação: {self.gravados} documentos seriam gravados{removidos} em "
+                        f"{lotes} lotes, {self.inalterados} inalterados (pulados), {total} linhas em {duracao:.1f}s "
+                        f"({vazao:.1f} linhas/s).",
+                        gravados=self.gravados, inalterados=self.inalterados, removidos=self.removidos, lotes=lotes)
+
+        return {
+            "gravados": self.gravados,
+            "inalterados": self.inalterados,
+            "removidos": self.removidos,
+            "falhas": [],
+            "duracao": duracao,
+            "linhas_por_segundo": vazao,
+            "vazao": None,
+        }
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from importador.escrita import (
+    TAMANHO_MAXIMO_LOTE, TENTATIVAS_ESCRITA, EscritorFirestore, erro_transitorio, espera_backoff, incluir_no_lote,
+    registrar_nova_tentativa,
+)
+from importador.registro import registro
+
+# Quantos commits podem estar em andamento ao mesmo tempo
+COMMITS_EM_ANDAMENTO = 4
+
+
+class EscritorAssincrono(EscritorFirestore):
+    """
+    Variante do EscritorFirestore que grava os lotes com o AsyncClient do Firestore.
+
+    Os commits rodam em um event loop próprio, em outra thread, enquanto o
+    processo principal continua lendo e limpando a planilha. No máximo
+    `em_andamento` commits ficam pendentes; ao atingir o limite, `adicionar`
+    espera o primeiro deles terminar.
+
+    Os resultados são tratados por documento, como no modo "lote": cada
+    projeto gravado é confirmado no manifesto e cada falha é registrada pelo
+    nome do projeto. Erros transitórios são repetidos com backoff, sem
+    bloquear os demais commits.
+
+    `criar_cliente` é chamado dentro do event loop e deve retornar um AsyncClient
+    (ex.: conectar_firestore_async). Com um `controlador` (ControladorVazao),
+    cada commit aguarda a sua vez no event loop, sem bloquear os demais.
+    """
+
+    def __init__(self, criar_cliente, colecao="projetos", tamanho_lote=TAMANHO_MAXIMO_LOTE,
+                 em_andamento=COMMITS_EM_ANDAMENTO, manifesto=None, campos_fixos=None, checkpoint=None,
+                 arquivo_falhas=None, controlador=None):
+        if not 1 <= tamanho_lote <= TAMANHO_MAXIMO_LOTE:
+            raise ValueError(f"O tamanho do lote deve estar entre 1 e {TAMANHO_MAXIMO_LOTE}.")
+        if em_andamento < 1:
+            raise ValueError("O número de commits em andamento deve ser pelo menos 1.")
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="escritor-async", daemon=True)
+        self._thread.start()
+        try:
+            db = self._executar(self._criar_cliente(criar_cliente))
+        except Exception:
+            self._parar_loop()
+            raise
+
+        super().__init__(db, colecao=colecao, modo="lote", tamanho_lote=tamanho_lote, manifesto=manifesto,
+                         campos_fixos=campos_fixos, checkpoint=checkpoint, arquivo_falhas=arquivo_falhas,
+                         controlador=controlador)
+        self.modo = "async"
+        self.em_andamento = em_andamento
+        self._commits = {}  # futuro do commit -> lote enviado
+
+    @staticmethod
+    async def _criar_cliente(criar_cliente):
+        return criar_cliente()
+
+    def _executar(self, corrotina):
+        """Roda uma corrotina no event loop do escritor e espera o resultado."""
+        return asyncio.run_coroutine_threadsafe(corrotina, self._loop).result()
+
+    def _enviar_lote(self):
+        """Agenda o commit do lote pendente, sem esperar que ele termine."""
+        if not self._pendentes:
+            return
+
+        while len(self._commits) >= self.em_andamento:
+            self._coletar(esperar=True)
+
+        lote, self._pendentes = self._pendentes, []
+        futuro = asyncio.run_coroutine_threadsafe(self._commit(lote), self._loop)
+        self._commits[futuro] = lote
+        self._coletar(esperar=False)
+
+    async def _commit(self, lote):
+        batch = self.db.batch()
+        for doc_ref, dados, _, _, upsert in lote:
+            incluir_no_lote(batch, doc_ref, dados, upsert)
+        for tentativa in range(TENTATIVAS_ESCRITA):
+            if self.controlador is not None:
+                await asyncio.sleep(self.controlador.reservar(len(lote)))
+            inicio = time.perf_counter()
+            try:
+                await batch.commit()
+                if self.controlador is not None:
+                    self.controlador.sucesso(len(lote))
+                return time.perf_counter() - inicio
+            except Exception as e:
+                if self.controlador is not None:
+                    self.controlador.falha(e)
+                if tentativa + 1 >= TENTATIVAS_ESCRITA or not erro_transitorio(e):
+                    raise
+                espera = espera_backoff(tentativa)
+                registrar_nova_tentativa(e, tentativa, espera)
+                await asyncio.sleep(espera)
+
+    def _coletar(self, esperar):
+        """
+        Trata os commits já concluídos. Roda na thread principal, então o
+        manifesto e os contadores nunca são alterados em paralelo.
+        """
+        if not self._commits:
+            return
+        concluidos, _ = wait(self._commits, timeout=None if esperar else 0, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            lote = self._commits.pop(futuro)
+            erro = futuro.exception()
+            if erro is None:
+                registro.medir("escrita", futuro.result(), linhas=len(lote))
+            for doc_ref, dados, rotulo, hash_atual, _ in lote:
+                if erro is None and dados is None:
+                    self._confirmar_remocao(doc_ref.id, rotulo)
+                elif erro is None:
+                    self._confirmar(doc_ref.id, rotulo, hash_atual)
+                else:
+                    # O commit é atômico: se falhar, nenhum documento do lote foi gravado
+                    self._registrar_falha(rotulo, erro, doc_ref.id, dados)
+        self._salvar_checkpoint()
+
+    def finalizar(self):
+        """Envia o último lote, espera todos os commits e imprime o resumo."""
+        try:
+            self._enviar_lote()
+            while self._commits:
+                self._coletar(esperar=True)
+            return super().finalizar()
+        finally:
+            self._executar(self._fechar_cliente())
+            self._parar_loop()
+
+    async def _fechar_cliente(self):
+        self.db.close()
+
+    def _parar_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,503 @@
+"""
+Exportação das coleções do Firestore para uma cópia local, em JSON Lines ou
+Parquet, usada em análises e pelas ferramentas offline (ex.: agregados --snapshot).
+
+A coleção é lida em páginas com cursor e cada página é gravada antes de a
+próxima ser lida, então a memória não cresce com o tamanho da coleção; no
+Parquet, cada página vira um row group. Com `campos`, só esses campos são lidos.
+
+Cada coleção fica em <pasta>/<coleção>/, em uma ou mais partes, com um
+estado.json que guarda o update_time de cada documento exportado e a marca
+d'água: o maior 'atualizadoEm' lido, campo que o importador grava com a hora
+do servidor. Na exportação incremental, só os documentos com 'atualizadoEm'
+depois da marca são lidos (o Firestore cobra apenas por eles) e gravados em
+uma nova parte.
+
+Documentos removidos, e os alterados fora do importador (que não atualizam
+'atualizadoEm'), só são encontrados com --remocoes: uma consulta que lê os IDs
+da coleção inteira, cobrada a uma leitura por documento, compara os update_time
+com os do estado e lê por inteiro os criados ou alterados.
+`ler_exportacao` junta as partes e devolve a coleção como estava na última exportação.
+
+Parquet exige o pacote opcional pyarrow.
+
+Exemplos:
+    python -m importador.exportacao exportacao/
+    python -m importador.exportacao exportacao/ --dados-estados --formato parquet
+    python -m importador.exportacao exportacao/ --incremental
+    python -m importador.exportacao exportacao/ --incremental --remocoes
+    python -m importador.exportacao exportacao/ --campos nome lei valorAprovado estados municipios
+"""
+import argparse
+import datetime
+import json
+import os
+from importador.agregados import TAMANHO_PAGINA, ler_paginas
+from importador.conexao import conectar_firestore
+from importador.escrita import CAMPO_ATUALIZADO_EM
+from importador.leitura import importar_parquet
+from importador.registro import registro
+from importador.retomada import codificar_json, decodificar_json
+
+PASTA_EXPORTACAO = 'exportacao'
+ARQUIVO_ESTADO = 'estado.json'
+VERSAO_EXPORTACAO = 2
+FORMATOS_EXPORTACAO = ('jsonl', 'parquet')
+
+# Documentos alterados lidos por chamada de get_all na exportação incremental
+TAMANHO_LEITURA = 300
+
+# Campo lido na consulta que busca apenas os IDs e o update_time dos documentos
+CAMPO_ID = "__name__"
+# Marca d'água de uma exportação em que nenhum documento tinha 'atualizadoEm'
+MARCA_INICIAL = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Tipo de cada campo conhecido nas colunas do Parquet. Valores que não cabem no
+# tipo (ex.: dataAprovado "Indefinido") ficam nulos e são contados no registro;
+# campos sem tipo aqui vão como texto JSON. O JSON Lines guarda tudo como está.
+TIPOS_PARQUET = {
+    "projetos": {
+        'nome': 'texto',
+        'instituicao': 'texto',
+        'lei': 'texto',
+        'valorAprovado': 'numero',
+        'indicacao': 'texto',
+        'dataAprovado': 'data',
+        'estados': 'lista',
+        'municipios': 'lista',
+        'codigosEstados': 'codigos',
+        'codigosMunicipios': 'codigos',
+        'status': 'texto',
+        'ativo': 'booleano',
+        'compliance': 'booleano',
+        'empresas': 'json',
+        'ultimoFormulario': 'texto',
+        'loteImportacao': 'texto',
+    },
+    "dadosEstados": {
+        'nomeEstado': 'texto',
+        'qtdProjetos': 'numero',
+        'qtdMunicipios': 'numero',
+        'idProjects': 'lista',
+        'municipios': 'lista',
+        'valorTotal': 'numero',
+        'maiorAporte': 'json',
+        'beneficiariosDireto': 'numero',
+        'beneficiariosIndireto': 'numero',
+        'qtdOrganizacoes': 'numero',
+        'projetosODS': 'json',
+        'segmento': 'json',
+        'lei': 'json',
+    },
+}
+# Coluna do Parquet com os campos sem coluna própria, em JSON (só quando todos os campos são exportados)
+COLUNA_OUTROS = "outros"
+CONTADOR_FORA_DO_TIPO = "Valores nulos no Parquet por não caberem no tipo (campo)"
+
+
+def _tempo(snapshot):
+    """update_time do documento como texto, para comparar com a marca d'água."""
+    return snapshot.update_time.isoformat() if snapshot.update_time is not None else None
+
+
+def _campos_leitura(campos):
+    """Campos a ler: os pedidos e CAMPO_ATUALIZADO_EM, que dá a marca d'água e o cursor da consulta incremental."""
+    if campos is None or CAMPO_ATUALIZADO_EM in campos:
+        return campos
+    return campos + [CAMPO_ATUALIZADO_EM]
+
+
+def _mais_recente(marca, outra):
+    if marca is None:
+        return outra
+    return marca if outra is None or marca >= outra else outra
+
+
+def _gravar_snapshots(parte, snapshots, campos):
+    """Grava os snapshots na parte e retorna o maior CAMPO_ATUALIZADO_EM entre eles (None se nenhum o tiver)."""
+    linhas = []
+    marca = None
+    for snapshot in snapshots:
+        dados = snapshot.to_dict() or {}
+        marca = _mais_recente(marca, dados.get(CAMPO_ATUALIZADO_EM))
+        if campos is not None and CAMPO_ATUALIZADO_EM not in campos:
+            dados.pop(CAMPO_ATUALIZADO_EM, None)
+        linhas.append({"id": snapshot.id, "atualizadoEm": snapshot.update_time, "dados": dados})
+    parte.escrever(linhas)
+    return marca
+
+
+# --- Partes ---
+
+class ParteJsonl:
+    """Uma parte da exportação em JSON Lines: um documento por linha."""
+
+    extensao = ".jsonl"
+
+    def __init__(self, caminho, colecao, campos):
+        self.caminho = caminho
+        self._temporario = f"{caminho}.tmp"
+        self._arquivo = open(self._temporario, 'w', encoding='utf-8')
+
+    def escrever(self, linhas):
+        for linha in linhas:
+            self._arquivo.write(json.dumps(linha, ensure_ascii=False, default=codificar_json) + "\n")
+
+    def fechar(self):
+        self._arquivo.close()
+        os.replace(self._temporario, self.caminho)
+
+    def descartar(self):
+        self._arquivo.close()
+        os.remove(self._temporario)
+
+    @staticmethod
+    def ler(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha, object_hook=decodificar_json)
+
+
+def _texto(valor):
+    return valor if isinstance(valor, str) else json.dumps(valor, ensure_ascii=False, default=codificar_json)
+
+
+def _converter(tipo, valor):
+    """Converte um valor para o tipo da coluna; retorna (valor, coube no tipo)."""
+    if valor is None:
+        return None, True
+    if tipo == 'texto':
+        return _texto(valor), True
+    if tipo == 'json':
+        return json.dumps(valor, ensure_ascii=False, default=codificar_json), True
+    if tipo == 'numero':
+        if isinstance(valor, bool):
+            return None, False
+        try:
+            return float(valor), True
+        except (TypeError, ValueError):
+            return None, False
+    if tipo == 'booleano':
+        return (valor, True) if isinstance(valor, bool) else (None, False)
+    if tipo == 'data':
+        return (valor, True) if isinstance(valor, datetime.datetime) else (None, False)
+    if tipo == 'lista':
+        return ([_texto(item) for item in valor], True) if isinstance(valor, list) else (None, False)
+    if tipo == 'codigos':
+        if isinstance(valor, list) and all(isinstance(item, int) and not isinstance(item, bool) for item in valor):
+            return valor, True
+        return None, False
+    raise ValueError(f"Tipo '{tipo}' desconhecido.")
+
+
+class ParteParquet:
+    """
+    Uma parte da exportação em Parquet, com um row group por página lida.
+    Colunas: id, atualizadoEm, removido, um campo por coluna (TIPOS_PARQUET)
+    e, quando todos os campos são exportados, 'outros' com o restante em JSON.
+    """
+
+    extensao = ".parquet"
+
+    def __init__(self, caminho, colecao, campos):
+        pq = importar_parquet()
+        import pyarrow as pa
+
+        self.pa = pa
+        self.caminho = caminho
+        self._temporario = f"{caminho}.tmp"
+        tipos = TIPOS_PARQUET.get(colecao, {})
+        self.colunas = [(campo, tipos.get(campo, 'json')) for campo in (campos if campos is not None else tipos)]
+        self.com_outros = campos is None
+        tipos_arrow = {
+            'texto': pa.string(), 'json': pa.string(), 'numero': pa.float64(), 'booleano': pa.bool_(),
+            'data': pa.timestamp('us', tz='UTC'), 'lista': pa.list_(pa.string()), 'codigos': pa.list_(pa.int64()),
+        }
+        self.schema = pa.schema(
+            [("id", pa.string()), ("atualizadoEm", pa.timestamp('us', tz='UTC')), ("removido", pa.bool_())]
+            + [(campo, tipos_arrow[tipo]) for campo, tipo in self.colunas]
+            + ([(COLUNA_OUTROS, pa.string())] if self.com_outros else []),
+            metadata={"tipos": json.dumps(dict(self.colunas))},
+        )
+        self._escritor = pq.ParquetWriter(self._temporario, self.schema)
+
+    def escrever(self, linhas):
+        if not linhas:
+            return
+        valores = {nome: [] for nome in self.schema.names}
+        conhecidos = {campo for campo, _ in self.colunas}
+        for linha in linhas:
+            dados = linha.get("dados") or {}
+            valores["id"].append(linha["id"])
+            valores["atualizadoEm"].append(linha.get("atualizadoEm"))
+            valores["removido"].append(bool(linha.get("removido")))
+            for campo, tipo in self.colunas:
+                valor, coube = _converter(tipo, dados.get(campo))
+                if not coube:
+                    registro.contar(CONTADOR_FORA_DO_TIPO, campo)
+                valores[campo].append(valor)
+            if self.com_outros:
+                outros = {campo: valor for campo, valor in dados.items() if campo not in conhecidos}
+                valores[COLUNA_OUTROS].append(_converter('json', outros)[0] if outros else None)
+        self._escritor.write_table(self.pa.Table.from_pydict(valores, schema=self.schema))
+
+    def fechar(self):
+        self._escritor.close()
+        os.replace(self._temporario, self.caminho)
+
+    def descartar(self):
+        self._escritor.close()
+        os.remove(self._temporario)
+
+    @staticmethod
+    def ler(caminho):
+        pq = importar_parquet()
+        arquivo = pq.ParquetFile(caminho)
+        tipos = json.loads(arquivo.schema_arrow.metadata[b"tipos"])
+        for lote in arquivo.iter_batches():
+            for linha in lote.to_pylist():
+                dados = {}
+                for campo, tipo in tipos.items():
+                    valor = linha.get(campo)
+                    if valor is not None:
+                        dados[campo] = json.loads(valor, object_hook=decodificar_json) if tipo == 'json' else valor
+                if linha.get(COLUNA_OUTROS):
+                    dados.update(json.loads(linha[COLUNA_OUTROS], object_hook=decodificar_json))
+                yield {"id": linha["id"], "atualizadoEm": linha["atualizadoEm"], "removido": linha["removido"],
+                       "dados": dados}
+
+
+PARTES = {"jsonl": ParteJsonl, "parquet": ParteParquet}
+
+
+# --- Estado ---
+
+def _pasta_colecao(pasta, colecao):
+    return os.path.join(pasta, colecao)
+
+
+def carregar_estado(pasta, colecao):
+    """Estado da última exportação da coleção, ou None se ela nunca foi exportada."""
+    caminho = os.path.join(_pasta_colecao(pasta, colecao), ARQUIVO_ESTADO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        estado = json.load(f)
+    return estado if estado.get('versao') == VERSAO_EXPORTACAO else None
+
+
+def salvar_estado(pasta, colecao, estado):
+    caminho = os.path.join(_pasta_colecao(pasta, colecao), ARQUIVO_ESTADO)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def exportacao_existe(pasta, colecao):
+    return carregar_estado(pasta, colecao) is not None
+
+
+# --- Exportação ---
+
+def _abrir_parte(pasta, colecao, formato, campos, numero):
+    classe = PARTES[formato]
+    nome = f"parte-{numero:05d}{classe.extensao}"
+    return nome, classe(os.path.join(_pasta_colecao(pasta, colecao), nome), colecao, campos)
+
+
+def _exportar_tudo(db, colecao, pasta, formato, campos, tamanho_pagina):
+    nome, parte = _abrir_parte(pasta, colecao, formato, campos, 1)
+    tempos = {}
+    marca = None
+    try:
+        for pagina in registro.iterar("leitura", ler_paginas(db, colecao, tamanho_pagina, _campos_leitura(campos))):
+            with registro.etapa("gravacao", linhas=len(pagina)):
+                marca = _mais_recente(marca, _gravar_snapshots(parte, pagina, campos))
+            tempos.update((snapshot.id, _tempo(snapshot)) for snapshot in pagina)
+    except BaseException:
+        parte.descartar()
+        raise
+    parte.fechar()
+    return [nome], tempos, len(tempos), 0, marca
+
+
+def _marca_anterior(anterior):
+    return datetime.datetime.fromisoformat(anterior['marca_dagua']) if anterior['marca_dagua'] else None
+
+
+def _exportar_atualizados(db, colecao, pasta, formato, campos, tamanho_pagina, anterior):
+    """Exporta só os documentos com CAMPO_ATUALIZADO_EM depois da marca d'água, sem ler os demais."""
+    desde = _marca_anterior(anterior) or MARCA_INICIAL
+    tempos = dict(anterior['documentos'])
+    marca = None
+    exportados = 0
+    nome = parte = None
+    try:
+        paginas = ler_paginas(db, colecao, tamanho_pagina, _campos_leitura(campos), atualizados_apos=desde)
+        for pagina in registro.iterar("leitura", paginas):
+            if parte is None:
+                nome, parte = _abrir_parte(pasta, colecao, formato, campos, len(anterior['partes']) + 1)
+            with registro.etapa("gravacao", linhas=len(pagina)):
+                marca = _mais_recente(marca, _gravar_snapshots(parte, pagina, campos))
+            exportados += len(pagina)
+            tempos.update((snapshot.id, _tempo(snapshot)) for snapshot in pagina)
+    except BaseException:
+        if parte is not None:
+            parte.descartar()
+        raise
+    if parte is None:
+        return anterior['partes'], tempos, 0, 0, None
+    parte.fechar()
+    return anterior['partes'] + [nome], tempos, exportados, 0, marca
+
+
+def _exportar_alterados(db, colecao, pasta, formato, campos, tamanho_pagina, anterior):
+    """Compara os update_time de todos os IDs da coleção com os do estado, encontrando também os removidos."""
+    tempos = {}
+    alterados = []
+    for pagina in registro.iterar("leitura_ids", ler_paginas(db, colecao, tamanho_pagina, [CAMPO_ID])):
+        for snapshot in pagina:
+            tempos[snapshot.id] = _tempo(snapshot)
+            if anterior['documentos'].get(snapshot.id) != tempos[snapshot.id]:
+                alterados.append(snapshot.id)
+    removidos = set(anterior['documentos']) - set(tempos)
+    if not alterados and not removidos:
+        return anterior['partes'], tempos, 0, 0, None
+
+    nome, parte = _abrir_parte(pasta, colecao, formato, campos, len(anterior['partes']) + 1)
+    exportados = 0
+    marca = None
+    try:
+        colecao_ref = db.collection(colecao)
+        for inicio in range(0, len(alterados), TAMANHO_LEITURA):
+            refs = [colecao_ref.document(doc_id) for doc_id in alterados[inicio:inicio + TAMANHO_LEITURA]]
+            with registro.etapa("leitura", linhas=len(refs)):
+                snapshots = list(db.get_all(refs, field_paths=_campos_leitura(campos)))
+            existentes = [snapshot for snapshot in snapshots if snapshot.exists]
+            # Removido entre a consulta dos IDs e a leitura
+            for snapshot in snapshots:
+                if not snapshot.exists:
+                    removidos.add(snapshot.id)
+                    tempos.pop(snapshot.id, None)
+            with registro.etapa("gravacao", linhas=len(existentes)):
+                marca = _mais_recente(marca, _gravar_snapshots(parte, existentes, campos))
+            exportados += len(existentes)
+            # Alterado de novo depois da consulta dos IDs: vale o tempo da versão gravada
+            tempos.update((snapshot.id, _tempo(snapshot)) for snapshot in existentes)
+        removidos &= set(anterior['documentos'])
+        parte.escrever([{"id": doc_id, "removido": True} for doc_id in sorted(removidos)])
+    except BaseException:
+        parte.descartar()
+        raise
+    parte.fechar()
+    return anterior['partes'] + [nome], tempos, exportados, len(removidos), marca
+
+
+def exportar_colecao(db, colecao, pasta=PASTA_EXPORTACAO, formato="jsonl", campos=None, incremental=False,
+                     tamanho_pagina=TAMANHO_PAGINA, remocoes=False):
+    """
+    Exporta uma coleção para `pasta`/<coleção>/ e retorna um resumo
+    {coleção, exportados, removidos, partes}.
+
+    Com `incremental` e uma exportação anterior no mesmo formato e com os mesmos
+    campos, grava só os documentos gravados pelo importador desde então; com
+    `remocoes`, lê também os IDs da coleção inteira para gravar os removidos e
+    os alterados fora do importador. Sem exportação anterior, exporta tudo. A
+    exportação completa substitui as partes anteriores.
+    """
+    if formato not in PARTES:
+        raise ValueError(f"Formato '{formato}' inválido. Use um de: {', '.join(FORMATOS_EXPORTACAO)}.")
+    os.makedirs(_pasta_colecao(pasta, colecao), exist_ok=True)
+    campos = list(campos) if campos is not None else None
+    anterior = carregar_estado(pasta, colecao)
+
+    if incremental and anterior is not None and anterior['formato'] == formato and anterior['campos'] == campos:
+        exportar = _exportar_alterados if remocoes else _exportar_atualizados
+        partes, tempos, exportados, removidos, marca = exportar(db, colecao, pasta, formato, campos,
+                                                                tamanho_pagina, anterior)
+        marca = _mais_recente(_marca_anterior(anterior), marca)
+    else:
+        if incremental:
+            registro.aviso("exportacao_sem_base", f"Nenhuma exportação anterior de '{colecao}' no formato '{formato}' "
+                           f"e com os mesmos campos; exportando a coleção inteira.", colecao=colecao)
+        partes, tempos, exportados, removidos, marca = _exportar_tudo(db, colecao, pasta, formato, campos,
+                                                                      tamanho_pagina)
+        # As partes de exportações anteriores deixam de valer
+        for nome in (anterior or {}).get('partes', []):
+            caminho = os.path.join(_pasta_colecao(pasta, colecao), nome)
+            if nome not in partes and os.path.exists(caminho):
+                os.remove(caminho)
+
+    salvar_estado(pasta, colecao, {
+        'versao': VERSAO_EXPORTACAO,
+        'colecao': colecao,
+        'formato': formato,
+        'campos': campos,
+        'exportado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+        'marca_dagua': marca.isoformat() if marca is not None else None,
+        'partes': partes,
+        'documentos': tempos,
+    })
+    registro.info("colecao_exportada", f"'{colecao}': {exportados} documento(s) exportado(s) e {removidos} removido(s) "
+                  f"em '{_pasta_colecao(pasta, colecao)}' ({len(tempos)} no total).", colecao=colecao,
+                  exportados=exportados, removidos=removidos, total=len(tempos))
+    return {"colecao": colecao, "exportados": exportados, "removidos": removidos, "partes": partes}
+
+
+def ler_exportacao(pasta, colecao):
+    """
+    Gera pares (id, dados), em ordem de ID, da coleção exportada em `pasta`.
+    As partes são lidas em ordem; as mais novas substituem os documentos das
+    anteriores e removem os que foram apagados.
+    """
+    estado = carregar_estado(pasta, colecao)
+    if estado is None:
+        raise FileNotFoundError(f"Nenhuma exportação de '{colecao}' em '{pasta}'.")
+    documentos = {}
+    for nome in estado['partes']:
+        classe = PARTES[estado['formato']]
+        for linha in classe.ler(os.path.join(_pasta_colecao(pasta, colecao), nome)):
+            if linha.get('removido'):
+                documentos.pop(linha['id'], None)
+            else:
+                documentos[linha['id']] = linha['dados']
+    for doc_id in sorted(documentos):
+        yield doc_id, documentos[doc_id]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.exportacao",
+        description="Exporta coleções do Firestore para JSON Lines ou Parquet, por completo ou de forma incremental.",
+    )
+    parser.add_argument("pasta", nargs="?", default=PASTA_EXPORTACAO, help="pasta da exportação")
+    parser.add_argument("--colecoes", nargs="+", default=["projetos"], help="coleções a exportar (padrão: projetos)")
+    parser.add_argument("--dados-estados", action="store_true", help="exporta também 'dadosEstados'")
+    parser.add_argument("--formato", choices=FORMATOS_EXPORTACAO, default="jsonl",
+                        help="'parquet' exige o pacote pyarrow")
+    parser.add_argument("--campos", nargs="+", help="exporta só estes campos (padrão: todos)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="exporta só os documentos gravados pelo importador desde a última exportação")
+    parser.add_argument("--remocoes", action="store_true",
+                        help="com --incremental, lê os IDs da coleção inteira (uma leitura por documento) para "
+                             "exportar também os removidos e os alterados fora do importador")
+    parser.add_argument("--tamanho-pagina", type=int, default=TAMANHO_PAGINA, help="documentos lidos por página")
+    parser.add_argument("--credencial", default="serviceAccountKey.json", help="chave de serviço do Firebase")
+    args = parser.parse_args(argv)
+
+    colecoes = list(dict.fromkeys(args.colecoes + (["dadosEstados"] if args.dados_estados else [])))
+    try:
+        db = conectar_firestore(args.credencial)
+        for colecao in colecoes:
+            exportar_colecao(db, colecao, args.pasta, args.formato, args.campos, args.incremental, args.tamanho_pagina,
+                             args.remocoes)
+    finally:
+        registro.imprimir_resumo()
+        registro.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
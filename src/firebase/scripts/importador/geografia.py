@@ -0,0 +1,278 @@
+import hashlib
+import json
+from collections import Counter, defaultdict
+from rapidfuzz import fuzz, process, utils
+from importador.registro import registro
+from importador.texto import normalizar
+
+# Tamanho dos n-gramas de caracteres usados no índice de todos os municípios
+TAMANHO_NGRAMA = 3
+# Municípios que mais compartilham n-gramas com o nome consultado e passam pelo WRatio
+CANDIDATOS_POR_CONSULTA = 50
+# Sem o estado para restringir a busca, a correção contra todo o país exige mais similaridade
+LIMIAR_SEM_ESTADO = 90
+
+
+def preparar_para_fuzzy(texto):
+    """
+    Aplica o mesmo pré-processamento que o thefuzz faz antes do WRatio
+    (só ASCII, sem pontuação, minúsculas), para que os scores não mudem.
+    """
+    return utils.default_process(texto.encode('ascii', 'ignore').decode('ascii'))
+
+
+def versao_dados_geo(dados_geo):
+    """Hash dos estados e municípios, usado para saber se os dados do IBGE mudaram."""
+    conteudo = {'estados': dados_geo['estados'], 'municipios_por_estado': dados_geo['municipios_por_estado']}
+    texto = json.dumps(conteudo, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class ListaCandidatos:
+    """
+    Lista de nomes corretos preparada uma única vez para correção.
+    Guarda as chaves normalizadas, o mapa normalizado -> original e as
+    escolhas já pré-processadas para o RapidFuzz.
+
+    `identificador` nomeia o conjunto (ex.: "estados") no cache de correções.
+    `normalizados` permite reaproveitar nomes já normalizados (ex.: do cache do IBGE).
+    """
+
+    def __init__(self, nomes, identificador="", cache=None, normalizados=None):
+        self.identificador = identificador
+        self.cache = cache
+        self.originais = list(nomes)
+        if normalizados is None:
+            normalizados = [normalizar(nome) for nome in self.originais]
+        self.normalizados = list(normalizados)
+        self.normalizado_para_original = {}
+        for chave, nome in zip(self.normalizados, self.originais):
+            # Em caso de nomes repetidos (ex.: municípios homônimos), vale o primeiro
+            self.normalizado_para_original.setdefault(chave, nome)
+        self.chaves = list(self.normalizado_para_original.keys())
+        self.escolhas = [preparar_para_fuzzy(chave) for chave in self.chaves]
+
+    def __len__(self):
+        return len(self.chaves)
+
+    def melhor_correspondencia(self, nome_normalizado):
+        """
+        Retorna (nome_original, chave_normalizada, score) do melhor candidato.
+        Um acerto exato da forma normalizada dispensa o cálculo fuzzy; os
+        demais resultados são memorizados no cache de correções, se houver.
+        """
+        original = self.normalizado_para_original.get(nome_normalizado)
+        if original is not None:
+            return original, nome_normalizado, 100
+
+        if not self.escolhas:
+            return None, None, 0
+
+        chave_cache = (nome_normalizado, self.identificador)
+        if self.cache is not None:
+            resultado = self.cache.obter(chave_cache)
+            if resultado is not None:
+                return resultado
+
+        with registro.etapa("correcao_fuzzy", linhas=1):
+            indice, score = self._pontuar(preparar_para_fuzzy(nome_normalizado))
+        if indice is None:
+            return None, None, 0
+        chave = self.chaves[indice]
+        resultado = (self.normalizado_para_original[chave], chave, int(round(score)))
+        if self.cache is not None:
+            self.cache.guardar(chave_cache, resultado)
+        return resultado
+
+    def _pontuar(self, consulta):
+        """Retorna (índice em `chaves`, score) da escolha mais parecida com `consulta`."""
+        _, score, indice = process.extractOne(consulta, self.escolhas, scorer=fuzz.WRatio, processor=None)
+        return indice, score
+
+
+def ngramas(texto, tamanho=TAMANHO_NGRAMA):
+    """N-gramas de caracteres do texto, com espaços nas bordas para marcar início e fim."""
+    texto = f" {texto} "
+    return {texto[i:i + tamanho] for i in range(max(1, len(texto) - tamanho + 1))}
+
+
+class IndiceMunicipios(ListaCandidatos):
+    """
+    Todos os municípios do país, para corrigir linhas sem estado válido.
+
+    Comparar cada nome com os ~5.570 municípios seria lento; um índice
+    invertido de n-gramas seleciona antes os `candidatos` municípios que mais
+    compartilham n-gramas com o nome, e só eles passam pelo WRatio.
+
+    `estados_de` informa em quais estados existe um município, para que o
+    estado da linha possa ser inferido quando o nome é único no país.
+    """
+
+    def __init__(self, nomes, estados, cache=None, normalizados=None, candidatos=CANDIDATOS_POR_CONSULTA):
+        super().__init__(nomes, "municipios:*", cache, normalizados)
+        self.candidatos = candidatos
+        self.estados_por_chave = defaultdict(set)
+        for chave, estado in zip(self.normalizados, estados):
+            self.estados_por_chave[chave].add(estado)
+
+        self._indice = defaultdict(list)  # n-grama -> posições em `escolhas`
+        for posicao, escolha in enumerate(self.escolhas):
+            for ngrama in ngramas(escolha):
+                self._indice[ngrama].append(posicao)
+
+    def _pontuar(self, consulta):
+        compartilhados = Counter()
+        for ngrama in ngramas(consulta):
+            compartilhados.update(self._indice.get(ngrama, ()))
+        if not compartilhados:
+            return None, 0
+        posicoes = [posicao for posicao, _ in compartilhados.most_common(self.candidatos)]
+        _, score, indice = process.extractOne(
+            consulta, [self.escolhas[posicao] for posicao in posicoes], scorer=fuzz.WRatio, processor=None
+        )
+        return posicoes[indice], score
+
+    def estados_de(self, nome):
+        """Estados em que existe um município com este nome (vazio se não existir)."""
+        return sorted(self.estados_por_chave.get(normalizar(nome), ()))
+
+
+class Gazetteer:
+    """
+    Índice geográfico montado uma vez a partir dos dados do IBGE:
+    candidatos de estados, de municípios por estado e o mapa sigla -> nome.
+    O índice de todos os municípios do país (`indice_municipios`) só é montado
+    se alguma linha não tiver estado válido.
+
+    `versao` é um hash dos dados geográficos; um `cache` de correções
+    (CacheCorrecoes) é invalidado quando ela muda. Se `dados_geo` vier do cache
+    binário do IBGE, a versão e os nomes normalizados já vêm prontos.
+
+    Os códigos numéricos do IBGE, quando presentes nos dados, são consultados
+    por codigos() a partir dos nomes dos estados e municípios de um projeto.
+    """
+
+    def __init__(self, dados_geo, cache=None):
+        self.versao = dados_geo.get('versao') or versao_dados_geo(dados_geo)
+        self.cache = cache
+        if cache is not None:
+            cache.validar(self.versao)
+
+        self.estado_para_sigla = dict(dados_geo['estados'])
+        self.sigla_para_nome = dados_geo.get('sigla_para_nome') or {
+            sigla: nome for nome, sigla in self.estado_para_sigla.items()
+        }
+        normalizados = dados_geo.get('normalizados', {})
+        municipios_normalizados = normalizados.get('municipios_por_estado', {})
+        self.estados = ListaCandidatos(self.estado_para_sigla.keys(), "estados", cache, normalizados.get('estados'))
+        self.municipios_por_estado = {
+            estado: ListaCandidatos(municipios, f"municipios:{estado}", cache, municipios_normalizados.get(estado))
+            for estado, municipios in dados_geo['municipios_por_estado'].items()
+        }
+        self.codigos_estados = dict(dados_geo.get('codigos_estados') or {})
+        self.codigos_municipios = {
+            estado: dict(zip(dados_geo['municipios_por_estado'][estado], codigos))
+            for estado, codigos in (dados_geo.get('codigos_municipios') or {}).items()
+        }
+        self._municipios_combinados = {}
+        self._indice_municipios = None
+
+    @property
+    def indice_municipios(self):
+        """Índice de todos os municípios do país, montado apenas no primeiro uso."""
+        if self._indice_municipios is None:
+            nomes, estados, normalizados = [], [], []
+            for estado, candidatos in self.municipios_por_estado.items():
+                nomes.extend(candidatos.originais)
+                normalizados.extend(candidatos.normalizados)
+                estados.extend([estado] * len(candidatos.originais))
+            self._indice_municipios = IndiceMunicipios(nomes, estados, self.cache, normalizados)
+        return self._indice_municipios
+
+    def estado_oficial(self, estado):
+        """Nome oficial do estado; grafias que só diferem em acentos ou maiúsculas também são reconhecidas."""
+        if estado in self.estado_para_sigla:
+            return estado
+        return self.estados.normalizado_para_original.get(normalizar(estado), estado)
+
+    def codigo_estado(self, estado):
+        """Código do IBGE do estado (nome completo), ou None se ele não existir."""
+        return self.codigos_estados.get(self.estado_oficial(estado))
+
+    def codigo_municipio(self, municipio, estados):
+        """
+        Código do IBGE do município em um dos `estados` (nomes oficiais), ou
+        None se ele não existir em nenhum deles. Como em estado_oficial(),
+        acentos e maiúsculas não importam. Municípios homônimos de estados
+        diferentes têm códigos diferentes; vale o primeiro estado.
+        """
+        chave = None
+        for estado in estados:
+            codigos = self.codigos_municipios.get(estado)
+            if codigos is None:
+                continue
+            codigo = codigos.get(municipio)
+            if codigo is None:
+                chave = chave or normalizar(municipio)
+                codigo = codigos.get(self.municipios_por_estado[estado].normalizado_para_original.get(chave))
+            if codigo is not None:
+                return codigo
+        return None
+
+    def codigos(self, estados, municipios):
+        """
+        Códigos do IBGE de um projeto: (estados, municípios), sem repetições e
+        na ordem dos nomes. Os municípios são procurados apenas nos estados do
+        projeto; nomes não reconhecidos (ex.: 'Indefinido') ficam de fora.
+        """
+        oficiais = [self.estado_oficial(estado) for estado in estados]
+        codigos_estados = (self.codigos_estados.get(estado) for estado in oficiais)
+        codigos_municipios = (self.codigo_municipio(municipio, oficiais) for municipio in municipios)
+        return (list(dict.fromkeys(c for c in codigos_estados if c is not None)),
+                list(dict.fromkeys(c for c in codigos_municipios if c is not None)))
+
+    def municipios_de(self, estados):
+        """
+        Retorna os candidatos de municípios para um conjunto de estados.
+        Combinações de mais de um estado são montadas uma vez e reaproveitadas.
+        """
+        estados_validos = tuple(sorted(e for e in estados if e in self.municipios_por_estado))
+        if len(estados_validos) == 1:
+            return self.municipios_por_estado[estados_validos[0]]
+
+        if estados_validos not in self._municipios_combinados:
+            nomes, normalizados = [], []
+            for estado in estados_validos:
+                nomes.extend(self.municipios_por_estado[estado].originais)
+                normalizados.extend(self.municipios_por_estado[estado].normalizados)
+            identificador = f"municipios:{'|'.join(estados_validos)}"
+            self._municipios_combinados[estados_validos] = ListaCandidatos(nomes, identificador, self.cache, normalizados)
+        return self._municipios_combinados[estados_validos]
+
+
+def corrigir_nome(nome_incorreto, candidatos, limiar=85):
+    """
+    Usa fuzzy matching para encontrar o nome mais provável entre os candidatos.
+    Retorna o nome correto ou o original se a similaridade for baixa.
+    """
+    if nome_incorreto == 'Indefinido':
+        return nome_incorreto, False
+
+    nome_normalizado = normalizar(nome_incorreto)
+    if not nome_normalizado:
+        return nome_incorreto, False
+
+    nome_original, melhor_match, score = candidatos.melhor_correspondencia(nome_normalizado)
+
+    if nome_original is not None and score >= limiar:
+        if nome_original.lower() != nome_incorreto.lower():
+            registro.debug("correcao", f"Correção: '{nome_incorreto}' -> '{nome_original}' (Similaridade: {score}%)",
+                           original=nome_incorreto, corrigido=nome_original, score=score)
+            return nome_original, True
+        # O nome já estava correto, apenas com capitalização/acentos diferentes
+        return nome_original, False
+
+    registro.aviso("sem_correspondencia", f"Não foi possível encontrar uma correspondência para '{nome_incorreto}' "
+                   f"(Melhor tentativa: '{melhor_match}' com {score}%). Mantendo o original.",
+                   nome=nome_incorreto, melhor_tentativa=melhor_match, score=score)
+    return nome_incorreto, False
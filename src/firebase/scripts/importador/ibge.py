@@ -0,0 +1,273 @@
+import datetime
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import msgpack
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from importador.cache_correcoes import ARQUIVO_CACHE_CORRECOES, CacheCorrecoes
+from importador.geografia import Gazetteer, versao_dados_geo
+from importador.registro import registro
+from importador.texto import normalizar
+
+URL_BASE_IBGE = "https://servicodados.ibge.gov.br/api/v1/localidades"
+CAMINHO_ESTADOS = "/estados?orderBy=nome"
+CAMINHO_MUNICIPIOS = "/municipios"
+
+# Cache binário compacto, com as estruturas de busca já montadas
+ARQUIVO_CACHE_IBGE = 'dados_ibge.msgpack'
+# Cache JSON antigo; se existir, é convertido para o formato binário na primeira carga
+ARQUIVO_CACHE_IBGE_LEGADO = 'dados_municipios_estados_ibge.json'
+# Aumente sempre que o formato do cache binário mudar
+# (2: códigos numéricos do IBGE de estados e municípios)
+VERSAO_SCHEMA = 2
+
+# Depois desse prazo, o cache é revalidado na API (requisição condicional)
+TTL_CACHE_IBGE_DIAS = 30
+# (conexão, leitura) em segundos; a lista de municípios tem alguns MB
+TIMEOUT_IBGE = (5, 60)
+TENTATIVAS_IBGE = 4
+# Espera entre tentativas: 0,5s, 1s, 2s...
+BACKOFF_IBGE = 0.5
+
+
+def url_base_ibge():
+    """URL da API; a variável IBGE_API_URL permite apontar para um servidor local com respostas gravadas."""
+    return os.environ.get("IBGE_API_URL", URL_BASE_IBGE).rstrip("/")
+
+
+def criar_sessao(tentativas=TENTATIVAS_IBGE, backoff=BACKOFF_IBGE):
+    """
+    Sessão HTTP com conexões reaproveitadas e novas tentativas, com espera
+    exponencial, em erros de conexão e respostas 429/5xx.
+    """
+    retry = Retry(
+        total=tentativas,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+    )
+    sessao = requests.Session()
+    sessao.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=4))
+    sessao.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=4))
+    return sessao
+
+
+def baixar_json(sessao, url, validadores=None):
+    """
+    Faz um GET condicional: com `validadores` ({'etag', 'last_modified'}) de
+    uma resposta anterior, envia If-None-Match/If-Modified-Since.
+    Retorna (dados, validadores novos); `dados` é None se o servidor respondeu 304.
+    """
+    cabecalhos = {}
+    if validadores:
+        if validadores.get('etag'):
+            cabecalhos['If-None-Match'] = validadores['etag']
+        if validadores.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = validadores['last_modified']
+
+    resposta = sessao.get(url, headers=cabecalhos, timeout=TIMEOUT_IBGE)
+    if resposta.status_code == 304:
+        return None, validadores
+    resposta.raise_for_status()
+    novos = {'etag': resposta.headers.get('ETag'), 'last_modified': resposta.headers.get('Last-Modified')}
+    return resposta.json(), novos
+
+
+def buscar_dados_ibge(validadores=None, sessao=None):
+    """
+    Busca estados e municípios na API do IBGE, em paralelo, e agrupa os
+    municípios por estado. Os códigos do IBGE ficam em 'codigos_estados'
+    (nome -> código) e 'codigos_municipios' (estado -> códigos, na mesma ordem
+    de 'municipios_por_estado').
+
+    Com os `validadores` HTTP da última busca, faz requisições condicionais e
+    retorna None se nada mudou. Os validadores da resposta ficam em dados_geo['http'].
+    """
+    validadores = validadores or {}
+    sessao = sessao or criar_sessao()
+    base = url_base_ibge()
+    urls = {'estados': base + CAMINHO_ESTADOS, 'municipios': base + CAMINHO_MUNICIPIOS}
+
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        futuros = {nome: pool.submit(baixar_json, sessao, url, validadores.get(nome)) for nome, url in urls.items()}
+        respostas = {nome: futuro.result() for nome, futuro in futuros.items()}
+
+    if all(dados is None for dados, _ in respostas.values()):
+        return None
+    # Só uma das listas mudou: a outra precisa ser baixada de novo para remontar o cache
+    for nome, (dados, _) in respostas.items():
+        if dados is None:
+            respostas[nome] = baixar_json(sessao, urls[nome])
+
+    estados_raw, municipios_raw = respostas['estados'][0], respostas['municipios'][0]
+    dados_geo = {
+        'estados': {},
+        'municipios_por_estado': {},
+        'sigla_para_nome': {uf['sigla']: uf['nome'] for uf in estados_raw},
+        'codigos_estados': {uf['nome']: uf['id'] for uf in estados_raw},
+        'codigos_municipios': {},
+        'http': {nome: novos for nome, (_, novos) in respostas.items()},
+    }
+
+    for uf in estados_raw:
+        dados_geo['estados'][uf['nome']] = uf['sigla']
+        dados_geo['municipios_por_estado'][uf['nome']] = []
+        dados_geo['codigos_municipios'][uf['nome']] = []
+
+    for municipio in municipios_raw:
+        nome_municipio = municipio['nome']
+        # Tenta o caminho padrão primeiro; se falhar (casos como Brasília), tenta um caminho alternativo
+        try:
+            uf_sigla = municipio['microrregiao']['mesorregiao']['UF']['sigla']
+        except (TypeError, KeyError):
+            try:
+                uf_sigla = municipio['regiao-imediata']['regiao-intermediaria']['UF']['sigla']
+            except (TypeError, KeyError):
+                registro.aviso("municipio_sem_estado", f"Não foi possível determinar o estado para o município '{nome_municipio}'. Ele será ignorado.")
+                continue
+
+        nome_estado = dados_geo['sigla_para_nome'].get(uf_sigla)
+        if nome_estado:
+            dados_geo['municipios_por_estado'][nome_estado].append(nome_municipio)
+            dados_geo['codigos_municipios'][nome_estado].append(municipio['id'])
+
+    return dados_geo
+
+
+def montar_cache(dados_geo, fonte_em):
+    """
+    Acrescenta aos dados do IBGE as estruturas que o Gazetteer teria de montar
+    a cada execução (nomes normalizados, sigla -> nome), a versão do schema, a
+    data da fonte e os validadores HTTP (ETag/Last-Modified) da última busca.
+    Dados sem os códigos do IBGE (cache JSON antigo) ficam com os códigos vazios.
+    """
+    estados = dados_geo['estados']
+    municipios_por_estado = dados_geo['municipios_por_estado']
+    return {
+        'versao_schema': VERSAO_SCHEMA,
+        'fonte_em': fonte_em,
+        'verificado_em': fonte_em,
+        'http': dados_geo.get('http') or {},
+        'versao': versao_dados_geo(dados_geo),
+        'estados': estados,
+        'sigla_para_nome': dados_geo.get('sigla_para_nome') or {sigla: nome for nome, sigla in estados.items()},
+        'municipios_por_estado': municipios_por_estado,
+        'codigos_estados': dados_geo.get('codigos_estados') or {},
+        'codigos_municipios': dados_geo.get('codigos_municipios') or {},
+        'normalizados': {
+            'estados': [normalizar(nome) for nome in estados],
+            'municipios_por_estado': {
+                estado: [normalizar(nome) for nome in municipios]
+                for estado, municipios in municipios_por_estado.items()
+            },
+        },
+    }
+
+
+def salvar_cache(cache, caminho):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        msgpack.pack(cache, f, use_bin_type=True)
+    os.replace(temporario, caminho)
+
+
+def ler_cache(caminho):
+    """Lê o cache binário; retorna None se ele não existir ou for de outra versão do schema."""
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'rb') as f:
+        cache = msgpack.unpack(f, raw=False)
+    if cache.get('versao_schema') != VERSAO_SCHEMA:
+        registro.info("ibge_cache_antigo", f"Cache '{caminho}' está em um formato antigo. Ele será recriado.")
+        return None
+    return cache
+
+
+def cache_expirado(cache, ttl_dias):
+    """Indica se o cache deve ser revalidado; um cache sem os códigos do IBGE é sempre revalidado."""
+    if not cache.get('codigos_estados'):
+        return True
+    verificado_em = datetime.datetime.fromisoformat(cache.get('verificado_em') or cache['fonte_em'])
+    return datetime.datetime.now() - verificado_em >= datetime.timedelta(days=ttl_dias)
+
+
+def revalidar_cache(cache, caminho):
+    """
+    Pergunta à API do IBGE, com requisições condicionais, se os dados mudaram.
+    Se mudaram, remonta o cache; se a API estiver fora do ar, mantém o cache atual.
+    """
+    registro.info("ibge_revalidacao", f"Verificando na API do IBGE se os dados do cache '{caminho}' mudaram...")
+    try:
+        dados_geo = buscar_dados_ibge(cache.get('http'))
+    except (requests.RequestException, ValueError) as e:
+        registro.aviso("ibge_indisponivel", f"Não foi possível consultar a API do IBGE ({e}). Usando o cache existente.")
+        return cache
+
+    agora = datetime.datetime.now().isoformat(timespec='seconds')
+    if dados_geo is None:
+        registro.info("ibge_inalterado", "Os dados do IBGE não mudaram desde a última busca.")
+        cache['verificado_em'] = agora
+    else:
+        novo = montar_cache(dados_geo, agora)
+        if novo['versao'] != cache['versao']:
+            registro.info("ibge_atualizado", "Os dados do IBGE mudaram. O cache foi atualizado.")
+        cache = novo
+    salvar_cache(cache, caminho)
+    return cache
+
+
+def carregar_dados_ibge(caminho=ARQUIVO_CACHE_IBGE, caminho_legado=ARQUIVO_CACHE_IBGE_LEGADO, ttl_dias=TTL_CACHE_IBGE_DIAS):
+    """
+    Carrega os dados geográficos do cache binário.
+    Se ele não existir, converte o cache JSON antigo ou, na falta dele, busca
+    os dados na API do IBGE, e salva o cache binário.
+
+    Um cache verificado há mais de `ttl_dias`, ou sem os códigos do IBGE
+    (convertido do JSON antigo), é revalidado na API antes do uso
+    (ttl_dias=None nunca revalida).
+    """
+    cache = ler_cache(caminho)
+    if cache is not None:
+        registro.info("ibge_cache", f"Carregando dados geográficos do cache '{caminho}' (dados de {cache['fonte_em']})")
+    else:
+        if caminho_legado and os.path.exists(caminho_legado):
+            registro.info("ibge_cache_legado", f"Convertendo o cache antigo '{caminho_legado}' para '{caminho}'")
+            with open(caminho_legado, 'r', encoding='utf-8') as f:
+                dados_geo = json.load(f)
+            fonte_em = datetime.datetime.fromtimestamp(os.path.getmtime(caminho_legado)).isoformat(timespec='seconds')
+        else:
+            registro.info("ibge_api", "Cache não encontrado. Buscando dados da API do IBGE...")
+            dados_geo = buscar_dados_ibge()
+            fonte_em = datetime.datetime.now().isoformat(timespec='seconds')
+
+        cache = montar_cache(dados_geo, fonte_em)
+        salvar_cache(cache, caminho)
+        registro.info("ibge_cache_salvo", f"Dados do IBGE salvos em cache ('{caminho}').")
+
+    if ttl_dias is not None and cache_expirado(cache, ttl_dias):
+        cache = revalidar_cache(cache, caminho)
+    if not cache['codigos_estados']:
+        registro.aviso("ibge_sem_codigos", "Os dados do IBGE estão sem os códigos numéricos (cache JSON antigo); os "
+                       "projetos ficarão sem 'codigosEstados'/'codigosMunicipios' até o cache ser revalidado na API.")
+    return cache
+
+
+_gazetteers = {}
+
+
+def obter_gazetteer(caminho=ARQUIVO_CACHE_IBGE, caminho_legado=ARQUIVO_CACHE_IBGE_LEGADO, usar_cache_correcoes=True,
+                    ttl_dias=TTL_CACHE_IBGE_DIAS):
+    """
+    Retorna o Gazetteer, carregando os dados do IBGE apenas no primeiro uso.
+    As correções fuzzy ficam em 'cache_correcoes.json', ao lado do cache do IBGE.
+    """
+    if caminho not in _gazetteers:
+        dados_geo = carregar_dados_ibge(caminho, caminho_legado, ttl_dias)
+        cache_correcoes = None
+        if usar_cache_correcoes:
+            cache_correcoes = CacheCorrecoes(os.path.join(os.path.dirname(caminho), ARQUIVO_CACHE_CORRECOES))
+        _gazetteers[caminho] = Gazetteer(dados_geo, cache=cache_correcoes)
+    return _gazetteers[caminho]
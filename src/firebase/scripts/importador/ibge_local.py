@@ -0,0 +1,121 @@
+"""
+Servidor HTTP local que imita a API de localidades do IBGE com respostas gravadas.
+
+Serve '/estados' e '/municipios' a partir de 'estados.json' e 'municipios.json'
+de uma pasta, com ETag e Last-Modified, e responde 304 às requisições
+condicionais. Com --falhas N, as N primeiras requisições recebem 503, para
+exercitar as novas tentativas do importador.
+
+Exemplos:
+    python -m importador.ibge_local respostas_ibge --gravar
+    python -m importador.ibge_local respostas_ibge --porta 8099
+    IBGE_API_URL=http://localhost:8099 python -m importador planilha.xlsx --layout geral
+"""
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importador.ibge import CAMINHO_ESTADOS, CAMINHO_MUNICIPIOS, URL_BASE_IBGE, baixar_json, criar_sessao
+
+ARQUIVOS = {"/estados": "estados.json", "/municipios": "municipios.json"}
+
+
+def gravar_respostas(pasta, url_base=URL_BASE_IBGE):
+    """Baixa as respostas da API real e as grava na pasta, para servir depois."""
+    os.makedirs(pasta, exist_ok=True)
+    sessao = criar_sessao()
+    for caminho, arquivo in (("/estados", CAMINHO_ESTADOS), ("/municipios", CAMINHO_MUNICIPIOS)):
+        dados, _ = baixar_json(sessao, url_base + arquivo)
+        with open(os.path.join(pasta, ARQUIVOS[caminho]), 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+    print(f"Respostas do IBGE gravadas em '{pasta}'.")
+
+
+def criar_servidor(pasta, porta=0, falhas=0):
+    """Cria o servidor (porta 0 escolhe uma porta livre); chame serve_forever() ou use servir()."""
+    estado = {"falhas": falhas, "requisicoes": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            estado["requisicoes"] += 1
+            if estado["falhas"] > 0:
+                estado["falhas"] -= 1
+                self.send_error(503, "Falha simulada")
+                return
+
+            arquivo = ARQUIVOS.get(self.path.split("?")[0])
+            if arquivo is None or not os.path.exists(os.path.join(pasta, arquivo)):
+                self.send_error(404)
+                return
+
+            caminho = os.path.join(pasta, arquivo)
+            with open(caminho, 'rb') as f:
+                conteudo = f.read()
+            etag = f'"{hashlib.sha1(conteudo).hexdigest()}"'
+            modificado_em = int(os.path.getmtime(caminho))
+
+            if self.headers.get("If-None-Match") == etag or self._nao_modificado(modificado_em):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", email.utils.formatdate(modificado_em, usegmt=True))
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def _nao_modificado(self, modificado_em):
+            # If-Modified-Since só vale quando o cliente não mandou um ETag
+            if self.headers.get("If-None-Match") or not self.headers.get("If-Modified-Since"):
+                return False
+            data = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+            return modificado_em <= data.timestamp()
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+    servidor.estado = estado
+    return servidor
+
+
+def servir(pasta, porta=0, falhas=0):
+    """Inicia o servidor em segundo plano e retorna (servidor, url). Encerre com servidor.shutdown()."""
+    servidor = criar_servidor(pasta, porta, falhas)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.ibge_local",
+        description="Serve respostas gravadas da API de localidades do IBGE.",
+    )
+    parser.add_argument("pasta", help="pasta com estados.json e municipios.json")
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--falhas", type=int, default=0, help="responde 503 às N primeiras requisições")
+    parser.add_argument("--gravar", action="store_true", help="grava as respostas da API real na pasta e sai")
+    args = parser.parse_args(argv)
+
+    if args.gravar:
+        gravar_respostas(args.pasta)
+        return 0
+
+    servidor = criar_servidor(args.pasta, args.porta, args.falhas)
+    print(f"Servindo respostas do IBGE em http://127.0.0.1:{args.porta} (use IBGE_API_URL com esse endereço).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,15 @@
+"""
+Formatos de planilha suportados pelo importador. Para adicionar um novo,
+crie um módulo com uma instância de Layout e registre-a em LAYOUTS.
+"""
+from importador.layouts.anual import ANUAL
+from importador.layouts.base import Layout
+from importador.layouts.geral import GERAL
+
+LAYOUTS = {layout.nome: layout for layout in (GERAL, ANUAL)}
+
+
+def obter_layout(nome):
+    if nome not in LAYOUTS:
+        raise ValueError(f"Layout '{nome}' desconhecido. Use um de: {', '.join(LAYOUTS)}.")
+    return LAYOUTS[nome]
@@ -0,0 +1,9 @@
+from importador.layouts.base import Layout
+
+# Abas por período da planilha geral: estados por sigla e data de aprovação tirada da coluna 'ano'
+ANUAL = Layout(
+    nome="anual",
+    descricao='Abas por período (planilhageral.xlsx): siglas de estados e coluna "ano"',
+    abas=["2005-2013", "2014-2025"],
+    estados_por_sigla=True,
+)
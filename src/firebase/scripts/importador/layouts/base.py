@@ -0,0 +1,33 @@
+from importador.leis import MAPEADOR_LEIS
+from importador.limpeza import COLUNAS_PLANILHA, limpar_planilha
+
+
+class Layout:
+    """
+    Descreve o formato de uma planilha: quais abas ler por padrão, como mapear
+    as leis e como interpretar estados e datas. Cada formato novo de planilha
+    é um módulo em importador/layouts com uma instância desta classe.
+
+    `leis` é um MapeadorLeis; por padrão, todos os layouts usam as mesmas regras
+    (importador.leis.REGRAS_LEIS), para que a mesma célula vire sempre a mesma lei.
+
+    `colunas` ({nome em minúsculas: tipo}) são as colunas lidas do arquivo;
+    as demais são ignoradas já na leitura.
+    """
+
+    def __init__(self, nome, descricao, abas, leis=MAPEADOR_LEIS, estados_por_sigla=False, data_aprovado=None,
+                 colunas=COLUNAS_PLANILHA):
+        self.nome = nome
+        self.descricao = descricao
+        self.abas = list(abas)
+        self.leis = leis
+        self.estados_por_sigla = estados_por_sigla
+        self.data_aprovado = data_aprovado
+        self.colunas = colunas
+
+    def limpar(self, df, gazetteer):
+        """Limpa um bloco da planilha e devolve os projetos prontos para escrita."""
+        return limpar_planilha(
+            df, gazetteer, self.leis,
+            estados_por_sigla=self.estados_por_sigla, data_aprovado=self.data_aprovado,
+        )
@@ -0,0 +1,10 @@
+import datetime
+from importador.layouts.base import Layout
+
+# Aba "Geral" da planilha de 2024: estados por extenso e data de aprovação fixa em 2024
+GERAL = Layout(
+    nome="geral",
+    descricao='Aba "Geral" (planilha2024.xlsx): estados por extenso, aprovação em 2024',
+    abas=["Geral"],
+    data_aprovado=datetime.datetime(2024, 1, 1, 3),
+)
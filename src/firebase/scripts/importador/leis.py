@@ -0,0 +1,113 @@
+"""
+Catálogo das leis de incentivo e regras para reconhecê-las nas planilhas.
+
+Cada regra é uma linha da tabela REGRAS_LEIS: a lei, as palavras que devem
+aparecer todas e as palavras das quais pelo menos uma deve aparecer. As regras
+são avaliadas em ordem e a primeira que casar define a lei; por isso as mais
+específicas (ex.: ICMS RJ Esporte) vêm antes das genéricas (ex.: Esporte).
+
+As palavras de todas as regras são compiladas em uma única expressão regular,
+que encontra em uma só passada quais delas aparecem no texto.
+"""
+import re
+from importador.registro import registro
+
+# Leis exibidas no site, na ordem em que aparecem em 'dadosEstados' (criarDocsDadosEstados)
+LEIS = [
+    "Lei de Incentivo à Cultura",
+    "PROAC - Programa de Ação Cultural",
+    "FIA - Lei Fundo para a Infância e Adolescência",
+    "LIE - Lei de Incentivo ao Esporte",
+    "Lei da Pessoa Idosa",
+    "Pronas - Programa Nacional de Apoio à Atenção da Saúde da Pessoa com Deficiência",
+    "Pronon - Programa Nacional de Apoio à Atenção Oncológica",
+    "Promac - Programa de Incentivo à Cultura do Município de São Paulo",
+    "ICMS - MG Imposto sobre Circulação de Mercadoria e Serviços",
+    "ICMS - RJ Imposto sobre Circulação de Mercadoria e Serviços",
+    "PIE - Lei Paulista de Incentivo ao Esporte",
+]
+
+# (lei, palavras que devem aparecer todas, palavras das quais ao menos uma deve aparecer)
+REGRAS_LEIS = [
+    ("ICMS - RJ Imposto sobre Circulação de Mercadoria e Serviços (Esporte)", ("ICMS", "RJ", "ESPORTE"), ()),
+    ("ICMS - RJ Imposto sobre Circulação de Mercadoria e Serviços (Cultura)", ("ICMS", "RJ", "CULTURA"), ()),
+    ("ICMS - RJ Imposto sobre Circulação de Mercadoria e Serviços", ("ICMS", "RJ"), ()),
+    ("ICMS - MG Imposto sobre Circulação de Mercadoria e Serviços (Esporte)", ("ICMS", "MG", "ESPORTE"), ()),
+    ("ICMS - MG Imposto sobre Circulação de Mercadoria e Serviços (Cultura)", ("ICMS", "MG", "CULTURA"), ()),
+    ("ICMS - MG Imposto sobre Circulação de Mercadoria e Serviços", ("ICMS", "MG"), ()),
+    ("FIA - Lei Fundo para a Infância e Adolescência", (), ("FIA", "INFÂNCIA")),
+    ("Lei da Pessoa Idosa", ("IDOSO",), ()),
+    ("PROAC - Programa de Ação Cultural", ("PROAC",), ()),
+    ("Pronas - Programa Nacional de Apoio à Atenção da Saúde da Pessoa com Deficiência", ("PRONAS",), ()),
+    ("Pronon - Programa Nacional de Apoio à Atenção Oncológica", ("PRONON",), ()),
+    ("Promac - Programa de Incentivo à Cultura do Município de São Paulo", ("PROMAC",), ()),
+    ("PIE - Lei Paulista de Incentivo ao Esporte", ("PIE",), ()),
+    ("LIE - Lei de Incentivo ao Esporte", (), ("ESPORTE", "LIE")),
+    ("Lei de Incentivo à Cultura", (), ("ROUANET", "CULTURA")),
+]
+
+# Grupos de contadores do registro que aparecem no resumo da importação
+CONTADOR_LEIS = "Registros por lei"
+CONTADOR_SEM_MAPEAMENTO = "Leis sem mapeamento (registros)"
+
+
+class MapeadorLeis:
+    """
+    Regras de REGRAS_LEIS compiladas uma única vez.
+
+    Cada palavra vira um bit; cada regra, um par de máscaras (todas, alguma).
+    Classificar um texto é uma busca com a expressão combinada seguida de
+    operações de bits, sem uma verificação `in` por palavra e por regra.
+    """
+
+    def __init__(self, regras=REGRAS_LEIS):
+        self.regras = list(regras)
+        palavras = sorted({p for _, todas, alguma in self.regras for p in (*todas, *alguma)}, key=len, reverse=True)
+        bits = {palavra: 1 << i for i, palavra in enumerate(palavras)}
+
+        # A busca fica com a palavra mais longa que começa em cada posição; as
+        # palavras contidas nela (ex.: um prefixo) são somadas aqui
+        self._bits = {
+            palavra: sum(bit for outra, bit in bits.items() if outra in palavra)
+            for palavra in palavras
+        }
+        # Lookahead para que palavras sobrepostas sejam todas encontradas
+        self._padrao = re.compile("(?=(" + "|".join(re.escape(palavra) for palavra in palavras) + "))")
+        self._mascaras = [
+            (lei, sum(bits[p] for p in todas), sum(bits[p] for p in alguma))
+            for lei, todas, alguma in self.regras
+        ]
+
+    def classificar(self, texto):
+        """Retorna a lei padrão correspondente ao texto da planilha, ou None se nenhuma regra casar."""
+        presentes = 0
+        for encontrada in self._padrao.finditer(texto.upper().strip()):
+            presentes |= self._bits[encontrada.group(1)]
+        for lei, todas, alguma in self._mascaras:
+            if presentes & todas == todas and (not alguma or presentes & alguma):
+                return lei
+        return None
+
+    def mapear_coluna(self, serie, padrao="Indefinido"):
+        """
+        Converte a coluna de leis para os nomes padrão usados no website,
+        classificando cada texto distinto uma única vez. Textos sem regra são
+        mantidos e contados no registro, junto com os acertos de cada lei.
+        """
+        texto = serie.dropna().astype(str)
+        ocorrencias = texto.value_counts()
+        mapa = {}
+        for valor, quantidade in ocorrencias.items():
+            lei = self.classificar(valor)
+            if lei is None:
+                registro.debug("lei_sem_mapeamento", f"Lei '{valor}' não possui mapeamento. Usando o nome original.",
+                               lei=valor, registros=int(quantidade))
+                registro.contar(CONTADOR_SEM_MAPEAMENTO, valor, int(quantidade))
+                lei = valor
+            else:
+                registro.contar(CONTADOR_LEIS, lei, int(quantidade))
+            mapa[valor] = lei
+        return texto.map(mapa).reindex(serie.index).fillna(padrao).astype(object)
+
+
+MAPEADOR_LEIS = MapeadorLeis()
@@ -0,0 +1,346 @@
+"""
+Leitura das planilhas de projetos, em blocos e apenas com as colunas usadas.
+
+O formato vem da extensão do arquivo:
+- .xlsx/.xlsm: lida em streaming com openpyxl (ou inteira com o pandas);
+- .ods: lida com o pandas (odfpy), todas as abas pedidas de uma vez;
+- .csv e .parquet: uma tabela por arquivo. Um arquivo avulso é a única aba
+  pedida; uma pasta traz um arquivo por aba (<aba>.csv ou <aba>.parquet).
+
+Com `colunas` ({nome em minúsculas: tipo}), só as colunas usadas pela limpeza
+são montadas em DataFrames, já com os tipos definidos (ex.: 'lei' e 'estado'
+como categorias). Parquet exige o pacote opcional pyarrow.
+
+Uma planilha grande pode ser convertida uma única vez e reimportada depois,
+com leitura muito mais rápida e menos memória:
+    python -m importador.leitura planilhageral.xlsx exportacao/ --layout anual
+    python -m importador exportacao/ --layout anual
+"""
+import argparse
+import codecs
+import os
+from operator import itemgetter
+import openpyxl
+import pandas as pd
+from importador.layouts import LAYOUTS, obter_layout
+
+# Quantidade de linhas lidas por bloco no modo streaming
+TAMANHO_BLOCO = 2000
+
+EXTENSOES_EXCEL = ('.xlsx', '.xlsm')
+# Formatos com uma única tabela por arquivo, na ordem de preferência dentro de uma pasta
+EXTENSOES_TABELA = ('.parquet', '.csv')
+FORMATOS_CONVERSAO = ('parquet', 'csv')
+
+# Codificações tentadas nos CSV: UTF-8 (com ou sem BOM) e a do Excel em português
+CODIFICACOES_CSV = ('utf-8-sig', 'latin-1')
+# Bytes do início do CSV usados para escolher a codificação
+AMOSTRA_CSV = 1 << 20
+
+
+def nomes_colunas(cabecalho):
+    """Nomeia as colunas como o pandas faz, usando 'Unnamed: N' para cabeçalhos vazios."""
+    return [f"Unnamed: {i}" if valor is None else str(valor) for i, valor in enumerate(cabecalho)]
+
+
+def normalizar_coluna(nome):
+    """Nome da coluna como a limpeza o usa: minúsculas e sem espaços nas pontas."""
+    return str(nome).lower().strip()
+
+
+def selecionar_colunas(nomes, colunas):
+    """Nomes, na ordem do arquivo, das colunas pedidas em `colunas`; todos, se `colunas` for None."""
+    if colunas is None:
+        return list(nomes)
+    return [nome for nome in nomes if normalizar_coluna(nome) in colunas]
+
+
+def tipar_colunas(df, colunas):
+    """Aplica os tipos de `colunas` ({nome normalizado: tipo ou None}) às colunas do DataFrame."""
+    if colunas is None:
+        return df
+    tipos = {}
+    for nome in df.columns:
+        tipo = colunas.get(normalizar_coluna(nome))
+        if tipo is not None and df[nome].dtype != tipo:
+            tipos[nome] = tipo
+    return df.astype(tipos) if tipos else df
+
+
+def _em_blocos(df, tamanho_bloco):
+    """Divide um DataFrame já lido em blocos, para o checkpoint avançar aos poucos."""
+    if tamanho_bloco is None:
+        yield df
+        return
+    for inicio in range(0, len(df), tamanho_bloco):
+        yield df.iloc[inicio:inicio + tamanho_bloco]
+
+
+def importar_parquet():
+    """Importa pyarrow.parquet, que é opcional, com uma mensagem clara se ele não estiver instalado."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Ler ou gravar Parquet exige o pacote opcional 'pyarrow' (pip install pyarrow).") from e
+    return pq
+
+
+# --- Excel (.xlsx) ---
+
+def ler_aba_em_blocos(planilha, aba, tamanho_bloco, apos=-1, colunas=None):
+    """
+    Percorre uma aba aberta em modo read_only e gera DataFrames de até
+    `tamanho_bloco` linhas. O índice segue a numeração que o pd.read_excel daria.
+    Linhas com índice até `apos` (já importadas) são puladas sem montar DataFrames.
+    Só as `colunas` pedidas são copiadas de cada linha.
+    """
+    linhas = planilha[aba].iter_rows(values_only=True)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+
+    nomes = nomes_colunas(cabecalho)
+    selecionadas = selecionar_colunas(nomes, colunas)
+    posicoes = [nomes.index(nome) for nome in selecionadas]
+    if len(posicoes) == 1:
+        projetar = lambda linha: (linha[posicoes[0]],)
+    else:
+        projetar = itemgetter(*posicoes) if posicoes else (lambda linha: ())
+
+    bloco, indices = [], []
+    for posicao, linha in enumerate(linhas):
+        if posicao <= apos:
+            continue
+        if len(linha) < len(nomes):
+            linha = tuple(linha) + (None,) * (len(nomes) - len(linha))
+        linha = projetar(linha)
+        # Linhas sem nenhum valor nas colunas usadas não geram projeto; não vale a pena guardá-las
+        if all(valor is None for valor in linha):
+            continue
+        bloco.append(linha)
+        indices.append(posicao)
+        if len(bloco) >= tamanho_bloco:
+            yield tipar_colunas(pd.DataFrame(bloco, columns=selecionadas, index=indices), colunas)
+            bloco, indices = [], []
+
+    if bloco:
+        yield tipar_colunas(pd.DataFrame(bloco, columns=selecionadas, index=indices), colunas)
+
+
+def ler_excel(caminho, abas, tamanho_bloco, retomar_apos, colunas):
+    if tamanho_bloco is None:
+        usar = None if colunas is None else (lambda nome: normalizar_coluna(nome) in colunas)
+        for aba, df in pd.read_excel(caminho, sheet_name=list(abas), usecols=usar).items():
+            yield aba, tipar_colunas(df[df.index > retomar_apos.get(aba, -1)], colunas)
+        return
+
+    planilha = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        faltando = [aba for aba in abas if aba not in planilha.sheetnames]
+        if faltando:
+            raise ValueError(f"Worksheet named '{faltando[0]}' not found")
+
+        for aba in abas:
+            for bloco in ler_aba_em_blocos(planilha, aba, tamanho_bloco, retomar_apos.get(aba, -1), colunas):
+                yield aba, bloco
+    finally:
+        planilha.close()
+
+
+# --- OpenDocument (.ods) ---
+
+def ler_ods(caminho, abas, tamanho_bloco, retomar_apos, colunas):
+    """O odfpy não lê em streaming: o arquivo é analisado uma vez, com todas as abas pedidas."""
+    if not abas:
+        return
+    usar = None if colunas is None else (lambda nome: normalizar_coluna(nome) in colunas)
+    for aba, df in pd.read_excel(caminho, sheet_name=list(abas), usecols=usar, engine="odf").items():
+        df = tipar_colunas(df[df.index > retomar_apos.get(aba, -1)].dropna(how="all"), colunas)
+        for bloco in _em_blocos(df, tamanho_bloco):
+            yield aba, bloco
+
+
+# --- Tabelas (.csv e .parquet) ---
+
+def localizar_tabelas(caminho, abas):
+    """
+    Associa cada aba pedida a um arquivo de tabela. Em uma pasta, a aba X é o
+    arquivo X.parquet ou X.csv; um arquivo avulso só pode ser uma única aba.
+    Levanta ValueError se alguma aba não for encontrada.
+    """
+    if not abas:
+        return {}
+    if not os.path.isdir(caminho):
+        if len(abas) > 1:
+            raise ValueError(f"O arquivo '{caminho}' tem uma única tabela; informe uma aba (--abas) "
+                             f"ou use uma pasta com um arquivo por aba")
+        return {abas[0]: caminho}
+
+    tabelas = {}
+    for aba in abas:
+        for extensao in EXTENSOES_TABELA:
+            arquivo = os.path.join(caminho, aba + extensao)
+            if os.path.exists(arquivo):
+                tabelas[aba] = arquivo
+                break
+        else:
+            raise ValueError(f"Worksheet named '{aba}' not found")
+    return tabelas
+
+
+def codificacao_csv(caminho):
+    """Primeira codificação de CODIFICACOES_CSV que decodifica o início do arquivo."""
+    with open(caminho, 'rb') as f:
+        amostra = f.read(AMOSTRA_CSV)
+    for codificacao in CODIFICACOES_CSV:
+        try:
+            codecs.getincrementaldecoder(codificacao)().decode(amostra, final=False)
+            return codificacao
+        except UnicodeDecodeError:
+            continue
+    return CODIFICACOES_CSV[-1]
+
+
+def ler_csv(caminho, tamanho_bloco, apos, colunas):
+    """
+    Lê um CSV separado por vírgula ou ponto e vírgula (o do Excel em português).
+    As colunas de texto são lidas como texto, sem o pandas tentar converter
+    valores como "001" em números.
+    """
+    codificacao = codificacao_csv(caminho)
+    with open(caminho, 'r', encoding=codificacao) as f:
+        primeira_linha = f.readline()
+    separador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+
+    opcoes = {"sep": separador, "encoding": codificacao}
+    nomes = pd.read_csv(caminho, nrows=0, **opcoes).columns
+    selecionadas = selecionar_colunas(nomes, colunas)
+    tipos = None
+    if colunas is not None:
+        tipos = {nome: colunas[normalizar_coluna(nome)] for nome in selecionadas if colunas[normalizar_coluna(nome)]}
+
+    partes = pd.read_csv(caminho, usecols=selecionadas, dtype=tipos, chunksize=tamanho_bloco, **opcoes)
+    for df in ([partes] if tamanho_bloco is None else partes):
+        df = df[df.index > apos].dropna(how="all")
+        if not df.empty:
+            yield df
+
+
+def ler_parquet(caminho, tamanho_bloco, apos, colunas):
+    """Lê só as colunas pedidas do Parquet, em lotes de `tamanho_bloco` linhas."""
+    pq = importar_parquet()
+    arquivo = pq.ParquetFile(caminho)
+    selecionadas = selecionar_colunas(arquivo.schema_arrow.names, colunas)
+    lotes = [arquivo.read(columns=selecionadas)] if tamanho_bloco is None else \
+        arquivo.iter_batches(batch_size=tamanho_bloco, columns=selecionadas)
+
+    inicio = 0
+    for lote in lotes:
+        df = lote.to_pandas()
+        df.index = pd.RangeIndex(inicio, inicio + len(df))
+        inicio += len(df)
+        df = tipar_colunas(df[df.index > apos].dropna(how="all"), colunas)
+        if not df.empty:
+            yield df
+
+
+def ler_tabelas(caminho, abas, tamanho_bloco, retomar_apos, colunas):
+    for aba, arquivo in localizar_tabelas(caminho, abas).items():
+        ler = ler_parquet if arquivo.lower().endswith('.parquet') else ler_csv
+        for bloco in ler(arquivo, tamanho_bloco, retomar_apos.get(aba, -1), colunas):
+            yield aba, bloco
+
+
+def ler_planilha(caminho, abas, tamanho_bloco=TAMANHO_BLOCO, retomar_apos=None, colunas=None):
+    """
+    Gera pares (aba, DataFrame) com as linhas das abas pedidas.
+
+    Com `tamanho_bloco`, o arquivo é lido em blocos (no .xlsx, com openpyxl em
+    modo read_only), então o processamento começa antes do fim da leitura e a
+    memória não cresce com o tamanho do arquivo. Com `tamanho_bloco=None`,
+    cada aba é lida inteira com o pandas (comportamento antigo).
+
+    `retomar_apos` ({aba: índice}) pula as linhas já importadas de cada aba,
+    ao retomar uma importação a partir do checkpoint.
+
+    `colunas` ({nome em minúsculas: tipo}, ex.: Layout.colunas) limita a
+    leitura às colunas usadas e define os seus tipos; com None, todas as
+    colunas são lidas como o pandas as interpreta.
+
+    Levanta ValueError se alguma aba não existir, como o pd.read_excel, ou se
+    o formato do arquivo não for suportado.
+    """
+    retomar_apos = retomar_apos or {}
+    extensao = os.path.splitext(caminho)[1].lower()
+    if os.path.isdir(caminho) or extensao in EXTENSOES_TABELA:
+        yield from ler_tabelas(caminho, abas, tamanho_bloco, retomar_apos, colunas)
+    elif extensao == '.ods':
+        yield from ler_ods(caminho, abas, tamanho_bloco, retomar_apos, colunas)
+    elif extensao in EXTENSOES_EXCEL:
+        yield from ler_excel(caminho, abas, tamanho_bloco, retomar_apos, colunas)
+    else:
+        suportados = ', '.join(EXTENSOES_EXCEL + ('.ods',) + EXTENSOES_TABELA)
+        raise ValueError(f"Formato '{extensao}' não suportado. Use um de: {suportados} (ou uma pasta de tabelas).")
+
+
+# --- Conversão ---
+
+def _colunas_mistas_como_texto(df):
+    """
+    Colunas sem tipo definido podem misturar números e textos (ex.: 'aportado'
+    com 1500 e "R$ 1.234,56"), o que o Parquet não aceita; elas viram texto,
+    que a limpeza converte do mesmo jeito.
+    """
+    mistas = [nome for nome in df.columns
+              if df[nome].dtype == object and df[nome].dropna().map(type).nunique() > 1]
+    return df.astype({nome: "string" for nome in mistas}) if mistas else df
+
+
+def converter_planilha(caminho, destino, abas, colunas=None, formato="parquet"):
+    """
+    Grava cada aba em `destino`/<aba>.<formato>, só com as colunas usadas e já
+    tipadas. A pasta resultante pode ser importada no lugar da planilha.
+    Retorna {aba: linhas gravadas}.
+    """
+    if formato not in FORMATOS_CONVERSAO:
+        raise ValueError(f"Formato '{formato}' inválido. Use um de: {', '.join(FORMATOS_CONVERSAO)}.")
+    if formato == "parquet":
+        importar_parquet()
+    os.makedirs(destino, exist_ok=True)
+
+    linhas = {}
+    for aba, df in ler_planilha(caminho, abas, tamanho_bloco=None, colunas=colunas):
+        arquivo = os.path.join(destino, f"{aba}.{formato}")
+        temporario = f"{arquivo}.tmp"
+        if formato == "parquet":
+            _colunas_mistas_como_texto(df).to_parquet(temporario, index=False)
+        else:
+            df.to_csv(temporario, index=False)
+        os.replace(temporario, arquivo)
+        linhas[aba] = len(df)
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.leitura",
+        description="Converte uma planilha em uma pasta com um arquivo Parquet (ou CSV) por aba, "
+                    "só com as colunas usadas na importação.",
+    )
+    parser.add_argument("planilha", help="planilha de origem (.xlsx, .ods, .csv ou .parquet)")
+    parser.add_argument("destino", help="pasta onde gravar um arquivo por aba")
+    parser.add_argument("--layout", required=True, choices=sorted(LAYOUTS), help="layout que define abas e colunas")
+    parser.add_argument("--abas", nargs="+", help="abas a converter (padrão: as abas do layout)")
+    parser.add_argument("--formato", choices=FORMATOS_CONVERSAO, default="parquet",
+                        help="'parquet' exige o pacote pyarrow")
+    args = parser.parse_args(argv)
+
+    layout = obter_layout(args.layout)
+    linhas = converter_planilha(args.planilha, args.destino, args.abas or layout.abas, layout.colunas, args.formato)
+    for aba, quantidade in linhas.items():
+        print(f"'{aba}': {quantidade} linha(s) em '{os.path.join(args.destino, aba)}.{args.formato}'")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+import datetime
+import pandas as pd
+from importador.geografia import LIMIAR_SEM_ESTADO, corrigir_nome
+from importador.registro import registro
+from importador.texto import normalizar
+
+# Separadores usados nas células com mais de um estado/município (ex.: "RJ/MG", "Volta Redonda, Barra Mansa")
+SEPARADORES = r'\s*[/,-]\s*'
+
+# Contadores de qualidade dos dados, no resumo da importação e no plano da simulação
+CONTADOR_ESTADOS_DESCONHECIDOS = "Estados não reconhecidos (registros)"
+CONTADOR_MUNICIPIOS_DESCONHECIDOS = "Municípios sem correspondência (registros)"
+
+COLUNAS_PROJETO = [
+    'nome', 'instituicao', 'lei', 'valorAprovado', 'indicacao', 'dataAprovado',
+    'estados', 'municipios', 'codigosEstados', 'codigosMunicipios', 'status', 'ativo', 'compliance', 'empresas',
+]
+
+# Colunas da planilha usadas na limpeza (nomes em minúsculas) e o tipo com que são lidas.
+# 'lei' e 'estado' repetem poucos valores e ficam como categorias; None mantém o que vier
+# do arquivo ('aportado' e 'ano' misturam números e textos). As demais colunas nem são lidas.
+COLUNAS_PLANILHA = {
+    'projeto': 'string',
+    'proponente': 'string',
+    'indicação': 'string',
+    'lei': 'category',
+    'aportado': None,
+    'ano': None,
+    'estado': 'category',
+    'município': 'string',
+}
+
+
+def coluna(df, nome):
+    """Retorna a coluna pedida ou uma coluna vazia, caso ela não exista na planilha."""
+    if nome in df.columns:
+        return df[nome]
+    return pd.Series(pd.NA, index=df.index, dtype="object")
+
+
+def limpar_texto(serie, descricao):
+    """Remove espaços das células de texto e usa 'Indefinido' nas vazias."""
+    texto = serie.astype("string").str.strip()
+    vazios = int(texto.isna().sum())
+    if vazios:
+        registro.aviso("campo_vazio", f"{descricao} não encontrado(a). Usando 'Indefinido'.",
+                       campo=descricao, registros=vazios)
+    return texto.fillna("Indefinido").astype(object)
+
+
+def converter_valores(serie):
+    """
+    Converte uma coluna de valores (números ou textos como "R$ 1.234,56") para float.
+    Células sem número viram 0.0.
+    """
+    numeros = pd.to_numeric(serie, errors='coerce').astype(float)
+    eh_texto = serie.map(type).eq(str)
+
+    texto = serie[eh_texto].astype("string").str.extract(r'([\d.,]+)', expand=False)
+    # Com vírgula: formato brasileiro (1.234,56). Sem vírgula e com vários pontos: separador de milhar.
+    com_virgula = texto.str.contains(',', regex=False, na=False)
+    varios_pontos = texto.str.count(r'\.').gt(1)
+    texto = texto.mask(com_virgula, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    texto = texto.mask(~com_virgula & varios_pontos, texto.str.replace('.', '', regex=False))
+
+    numeros[eh_texto] = pd.to_numeric(texto, errors='coerce').astype(float)
+    return numeros.fillna(0.0).astype(float)
+
+
+def separar_valores(serie):
+    """
+    Quebra as células com vários valores e devolve uma série "explodida":
+    uma linha por valor, indexada pela linha original.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    partes = serie.fillna("Indefinido").astype(str).str.split(SEPARADORES, regex=True).explode().str.strip()
+    return partes[partes.astype(bool)]
+
+
+def agrupar_listas(explodido, indice):
+    """Junta a série explodida de volta em uma lista ordenada e sem repetições por linha."""
+    listas = explodido.groupby(level=0).agg(lambda valores: sorted(set(valores)))
+    return listas.reindex(indice).apply(lambda v: v if isinstance(v, list) else [])
+
+
+def corrigir_estados_por_nome(explodido, gazetteer):
+    """Corrige nomes completos de estados, uma vez por grafia distinta."""
+    mapa = {nome: corrigir_nome(nome, gazetteer.estados)[0] for nome in explodido.unique()}
+    corrigidos = explodido.map(mapa)
+    desconhecidos = ~corrigidos.isin(gazetteer.estado_para_sigla) & corrigidos.ne("Indefinido")
+    for nome, quantidade in explodido[desconhecidos].value_counts().items():
+        registro.contar(CONTADOR_ESTADOS_DESCONHECIDOS, nome, int(quantidade))
+    return corrigidos
+
+
+def corrigir_estados_por_sigla(explodido, gazetteer):
+    """Converte siglas de estados para o nome completo."""
+    siglas = explodido.str.upper()
+    nomes = siglas.map(gazetteer.sigla_para_nome)
+    desconhecidas = siglas[nomes.isna() & siglas.ne("INDEFINIDO")]
+    for sigla, quantidade in desconhecidas.value_counts().items():
+        registro.aviso("sigla_desconhecida", f"Sigla de estado '{sigla}' não reconhecida. Mantendo o valor original.", sigla=sigla)
+        registro.contar(CONTADOR_ESTADOS_DESCONHECIDOS, sigla, int(quantidade))
+    # Mantém a sigla original (em maiúsculas) quando não reconhecida
+    return nomes.fillna(siglas.replace("INDEFINIDO", "Indefinido"))
+
+
+def corrigir_municipios(municipios, estados, gazetteer):
+    """
+    Corrige os municípios usando como contexto os estados da mesma linha.
+    A correção fuzzy roda uma única vez por par (município, estados).
+
+    Nas linhas sem estado válido, os municípios são corrigidos contra todos os
+    municípios do país (Gazetteer.indice_municipios) e, quando o município
+    corrigido existe em um único estado, esse estado é inferido.
+
+    Retorna (municípios corrigidos, estados inferidos), ambas séries explodidas
+    indexadas pela linha original.
+    """
+    contexto = estados.apply(lambda lista: tuple(e for e in lista if e in gazetteer.municipios_por_estado))
+    pares = pd.DataFrame({'municipio': municipios, 'contexto': contexto.reindex(municipios.index)})
+
+    sem_contexto = pares['contexto'].map(len).eq(0) & pares['municipio'].ne("Indefinido")
+    linhas_sem_contexto = pares.index[sem_contexto].nunique()
+    if linhas_sem_contexto:
+        registro.aviso("sem_estado_valido", "Registro sem estados válidos; os municípios foram corrigidos com base em "
+                       "todos os municípios do país.", registros=int(linhas_sem_contexto))
+
+    correcoes, desconhecidos = {}, set()
+    for municipio, estados_linha in pares.drop_duplicates().itertuples(index=False):
+        if municipio == "Indefinido":
+            correcoes[(municipio, estados_linha)] = municipio
+            continue
+        if estados_linha:
+            candidatos = gazetteer.municipios_de(estados_linha)
+            corrigido = corrigir_nome(municipio, candidatos)[0]
+        else:
+            candidatos = gazetteer.indice_municipios
+            corrigido = corrigir_nome(municipio, candidatos, LIMIAR_SEM_ESTADO)[0]
+        correcoes[(municipio, estados_linha)] = corrigido
+        if normalizar(corrigido) not in candidatos.normalizado_para_original:
+            desconhecidos.add((municipio, estados_linha))
+
+    chaves = list(zip(pares['municipio'], pares['contexto']))
+    corrigidos = pd.Series([correcoes[par] for par in chaves], index=pares.index, dtype=object)
+    if desconhecidos:
+        for municipio, quantidade in pd.Series([par[0] for par in chaves if par in desconhecidos]).value_counts().items():
+            registro.contar(CONTADOR_MUNICIPIOS_DESCONHECIDOS, municipio, int(quantidade))
+
+    inferencias = {}
+    for municipio in corrigidos[sem_contexto.to_numpy()].unique():
+        estados_municipio = gazetteer.indice_municipios.estados_de(municipio)
+        if len(estados_municipio) == 1:
+            inferencias[municipio] = estados_municipio[0]
+            registro.debug("estado_inferido", f"Estado de '{municipio}' inferido pelo município: {estados_municipio[0]}",
+                           municipio=municipio, estado=estados_municipio[0])
+        elif estados_municipio:
+            registro.aviso("municipio_ambiguo", f"O município '{municipio}' existe em mais de um estado "
+                           f"({', '.join(estados_municipio)}); o estado não foi inferido.", municipio=municipio)
+    inferidos = corrigidos[sem_contexto.to_numpy()].map(inferencias).dropna()
+    if not inferidos.empty:
+        registro.aviso("estado_inferido", "Estado inferido pelo município.", registros=int(inferidos.index.nunique()))
+    return corrigidos, inferidos
+
+
+def codigos_ibge(estados, municipios, gazetteer):
+    """
+    Códigos do IBGE dos estados e municípios já corrigidos de cada linha, como
+    duas séries de listas de inteiros (ver Gazetteer.codigos).
+    """
+    pares = [gazetteer.codigos(estados_linha, municipios_linha) for estados_linha, municipios_linha in zip(estados, municipios)]
+    return (pd.Series([par[0] for par in pares], index=estados.index, dtype=object),
+            pd.Series([par[1] for par in pares], index=estados.index, dtype=object))
+
+
+def datas_por_ano(serie):
+    """Converte a coluna 'ano' em datas (1º de janeiro, 3h). Anos inválidos viram None."""
+    anos = pd.to_numeric(serie, errors='coerce')
+    anos = anos.where((anos > 1900) & (anos < 2100))
+    mapa = {ano: datetime.datetime(int(ano), 1, 1, 3) for ano in anos.dropna().unique()}
+    # Mantém objetos datetime nativos (e não Timestamps do pandas) para o Firestore
+    return pd.Series([mapa.get(ano) for ano in anos], index=serie.index, dtype=object)
+
+
+def limpar_planilha(df, gazetteer, leis, estados_por_sigla=False, data_aprovado=None):
+    """
+    Limpa um DataFrame inteiro de uma vez, coluna a coluna, e devolve um
+    DataFrame pronto para escrita (uma linha por projeto, colunas do Firestore).
+
+    - leis: MapeadorLeis que converte a coluna 'lei' para os nomes padrão;
+    - estados_por_sigla: a coluna 'estado' traz siglas (ex.: "RJ/MG") em vez de nomes;
+    - data_aprovado: data fixa para todos os projetos; se None, usa a coluna 'ano'.
+    """
+    df = df.copy()
+    # Padroniza os nomes das colunas: converte para minúsculas e remove espaços.
+    df.columns = [str(col).lower().strip() for col in df.columns]
+
+    projetos = pd.DataFrame(index=df.index)
+    projetos['nome'] = limpar_texto(coluna(df, 'projeto'), "Nome do projeto")
+    projetos['instituicao'] = limpar_texto(coluna(df, 'proponente'), "Nome do proponente")
+    projetos['indicacao'] = limpar_texto(coluna(df, 'indicação'), "Indicação")
+    projetos['lei'] = leis.mapear_coluna(coluna(df, 'lei'))
+    projetos['valorAprovado'] = converter_valores(coluna(df, 'aportado'))
+
+    if data_aprovado is not None:
+        projetos['dataAprovado'] = pd.Series([data_aprovado] * len(df), index=df.index, dtype=object)
+    else:
+        datas = datas_por_ano(coluna(df, 'ano'))
+        invalidos = int(datas.isna().sum())
+        if invalidos:
+            registro.aviso("ano_invalido", "Ano inválido ou ausente. 'dataAprovado' definido como 'Indefinido'.",
+                           registros=invalidos)
+        projetos['dataAprovado'] = datas.where(datas.notna(), "Indefinido")
+
+    estados = separar_valores(coluna(df, 'estado'))
+    if estados_por_sigla:
+        estados = corrigir_estados_por_sigla(estados, gazetteer)
+    else:
+        estados = corrigir_estados_por_nome(estados, gazetteer)
+    projetos['estados'] = agrupar_listas(estados, df.index)
+
+    municipios = separar_valores(coluna(df, 'município'))
+    municipios, estados_inferidos = corrigir_municipios(municipios, projetos['estados'], gazetteer)
+    projetos['municipios'] = agrupar_listas(municipios, df.index)
+    if not estados_inferidos.empty:
+        # O estado inferido substitui o valor original, que estava vazio ou não foi reconhecido
+        inferidos = agrupar_listas(estados_inferidos, df.index)
+        projetos['estados'] = projetos['estados'].where(inferidos.map(len).eq(0), inferidos)
+    projetos['codigosEstados'], projetos['codigosMunicipios'] = codigos_ibge(
+        projetos['estados'], projetos['municipios'], gazetteer
+    )
+
+    projetos['status'] = "aprovado"
+    projetos['ativo'] = False
+    projetos['compliance'] = True
+    projetos['empresas'] = [[] for _ in range(len(df))]
+
+    # Evita enviar projetos completamente indefinidos
+    vazios = projetos['nome'].eq("Indefinido") & projetos['instituicao'].eq("Indefinido")
+    if vazios.any():
+        registro.aviso("registro_vazio", "IGNORANDO: registro parece estar vazio.", registros=int(vazios.sum()),
+                       indices=df.index[vazios].tolist())
+
+    return projetos.loc[~vazios, COLUNAS_PROJETO]
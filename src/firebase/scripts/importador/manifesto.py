@@ -0,0 +1,83 @@
+import datetime
+import hashlib
+import json
+import os
+from collections import Counter
+from importador.registro import registro
+from importador.texto import normalizar
+
+# Arquivo local com o hash de cada documento já gravado
+ARQUIVO_MANIFESTO = 'manifesto_importacao.json'
+VERSAO_MANIFESTO = 1
+
+
+def hash_conteudo(dados):
+    """Hash estável do conteúdo de um documento (independe da ordem dos campos)."""
+    texto = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def chave_projeto(aba, dados):
+    """Campos que identificam um projeto: aba, nome, proponente, ano e lei."""
+    data = dados.get('dataAprovado')
+    ano = str(data.year) if isinstance(data, datetime.datetime) else "indefinido"
+    return "|".join([
+        normalizar(aba), normalizar(dados['nome']), normalizar(dados['instituicao']), ano, normalizar(dados['lei']),
+    ])
+
+
+class GeradorIds:
+    """
+    Gera IDs de documento determinísticos a partir da chave do projeto.
+    Projetos com a mesma chave na mesma aba recebem um sufixo de ocorrência,
+    que é contado entre blocos para que o ID não dependa do tamanho do bloco.
+
+    Para retomar uma importação, `ocorrencias` traz os contadores salvos no checkpoint.
+    """
+
+    def __init__(self, ocorrencias=None):
+        self._ocorrencias = Counter(ocorrencias or {})
+
+    def gerar(self, aba, dados):
+        return self.gerar_para_chave(chave_projeto(aba, dados))
+
+    def gerar_para_chave(self, chave):
+        ocorrencia = self._ocorrencias[chave]
+        self._ocorrencias[chave] += 1
+        return hashlib.sha1(f"{chave}#{ocorrencia}".encode('utf-8')).hexdigest()[:20]
+
+
+class Manifesto:
+    """
+    Guarda, em um arquivo JSON local, o hash do conteúdo de cada documento já
+    gravado. Permite pular linhas inalteradas sem nenhuma chamada de rede.
+    """
+
+    def __init__(self, caminho=ARQUIVO_MANIFESTO):
+        self.caminho = caminho
+        self.documentos = {}
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+            if conteudo.get('versao') == VERSAO_MANIFESTO:
+                self.documentos = conteudo.get('documentos', {})
+            else:
+                registro.aviso("manifesto_desconhecido", f"Manifesto '{caminho}' em versão desconhecida. Ele será recriado.")
+
+    def inalterado(self, doc_id, hash_atual):
+        return self.documentos.get(doc_id) == hash_atual
+
+    def registrar(self, doc_id, hash_atual):
+        self.documentos[doc_id] = hash_atual
+
+    def remover(self, doc_id):
+        self.documentos.pop(doc_id, None)
+
+    def salvar(self):
+        # Grava em um arquivo temporário e troca, para não corromper o manifesto se o processo cair
+        # Copia os documentos antes: no modo "bulk" o manifesto é salvo durante os callbacks do BulkWriter
+        documentos = dict(self.documentos)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'versao': VERSAO_MANIFESTO, 'documentos': documentos}, f)
+        os.replace(temporario, self.caminho)
@@ -0,0 +1,431 @@
+"""
+Observa uma pasta e importa, a cada nova versão da planilha, só as linhas que mudaram.
+
+A pasta recebe as versões sucessivas de uma mesma planilha (o mesmo arquivo
+sobrescrito ou arquivos novos, ex.: planilha_2024-10.xlsx). Cada arquivo novo
+ou alterado é processado quando o tamanho e a data de modificação param de
+mudar entre duas verificações; se várias versões chegarem juntas, só a mais
+recente (pela data de modificação) é importada. A pasta é
+verificada a cada `--intervalo` segundos, sem dependências além das do
+importador.
+
+Cada linha das abas recebe uma impressão digital (hash das colunas do
+layout), comparada com a da versão anterior, guardada em ARQUIVO_ESTADO:
+- linhas com a mesma impressão digital mantêm o documento e não são lidas
+  de novo pela limpeza nem gravadas;
+- linhas novas ou alteradas são limpas e gravadas com merge, em lotes. O ID
+  segue a chave do projeto (importador.manifesto), então uma linha editada
+  sem mudar nome, proponente, ano ou lei atualiza o mesmo documento;
+- os documentos das linhas que sumiram são apagados, também em lotes.
+
+Assim, a limpeza, a correção fuzzy e as escritas crescem com o tamanho da
+edição, e não com o da planilha; só a leitura e o hash percorrem o arquivo
+inteiro. Na primeira versão, todas as linhas são gravadas, com os mesmos IDs
+de `python -m importador` (com o manifesto, as já importadas são puladas).
+Todas as abas são lidas e limpas antes da primeira escrita: se a versão não
+puder ser processada, nada é enviado. Se alguma escrita falhar, as abas
+afetadas perdem as impressões digitais (os IDs são mantidos) e a versão é
+reprocessada na próxima verificação, regravando essas abas inteiras (o
+manifesto pula o que já está certo) e apagando os documentos que sobrarem.
+
+Exemplos:
+    python -m importador.observador planilhas/ --layout anual
+    python -m importador.observador planilhas/ --layout geral --abas Geral --intervalo 30
+    python -m importador.observador planilhas/ --layout anual --uma-vez --simulacao
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from importador.conexao import conectar_firestore
+from importador.escrita import TAMANHO_MAXIMO_LOTE, EscritorFirestore
+from importador.ibge import ARQUIVO_CACHE_IBGE, TTL_CACHE_IBGE_DIAS, obter_gazetteer
+from importador.layouts import LAYOUTS, obter_layout
+from importador.leitura import EXTENSOES_EXCEL, EXTENSOES_TABELA, TAMANHO_BLOCO, ler_planilha, normalizar_coluna
+from importador.manifesto import Manifesto, chave_projeto
+from importador.pipeline import ARQUIVO_CREDENCIAL
+from importador.planejamento import ARQUIVO_PLANO, EscritorPlano
+from importador.registro import ARQUIVO_ERROS, VERBOSIDADES, registro
+from importador.vazao import VAZAO_INICIAL, ControladorVazao
+
+# Impressões digitais das linhas da última versão importada e os arquivos já processados
+ARQUIVO_ESTADO = 'observador_estado.json'
+VERSAO_ESTADO = 1
+# Chave do estado de uma aba que precisa ser sincronizada inteira; nunca coincide com uma impressão digital
+IMPRESSAO_INVALIDA = '*'
+# Segundos entre as verificações da pasta
+INTERVALO_VERIFICACAO = 10
+
+EXTENSOES_OBSERVADAS = EXTENSOES_EXCEL + ('.ods',) + EXTENSOES_TABELA
+
+
+def hash_arquivo(caminho):
+    """SHA-1 do conteúdo de um arquivo, lido em partes."""
+    sha1 = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for parte in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(parte)
+    return sha1.hexdigest()
+
+
+def impressoes_digitais(df):
+    """
+    Hash de cada linha de um bloco, a partir das colunas lidas (em ordem de
+    nome, para não depender da posição das colunas no arquivo).
+    """
+    nomes = sorted(df.columns, key=normalizar_coluna)
+    valores = df[nomes].astype(object)
+    valores = valores.where(valores.notna(), None)
+    return [
+        hashlib.sha1(json.dumps(linha, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+        for linha in valores.itertuples(index=False, name=None)
+    ]
+
+
+def id_livre(chave, usados):
+    """Primeiro ID da chave (ocorrência 0, 1, ...) que ainda não está em uso, como o GeradorIds."""
+    ocorrencia = 0
+    while True:
+        doc_id = hashlib.sha1(f"{chave}#{ocorrencia}".encode('utf-8')).hexdigest()[:20]
+        if doc_id not in usados:
+            return doc_id
+        ocorrencia += 1
+
+
+class EstadoObservador:
+    """
+    Estado salvo entre as versões: o layout, o hash dos arquivos já
+    processados e, por aba, {impressão digital: [IDs]} das linhas importadas
+    (None para linhas que não viraram projeto, como as vazias). Uma aba
+    invalidada guarda só {IMPRESSAO_INVALIDA: [IDs]}.
+    """
+
+    def __init__(self, caminho=ARQUIVO_ESTADO):
+        self.caminho = caminho
+        self.layout = None
+        self.arquivos = {}
+        self.abas = {}
+
+    def carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            conteudo = json.load(f)
+        if conteudo.get('versao') != VERSAO_ESTADO:
+            registro.aviso("estado_desconhecido", f"Estado do observador '{self.caminho}' em versão desconhecida. "
+                           f"A próxima versão da planilha será importada inteira.")
+            return
+        self.layout = conteudo.get('layout')
+        self.arquivos = conteudo.get('arquivos', {})
+        self.abas = conteudo.get('abas', {})
+
+    def invalidar(self, aba, ids):
+        """Descarta as impressões digitais da aba, guardando os IDs que ela pode ter deixado no Firestore."""
+        anteriores = {doc_id for lista in self.abas.get(aba, {}).values() for doc_id in lista if doc_id is not None}
+        self.abas[aba] = {IMPRESSAO_INVALIDA: sorted(anteriores | set(ids))}
+
+    def salvar(self):
+        # Grava em um arquivo temporário e troca, para não corromper o estado se o processo cair
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'versao': VERSAO_ESTADO, 'layout': self.layout, 'arquivos': self.arquivos, 'abas': self.abas}, f)
+        os.replace(temporario, self.caminho)
+
+
+def diferencas_aba(blocos, anteriores):
+    """
+    Compara as linhas de uma aba com as impressões digitais da versão anterior.
+
+    Retorna (impressões de todas as linhas em ordem, {impressão: [IDs]} das
+    linhas mantidas, DataFrame com as linhas novas ou alteradas, IDs livres).
+    Os IDs livres são os das linhas anteriores que não foram encontradas.
+    """
+    restantes = {impressao: list(ids) for impressao, ids in anteriores.items()}
+    mantidas = {}
+    ordem, novas = [], []
+    for df in blocos:
+        impressoes = impressoes_digitais(df)
+        manter = []
+        for impressao in impressoes:
+            ids = restantes.get(impressao)
+            if ids:
+                mantidas.setdefault(impressao, []).append(ids.pop(0))
+                manter.append(True)
+            else:
+                manter.append(False)
+        ordem.extend(impressoes)
+        novos = df.loc[[not m for m in manter]]
+        if not novos.empty:
+            novas.append(novos.assign(_impressao=[i for i, m in zip(impressoes, manter) if not m]))
+    livres = [doc_id for ids in restantes.values() for doc_id in ids if doc_id is not None]
+    novas = pd.concat(novas) if novas else None
+    return ordem, mantidas, novas, livres
+
+
+def planejar_aba(aba, blocos, anteriores, layout, gazetteer):
+    """
+    Limpa as linhas novas ou alteradas de uma aba e retorna ({impressão: [IDs]}
+    da aba na nova versão, [(dados, rótulo, ID)] a gravar, [IDs] a apagar).
+    """
+    ordem, linhas, novas, livres = diferencas_aba(blocos, anteriores)
+    usados = {doc_id for ids in linhas.values() for doc_id in ids if doc_id is not None}
+
+    gravacoes = []
+    if novas is not None:
+        impressoes = novas.pop('_impressao')
+        novas = novas.reset_index(drop=True)
+        with registro.na_aba(aba), registro.etapa("limpeza", linhas=len(novas)):
+            projetos = layout.limpar(novas, gazetteer)
+        ids = {}
+        for linha, projeto_data in zip(projetos.index, projetos.to_dict('records')):
+            doc_id = id_livre(chave_projeto(aba, projeto_data), usados)
+            usados.add(doc_id)
+            ids[linha] = doc_id
+            gravacoes.append((projeto_data, projeto_data['nome'], doc_id))
+        for linha, impressao in enumerate(impressoes):
+            linhas.setdefault(impressao, []).append(ids.get(linha))
+
+    remocoes = [doc_id for doc_id in livres if doc_id not in usados]
+
+    registro.info("aba_comparada", f"Aba '{aba}': {len(ordem)} linhas, {0 if novas is None else len(novas)} novas "
+                  f"ou alteradas ({len(gravacoes)} projetos a gravar), {len(remocoes)} projetos a remover.",
+                  aba=aba, linhas=len(ordem), alteradas=0 if novas is None else len(novas), gravar=len(gravacoes),
+                  remover=len(remocoes))
+    # Linhas repetidas guardam um ID por ocorrência
+    return {impressao: linhas[impressao] for impressao in dict.fromkeys(ordem)}, gravacoes, remocoes
+
+
+class Observador:
+    """
+    Verifica a pasta e sincroniza o Firestore com cada nova versão da planilha.
+
+    `criar_escritor` recebe o manifesto e devolve o escritor de uma versão
+    (EscritorFirestore ou, na simulação, EscritorPlano).
+    """
+
+    def __init__(self, pasta, layout, abas, gazetteer, criar_escritor, estado, simulacao=False,
+                 tamanho_bloco=TAMANHO_BLOCO):
+        self.pasta = pasta
+        self.layout = layout
+        self.abas = list(abas or layout.abas)
+        self.gazetteer = gazetteer
+        self.criar_escritor = criar_escritor
+        self.estado = estado
+        self.simulacao = simulacao
+        self.tamanho_bloco = tamanho_bloco
+        self._vistos = {}  # nome -> (tamanho, modificação) na última verificação
+        self._ignorados = {}  # nome -> hash de versões que não puderam ser lidas
+
+    def _candidatos(self):
+        """Arquivos de planilha da pasta, com (tamanho, modificação), do mais antigo ao mais novo."""
+        arquivos = []
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, nome)
+            # '~$' e '.' são os arquivos temporários e de bloqueio do Excel e do LibreOffice
+            if nome.startswith(('~$', '.')) or os.path.splitext(nome)[1].lower() not in EXTENSOES_OBSERVADAS:
+                continue
+            if not os.path.isfile(caminho):
+                continue
+            info = os.stat(caminho)
+            arquivos.append((info.st_mtime, nome, (info.st_size, info.st_mtime)))
+        return [(nome, assinatura) for _, nome, assinatura in sorted(arquivos)]
+
+    def verificar(self, esperar_estabilidade=True):
+        """
+        Importa a versão mais recente da pasta, se ela for nova. As versões
+        intermediárias que chegaram junto são só marcadas como vistas: o diff
+        contra a última importada já as inclui. Retorna True se o estado avançou.
+        """
+        pendentes = []
+        vistos = {}
+        for nome, assinatura in self._candidatos():
+            vistos[nome] = assinatura
+            if esperar_estabilidade and self._vistos.get(nome) != assinatura:
+                continue  # ainda sendo copiado ou salvo; espera a próxima verificação
+            sha1 = hash_arquivo(os.path.join(self.pasta, nome))
+            if self.estado.arquivos.get(nome) != sha1 and self._ignorados.get(nome) != sha1:
+                pendentes.append((nome, sha1))
+        self._vistos = vistos
+        if not pendentes:
+            return False
+
+        nome, sha1 = pendentes[-1]
+        if not self.importar_versao(os.path.join(self.pasta, nome), nome, sha1):
+            return False
+        for anterior, sha1_anterior in pendentes[:-1]:
+            self.estado.arquivos[anterior] = sha1_anterior
+        self.estado.salvar()
+        return True
+
+    def importar_versao(self, caminho, nome, sha1):
+        """Sincroniza uma versão da planilha. Retorna True se todas as escritas deram certo."""
+        registro.info("versao", f"\n=== Nova versão: '{nome}' ===", arquivo=nome, sha1=sha1)
+        try:
+            try:
+                planos = self._planejar(caminho)
+            except Exception as e:
+                # Nada foi enviado: o Firestore e o estado continuam os da última versão importada,
+                # e a versão só é tentada de novo se o arquivo mudar
+                registro.erro("versao_ilegivel", f"Não foi possível processar '{nome}': {e}", arquivo=nome,
+                              erro=repr(e))
+                self._ignorados[nome] = sha1
+                return False
+
+            escritor = self.criar_escritor(Manifesto())
+            for _, gravacoes, remocoes in planos.values():
+                for dados, rotulo, doc_id in gravacoes:
+                    escritor.adicionar(dados, rotulo, doc_id)
+                for doc_id in remocoes:
+                    escritor.remover(doc_id)
+            falhas = len(escritor.finalizar()["falhas"])
+        finally:
+            if self.gazetteer.cache is not None:
+                self.gazetteer.cache.salvar()
+            registro.imprimir_resumo()
+            # Cada versão tem o seu resumo: zera etapas, avisos e contadores
+            registro.configurar(registro.verbosidade, registro.arquivos["eventos"], registro.arquivos["erros"])
+
+        if self.simulacao:
+            # Nada foi gravado: a versão não volta a ser simulada enquanto o observador rodar
+            self._ignorados[nome] = sha1
+            return False
+        self.estado.layout = self.layout.nome
+        if falhas:
+            # Parte do lote pode ter sido gravada: as abas afetadas são sincronizadas inteiras na próxima vez
+            for aba, (_, gravacoes, remocoes) in planos.items():
+                if gravacoes or remocoes:
+                    self.estado.invalidar(aba, [doc_id for _, _, doc_id in gravacoes] + remocoes)
+            self.estado.salvar()
+            registro.aviso("versao_com_falhas", f"{falhas} escrita(s) de '{nome}' falharam; a versão será "
+                           f"reprocessada na próxima verificação.", arquivo=nome, falhas=falhas)
+            return False
+        self.estado.abas.update({aba: linhas for aba, (linhas, _, _) in planos.items()})
+        self.estado.arquivos[nome] = sha1
+        return True
+
+    def _planejar(self, caminho):
+        """Lê e compara todas as abas da versão, sem gravar nada. Retorna {aba: resultado de planejar_aba}."""
+        planos = {}
+        blocos = ler_planilha(caminho, self.abas, self.tamanho_bloco, colunas=self.layout.colunas)
+        for aba, grupo in self._por_aba(registro.iterar("leitura", blocos)):
+            planos[aba] = planejar_aba(aba, grupo, self.estado.abas.get(aba, {}), self.layout, self.gazetteer)
+        for aba in self.abas:
+            if aba not in planos:
+                # Aba sem nenhuma linha: os projetos que ela tinha são removidos
+                planos[aba] = planejar_aba(aba, [], self.estado.abas.get(aba, {}), self.layout, self.gazetteer)
+        return planos
+
+    @staticmethod
+    def _por_aba(blocos):
+        """Agrupa os blocos (aba, df) consecutivos da mesma aba em (aba, gerador de DataFrames)."""
+        pendente = None
+        blocos = iter(blocos)
+
+        def da_aba(aba, primeiro):
+            nonlocal pendente
+            yield primeiro
+            for proxima, df in blocos:
+                if proxima != aba:
+                    pendente = (proxima, df)
+                    return
+                yield df
+
+        pendente = next(blocos, None)
+        while pendente is not None:
+            aba, df = pendente
+            pendente = None
+            grupo = da_aba(aba, df)
+            yield aba, grupo
+            # Consome o que a sincronização não leu, para achar o início da próxima aba
+            for _ in grupo:
+                pass
+
+    def observar(self, intervalo=INTERVALO_VERIFICACAO):
+        """Verifica a pasta a cada `intervalo` segundos, até Ctrl+C."""
+        registro.resumo("observando", f"Observando '{self.pasta}' a cada {intervalo}s (Ctrl+C para parar).",
+                        pasta=self.pasta, intervalo=intervalo)
+        try:
+            while True:
+                self.verificar()
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            registro.resumo("observador_parado", "Observador encerrado.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.observador",
+        description="Observa uma pasta e grava em 'projetos' só as linhas novas, alteradas ou removidas de cada "
+                    "nova versão da planilha.",
+    )
+    parser.add_argument("pasta", help="pasta onde as versões da planilha são salvas")
+    parser.add_argument("--layout", required=True, choices=sorted(LAYOUTS),
+                        help="; ".join(f"{nome}: {layout.descricao}" for nome, layout in LAYOUTS.items()))
+    parser.add_argument("--abas", nargs="+", help="abas a sincronizar (padrão: as abas do layout)")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_VERIFICACAO,
+                        help="segundos entre as verificações da pasta")
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="processa as versões que estão na pasta e encerra, sem esperar a estabilidade")
+    parser.add_argument("--simulacao", "--dry-run", action="store_true",
+                        help="mostra o que seria gravado e removido, sem gravar nada nem avançar o estado")
+    parser.add_argument("--arquivo-plano", default=ARQUIVO_PLANO,
+                        help="documentos que seriam gravados na simulação, em JSON Lines")
+    parser.add_argument("--estado", default=ARQUIVO_ESTADO,
+                        help="arquivo com as impressões digitais das linhas da última versão importada")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_MAXIMO_LOTE,
+                        help=f"escritas e remoções por commit (máximo {TAMANHO_MAXIMO_LOTE})")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO, help="linhas lidas por bloco")
+    parser.add_argument("--vazao-inicial", type=int, default=VAZAO_INICIAL, metavar="ESCRITAS_POR_S",
+                        help="limite inicial de escritas/s (regra 500/50/5); 0 desliga o controle")
+    parser.add_argument("--vazao-maxima", type=int, metavar="ESCRITAS_POR_S",
+                        help="teto para o crescimento do limite de escritas/s")
+    parser.add_argument("--verbosidade", choices=VERBOSIDADES, default="normal",
+                        help="detalhado: uma linha por projeto; normal: andamento e avisos agrupados; "
+                             "resumo: apenas o resumo de cada versão")
+    parser.add_argument("--log-json", help="grava todos os eventos neste arquivo, em JSON Lines")
+    parser.add_argument("--arquivo-erros", default=ARQUIVO_ERROS, help="arquivo JSON Lines com os erros")
+    parser.add_argument("--credencial", default=ARQUIVO_CREDENCIAL, help="chave de serviço do Firebase")
+    parser.add_argument("--cache-ibge", default=ARQUIVO_CACHE_IBGE, help="arquivo de cache dos dados do IBGE")
+    parser.add_argument("--ttl-ibge", type=int, default=TTL_CACHE_IBGE_DIAS, metavar="DIAS",
+                        help="dias até o cache do IBGE ser revalidado na API")
+    args = parser.parse_args(argv)
+
+    layout = obter_layout(args.layout)
+    registro.configurar(args.verbosidade, args.log_json, args.arquivo_erros)
+    estado = EstadoObservador(args.estado)
+    estado.carregar()
+    if estado.layout is not None and estado.layout != layout.nome:
+        registro.erro("layout_diferente", f"O estado '{args.estado}' foi gravado com o layout '{estado.layout}'. "
+                      f"Use o mesmo layout ou outro arquivo de estado.")
+        registro.fechar()
+        return 1
+
+    if args.simulacao:
+        gazetteer = obter_gazetteer(args.cache_ibge, ttl_dias=None)
+
+        def criar_escritor(manifesto):
+            return EscritorPlano(args.arquivo_plano, tamanho_lote=args.tamanho_lote, manifesto=manifesto)
+    else:
+        gazetteer = obter_gazetteer(args.cache_ibge, ttl_dias=args.ttl_ibge)
+        db = conectar_firestore(args.credencial)
+        controlador = ControladorVazao(args.vazao_inicial, args.vazao_maxima) if args.vazao_inicial else None
+
+        def criar_escritor(manifesto):
+            return EscritorFirestore(db, tamanho_lote=args.tamanho_lote, manifesto=manifesto, controlador=controlador)
+
+    observador = Observador(args.pasta, layout, args.abas, gazetteer, criar_escritor, estado,
+                            simulacao=args.simulacao, tamanho_bloco=args.tamanho_bloco)
+    try:
+        if args.uma_vez:
+            observador.verificar(esperar_estabilidade=False)
+        else:
+            observador.observar(args.intervalo)
+    finally:
+        registro.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
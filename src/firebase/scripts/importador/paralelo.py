@@ -0,0 +1,86 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from importador.ibge import obter_gazetteer
+from importador.registro import registro
+
+# Gazetteer de cada processo worker, carregado uma vez na inicialização
+_gazetteer_worker = None
+
+
+def _iniciar_worker(arquivo_cache_ibge):
+    """
+    Prepara o Gazetteer do worker. Em sistemas que usam fork, o Gazetteer já
+    carregado pelo processo principal é herdado (somente leitura) e não é lido de novo.
+    """
+    global _gazetteer_worker
+    registro.iniciar_captura()
+    # O processo principal já revalidou o cache; os workers apenas o leem
+    _gazetteer_worker = obter_gazetteer(arquivo_cache_ibge, ttl_dias=None)
+    registro.exportar_captura()
+    # As correções novas voltam ao processo principal, que é quem salva o cache
+    if _gazetteer_worker.cache is not None:
+        _gazetteer_worker.cache.iniciar_captura()
+
+
+def _limpar_no_worker(aba, layout, df):
+    """
+    Limpa um bloco e devolve, junto, os eventos e métricas registrados no
+    worker e as correções que ele acrescentou ao cache.
+    """
+    with registro.na_aba(aba), registro.etapa("limpeza", linhas=len(df)):
+        projetos = layout.limpar(df, _gazetteer_worker)
+    cache = _gazetteer_worker.cache.exportar_captura() if _gazetteer_worker.cache is not None else None
+    return projetos, registro.exportar_captura(), cache
+
+
+def limpar_blocos(blocos, layout, gazetteer, arquivo_cache_ibge, workers=1):
+    """
+    Limpa os blocos (aba, DataFrame) vindos do leitor e gera (aba, df, projetos)
+    na mesma ordem de leitura.
+
+    Com `workers` > 1, a limpeza e a correção fuzzy rodam em um pool de
+    processos; o resultado é idêntico ao do modo serial, pois cada bloco é
+    limpo de forma independente e a ordem é preservada. As correções que os
+    workers acrescentam ao cache voltam com cada bloco para o cache do
+    `gazetteer`, que é o que o pipeline salva. Blocos vazios são
+    repassados sem limpeza (projetos = None).
+    """
+    if workers <= 1:
+        for aba, df in blocos:
+            if df.empty:
+                yield aba, df, None
+                continue
+            with registro.na_aba(aba), registro.etapa("limpeza", linhas=len(df)):
+                projetos = layout.limpar(df, gazetteer)
+            yield aba, df, projetos
+        return
+
+    # Limita os blocos em andamento para que a memória não cresça com a planilha
+    maximo_pendentes = workers * 2
+    pendentes = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(arquivo_cache_ibge,)) as pool:
+        for aba, df in blocos:
+            futuro = pool.submit(_limpar_no_worker, aba, layout, df) if not df.empty else None
+            pendentes.append((aba, df, futuro))
+            while len(pendentes) >= maximo_pendentes:
+                yield _resultado(pendentes.popleft(), gazetteer)
+
+        while pendentes:
+            yield _resultado(pendentes.popleft(), gazetteer)
+
+
+def _resultado(pendente, gazetteer):
+    aba, df, futuro = pendente
+    if futuro is None:
+        return aba, df, None
+    projetos, captura, cache = futuro.result()
+    registro.incorporar(captura)
+    if cache is not None and gazetteer.cache is not None:
+        gazetteer.cache.incorporar(cache)
+    return aba, df, projetos
+
+
+def workers_padrao():
+    """Número de workers sugerido: um por núcleo de CPU."""
+    return os.cpu_count() or 1
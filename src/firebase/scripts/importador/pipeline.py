@@ -0,0 +1,283 @@
+import datetime
+from functools import partial
+from importador.agregados import CAMPO_LOTE_IMPORTACAO, atualizar_dados_estados
+from importador.conexao import conectar_firestore, conectar_firestore_async
+from importador.escrita import TAMANHO_MAXIMO_LOTE, EscritorFirestore, validar_escrita
+from importador.duplicados import ARQUIVO_DECISOES, deduplicar_blocos, ids_da_importacao, indice_existentes
+from importador.escrita_async import COMMITS_EM_ANDAMENTO, EscritorAssincrono
+from importador.ibge import ARQUIVO_CACHE_IBGE, TTL_CACHE_IBGE_DIAS, obter_gazetteer
+from importador.layouts import Layout, obter_layout
+from importador.leitura import TAMANHO_BLOCO, ler_planilha
+from importador.manifesto import GeradorIds, Manifesto, chave_projeto
+from importador.paralelo import limpar_blocos
+from importador.planejamento import ARQUIVO_PLANO, EscritorPlano, estados_existentes
+from importador.registro import ARQUIVO_ERROS, registro
+from importador.retomada import ARQUIVO_CHECKPOINT, ARQUIVO_FALHAS, ArquivoFalhas, Checkpoint
+from importador.vazao import VAZAO_INICIAL, ControladorVazao
+
+ARQUIVO_CREDENCIAL = "serviceAccountKey.json"
+
+
+def importar(
+    caminho_planilha,
+    layout,
+    abas=None,
+    simulacao=False,
+    modo_escrita="lote",
+    tamanho_lote=TAMANHO_MAXIMO_LOTE,
+    tamanho_bloco=TAMANHO_BLOCO,
+    idempotente=True,
+    credencial=ARQUIVO_CREDENCIAL,
+    arquivo_cache_ibge=ARQUIVO_CACHE_IBGE,
+    ttl_ibge_dias=TTL_CACHE_IBGE_DIAS,
+    workers=1,
+    commits_em_andamento=COMMITS_EM_ANDAMENTO,
+    importacao_em_lote=False,
+    verbosidade="normal",
+    arquivo_eventos=None,
+    arquivo_erros=ARQUIVO_ERROS,
+    retomar=False,
+    arquivo_checkpoint=ARQUIVO_CHECKPOINT,
+    arquivo_falhas=ARQUIVO_FALHAS,
+    deduplicar=False,
+    snapshot=None,
+    arquivo_decisoes=ARQUIVO_DECISOES,
+    vazao_inicial=VAZAO_INICIAL,
+    vazao_maxima=None,
+    arquivo_plano=ARQUIVO_PLANO,
+):
+    """
+    Importa as abas de uma planilha para a coleção 'projetos'.
+
+    A planilha pode ser .xlsx, .ods, .csv, .parquet ou uma pasta com um
+    arquivo .csv/.parquet por aba (ver importador.leitura); só as colunas do
+    layout são lidas.
+
+    Lê a planilha em blocos, limpa cada bloco conforme o `layout` (nome ou
+    instância de Layout) e envia os projetos ao escritor. Com `simulacao`,
+    nada é gravado nem há conexão com o Firestore. Com `workers` > 1, a limpeza
+    dos blocos roda em paralelo, mas a escrita segue a ordem da planilha.
+
+    A simulação funciona sem rede (os dados do IBGE vêm do cache, sem
+    revalidação) e monta o plano da importação (importador.planejamento): os
+    documentos que seriam gravados vão para `arquivo_plano` (None não grava),
+    com a estimativa de escritas, commits, estados afetados e recálculos do
+    trigger; com `snapshot`, os projetos existentes entram na estimativa.
+    No `modo_escrita` "async", até `commits_em_andamento` lotes são gravados
+    enquanto a leitura continua.
+
+    Com `importacao_em_lote`, os projetos gravados recebem o campo
+    'loteImportacao', para que o trigger alterarDadosEstados não recalcule os
+    estados a cada documento, e 'dadosEstados' é recalculado uma única vez ao final.
+
+    As mensagens seguem a `verbosidade` ("detalhado", "normal" ou "resumo") e,
+    se `arquivo_eventos` for informado, são gravadas nele em JSON Lines; os
+    erros vão também para `arquivo_erros`. Ao final, é impressa uma tabela com
+    o tempo e a vazão de cada etapa.
+
+    Com IDs determinísticos (`idempotente`), um checkpoint é gravado em
+    `arquivo_checkpoint` depois dos commits; com `retomar`, as linhas já
+    concluídas em uma execução interrompida são puladas. Os documentos que
+    falham mesmo após as novas tentativas vão para `arquivo_falhas`.
+
+    Com `deduplicar`, a planilha inteira é limpa antes de qualquer escrita e
+    as duplicatas (entre abas e contra os projetos existentes, lidos do
+    Firestore ou da exportação local em `snapshot`) são puladas ou mescladas
+    conforme importador.duplicados; as decisões vão para `arquivo_decisoes`.
+
+    As escritas seguem a regra 500/50/5 do Firestore (importador.vazao): o
+    limite começa em `vazao_inicial` escritas/s, cresce 50% a cada 5 minutos
+    sem erros, até `vazao_maxima`, e cai pela metade a cada erro de
+    sobrecarga. `vazao_inicial` None desliga o controle (o modo "bulk" usa o
+    do próprio BulkWriter).
+
+    O cache do IBGE é revalidado na API quando tem mais de `ttl_ibge_dias`
+    dias (0 revalida sempre; None nunca consulta a API se houver cache).
+
+    Retorna o resumo da escrita, ou None se a planilha não pôde ser lida.
+    """
+    if not isinstance(layout, Layout):
+        layout = obter_layout(layout)
+    abas = list(abas or layout.abas)
+    registro.configurar(verbosidade, arquivo_eventos, arquivo_erros)
+    checkpoint = None
+    escritor = None
+    # Com importacao_em_lote, o trigger ignora os projetos gravados: 'dadosEstados' precisa ser recalculado
+    recalcular_dados_estados = importacao_em_lote and not simulacao
+
+    # Validados antes da leitura, para que não sejam confundidos com erros nas abas
+    try:
+        validar_escrita("lote" if modo_escrita == "async" else modo_escrita, tamanho_lote)
+        if modo_escrita == "async" and commits_em_andamento < 1:
+            raise ValueError("O número de commits em andamento deve ser pelo menos 1.")
+        if vazao_inicial is not None and vazao_inicial < 0:
+            raise ValueError("A vazão inicial deve ser maior que zero.")
+    except ValueError as e:
+        registro.erro("configuracao_invalida", f"Configuração de escrita inválida: {e}", erro=str(e))
+        registro.fechar()
+        return None
+
+    try:
+        manifesto = Manifesto() if idempotente else None
+        gerador_ids = GeradorIds() if idempotente else None
+        falhas = None
+        if not simulacao:
+            if idempotente:
+                checkpoint = Checkpoint(arquivo_checkpoint, caminho_planilha, layout.nome, abas, manifesto)
+                if retomar and checkpoint.carregar():
+                    gerador_ids = GeradorIds(checkpoint.ocorrencias)
+            elif retomar:
+                registro.aviso("retomada_sem_manifesto", "A retomada exige IDs determinísticos; sem o manifesto, "
+                               "a planilha será importada desde o início.")
+            falhas = ArquivoFalhas(arquivo_falhas, checkpoint)
+        campos_fixos = None
+        if importacao_em_lote:
+            campos_fixos = {CAMPO_LOTE_IMPORTACAO: datetime.datetime.now().isoformat(timespec='seconds')}
+        controlador = None
+        if vazao_inicial and not simulacao and modo_escrita != "bulk":
+            controlador = ControladorVazao(vazao_inicial, vazao_maxima)
+        if simulacao:
+            escritor = EscritorPlano(
+                arquivo_plano,
+                tamanho_lote=tamanho_lote,
+                modo=modo_escrita,
+                manifesto=manifesto,
+                importacao_em_lote=importacao_em_lote,
+                existentes=estados_existentes(snapshot) if snapshot is not None else None,
+            )
+        elif modo_escrita == "async":
+            escritor = EscritorAssincrono(
+                partial(conectar_firestore_async, credencial),
+                tamanho_lote=tamanho_lote,
+                em_andamento=commits_em_andamento,
+                manifesto=manifesto,
+                campos_fixos=campos_fixos,
+                checkpoint=checkpoint,
+                arquivo_falhas=falhas,
+                controlador=controlador,
+            )
+        else:
+            db = conectar_firestore(credencial)
+            escritor = EscritorFirestore(db, modo=modo_escrita, tamanho_lote=tamanho_lote, manifesto=manifesto,
+                                         campos_fixos=campos_fixos, checkpoint=checkpoint, arquivo_falhas=falhas,
+                                         controlador=controlador)
+        gazetteer = obter_gazetteer(arquivo_cache_ibge, ttl_dias=None if simulacao else ttl_ibge_dias)
+
+        abas_com_dados = set()
+        abas_pendentes, retomar_apos, ja_gravados = abas, {}, 0
+        if checkpoint is not None:
+            abas_com_dados = {aba for aba in abas if checkpoint.concluida(aba)}
+            abas_pendentes = [aba for aba in abas if aba not in abas_com_dados]
+            retomar_apos = checkpoint.retomar_apos()
+
+        # Cada bloco lido é limpo e enviado antes do próximo, sem carregar a planilha inteira
+        blocos = registro.iterar("leitura", ler_planilha(caminho_planilha, abas_pendentes, tamanho_bloco,
+                                                         retomar_apos, layout.colunas))
+        limpos = limpar_blocos(blocos, layout, gazetteer, arquivo_cache_ibge, workers)
+        if deduplicar:
+            limpos = list(limpos)
+            if snapshot is not None:
+                existentes = indice_existentes(pasta_snapshot=snapshot)
+            elif simulacao:
+                registro.aviso("duplicatas_sem_existentes", "Simulação sem --snapshot: as duplicatas são procuradas só "
+                               "dentro da planilha, sem os projetos que já estão no Firestore.")
+                existentes = []
+            else:
+                existentes = indice_existentes(conectar_firestore(credencial))
+            ids_proprios = set()
+            if idempotente:
+                ids_proprios = ids_da_importacao(limpos, GeradorIds(checkpoint.ocorrencias if checkpoint else None))
+            limpos = deduplicar_blocos(limpos, existentes, arquivo_decisoes, ids_proprios)
+
+        aba_atual = None
+        for aba, df, projetos in limpos:
+            if aba != aba_atual:
+                if checkpoint is not None and aba_atual is not None:
+                    checkpoint.concluir_aba(aba_atual)
+                aba_atual = aba
+            if aba not in abas_com_dados:
+                registro.info("aba", f"\n--- Processando Aba: '{aba}' ---", aba=aba)
+            if projetos is None:
+                continue
+            abas_com_dados.add(aba)
+
+            registro.info("bloco", f"{len(df)} registros lidos, {len(projetos)} projetos prontos para envio.",
+                          aba=aba, registros=len(df), projetos=len(projetos))
+
+            for linha, projeto_data in zip(projetos.index, projetos.to_dict('records')):
+                if checkpoint is None:
+                    doc_id = gerador_ids.gerar(aba, projeto_data) if gerador_ids else None
+                    escritor.adicionar(projeto_data, projeto_data['nome'], doc_id)
+                    continue
+                chave = chave_projeto(aba, projeto_data)
+                doc_id = gerador_ids.gerar_para_chave(chave)
+                checkpoint.enviar(doc_id, aba, linha, chave)
+                if checkpoint.ja_gravado(doc_id):
+                    # Gravado antes da interrupção, depois do último ponto do checkpoint
+                    ja_gravados += 1
+                    checkpoint.resolver(doc_id)
+                else:
+                    escritor.adicionar(projeto_data, projeto_data['nome'], doc_id)
+            if checkpoint is not None:
+                checkpoint.marcar(aba, df.index[-1])
+
+        for aba in abas:
+            if aba not in abas_com_dados:
+                registro.aviso("aba_vazia", f"Aba '{aba}' está vazia. Ignorando.", aba=aba)
+
+        if checkpoint is not None:
+            for aba in abas_pendentes:
+                checkpoint.concluir_aba(aba)
+        resumo = escritor.finalizar()
+        if checkpoint is not None:
+            # Concluída a importação, não há o que retomar; as falhas ficam no arquivo de falhas
+            checkpoint.remover()
+            checkpoint = None
+            if ja_gravados:
+                registro.info("retomada_ja_gravados", f"{ja_gravados} documento(s) já tinham sido gravados antes da "
+                              f"interrupção e não foram reenviados.", documentos=ja_gravados)
+        if gazetteer.cache is not None:
+            gazetteer.cache.salvar()
+            registro.info("cache_correcoes", gazetteer.cache.resumo())
+        if importacao_em_lote:
+            if simulacao:
+                registro.info("dados_estados", "Simulação: 'dadosEstados' não será recalculado.")
+            else:
+                registro.info("dados_estados", "\nRecalculando 'dadosEstados'...")
+                with registro.etapa("dados_estados"):
+                    atualizar_dados_estados(conectar_firestore(credencial))
+                recalcular_dados_estados = False
+        registro.resumo("fim", "\nImportação concluída para todas as abas!")
+        return resumo
+
+    except FileNotFoundError:
+        registro.erro("arquivo_inexistente", f"O arquivo '{caminho_planilha}' não foi encontrado.", arquivo=caminho_planilha)
+    except ValueError as e:
+        registro.erro("abas_invalidas", f"Não foi possível ler as abas. Verifique se '{', '.join(abas)}' existem no arquivo. "
+                      f"Detalhes: {e}", abas=abas, erro=str(e))
+    except Exception as e:
+        registro.erro("erro_inesperado", f"Ocorreu um erro inesperado: {e}", erro=repr(e))
+    finally:
+        if checkpoint is not None:
+            checkpoint.salvar(forcar=True)
+        if recalcular_dados_estados and escritor is not None and escritor.gravados:
+            _recalcular_apos_interrupcao(credencial, escritor.gravados)
+        registro.imprimir_resumo()
+        registro.fechar()
+    return None
+
+
+def _recalcular_apos_interrupcao(credencial, gravados):
+    """
+    Recalcula 'dadosEstados' depois de uma importação em lote interrompida: os
+    projetos já gravados têm 'loteImportacao' e foram ignorados pelo trigger.
+    """
+    registro.aviso("dados_estados_interrompido", f"Importação em lote interrompida depois de {gravados} documento(s) "
+                   f"gravados. Recalculando 'dadosEstados'...", gravados=gravados)
+    try:
+        with registro.etapa("dados_estados"):
+            atualizar_dados_estados(conectar_firestore(credencial))
+    except Exception as e:
+        registro.erro("dados_estados_desatualizados", f"Não foi possível recalcular 'dadosEstados' ({e}); os "
+                      f"indicadores estão desatualizados. Rode 'python -m importador.agregados' para corrigi-los.",
+                      erro=repr(e), gravados=gravados)
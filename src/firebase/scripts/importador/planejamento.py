@@ -0,0 +1,176 @@
+"""
+Plano de uma importação, montado na simulação (--simulacao), sem acessar o Firestore.
+
+A planilha passa por toda a leitura, limpeza e correção; em vez de gravar, o
+EscritorPlano guarda os documentos que seriam gravados em ARQUIVO_PLANO
+(JSON Lines) e estima o custo da importação:
+
+- escritas e commits (os projetos inalterados pelo manifesto não contam);
+- estados afetados (os dos projetos gravados e, com uma exportação local em
+  --snapshot, os que os projetos atualizados tinham antes);
+- recálculos do trigger alterarDadosEstados e as leituras que eles fazem: a
+  cada escrita, o trigger recalcula cada estado do projeto (antes e depois)
+  consultando os projetos ativos e aprovados desse estado e lendo o
+  formulário de cada um. Os projetos importados chegam com 'ativo' falso e
+  não entram nessa consulta. Com --importacao-em-lote, o trigger não
+  recalcula nada e os 27 estados são recalculados uma vez ao final.
+
+Sem --snapshot, os projetos que já estão no Firestore não entram na conta e
+as leituras estimadas são um mínimo. Os dados do IBGE vêm só do cache local.
+Os contadores de qualidade dos dados (leis sem mapeamento, estados não
+reconhecidos, municípios sem correspondência) aparecem no resumo.
+
+Exemplos:
+    python -m importador planilhageral.xlsx --layout anual --simulacao
+    python -m importador planilhageral.xlsx --layout anual --simulacao --snapshot exportacao/ --importacao-em-lote
+"""
+import json
+import os
+from collections import Counter
+from importador.agregados import ESTADOS_FIREBASE, AgregadorEstados
+from importador.escrita import TAMANHO_MAXIMO_LOTE, EscritorSimulado
+from importador.leis import CONTADOR_SEM_MAPEAMENTO
+from importador.limpeza import CONTADOR_ESTADOS_DESCONHECIDOS, CONTADOR_MUNICIPIOS_DESCONHECIDOS
+from importador.registro import registro
+from importador.retomada import codificar_json
+
+ARQUIVO_PLANO = 'plano_importacao.jsonl'
+
+# Contadores de qualidade dos dados resumidos no plano (nome no plano -> grupo no registro)
+CONTADORES_QUALIDADE = {
+    'leis_sem_mapeamento': CONTADOR_SEM_MAPEAMENTO,
+    'estados_nao_reconhecidos': CONTADOR_ESTADOS_DESCONHECIDOS,
+    'municipios_sem_correspondencia': CONTADOR_MUNICIPIOS_DESCONHECIDOS,
+}
+
+
+# Campos dos projetos existentes usados na estimativa: os estados e os que decidem se o trigger os lê
+CAMPOS_EXISTENTES = ('estados', 'ativo', 'status')
+
+
+def estados_existentes(pasta_snapshot):
+    """{doc_id: {estados, ativo, status}} dos projetos de uma exportação local (importador.exportacao)."""
+    from importador.exportacao import ler_exportacao
+    return {doc_id: {campo: dados.get(campo) for campo in CAMPOS_EXISTENTES}
+            for doc_id, dados in ler_exportacao(pasta_snapshot, "projetos")}
+
+
+def estados_lidos(projeto):
+    """Estados em que a consulta do trigger encontra o projeto (só os ativos e aprovados)."""
+    if not AgregadorEstados.conta(projeto):
+        return set()
+    return set(projeto.get('estados') or ()) & ESTADOS_FIREBASE.keys()
+
+
+class EscritorPlano(EscritorSimulado):
+    """
+    Escritor da simulação que, além de contar, grava os documentos em
+    `arquivo` (None não grava) e estima os recálculos de 'dadosEstados'.
+
+    `existentes` ({doc_id: {estados, ativo, status}}) descreve os projetos já
+    gravados; com ele, as atualizações contam os estados de antes e de depois
+    da escrita, e as leituras do trigger contam só os projetos ativos e aprovados.
+    """
+
+    def __init__(self, arquivo=ARQUIVO_PLANO, tamanho_lote=TAMANHO_MAXIMO_LOTE, modo="lote", manifesto=None,
+                 importacao_em_lote=False, existentes=None):
+        super().__init__(tamanho_lote=tamanho_lote, manifesto=manifesto)
+        self.modo = modo
+        self.importacao_em_lote = importacao_em_lote
+        self.com_existentes = existentes is not None
+        self.existentes = existentes or {}
+        # Projetos que a consulta do trigger lê em cada estado
+        self.projetos_por_estado = Counter(
+            estado for projeto in self.existentes.values() for estado in estados_lidos(projeto)
+        )
+        self.total_projetos = len(self.existentes)
+        self.estados_afetados = set()
+        self.recalculos = 0
+        self.leituras_trigger = 0
+        self.leituras_formularios = 0
+
+        self.arquivo = arquivo
+        self._arquivo = None
+        if arquivo is not None:
+            self._temporario = f"{arquivo}.tmp"
+            self._arquivo = open(self._temporario, 'w', encoding='utf-8')
+
+    def adicionar(self, dados, rotulo=None, doc_id=None):
+        gravados = self.gravados
+        super().adicionar(dados, rotulo, doc_id)
+        if self.gravados == gravados:
+            return  # inalterado desde a última importação
+
+        if self._arquivo is not None:
+            linha = {"id": doc_id, "rotulo": rotulo or dados.get("nome", "sem nome"), "dados": dados}
+            self._arquivo.write(json.dumps(linha, ensure_ascii=False, default=codificar_json) + "\n")
+
+        anterior = self.existentes.get(doc_id, {})
+        # A escrita é um merge: os campos que a planilha não traz continuam os de antes
+        atual = {campo: dados.get(campo, anterior.get(campo)) for campo in CAMPOS_EXISTENTES}
+        antes = set(anterior.get('estados') or ()) & ESTADOS_FIREBASE.keys()
+        depois = set(atual['estados'] or ()) & ESTADOS_FIREBASE.keys()
+        if doc_id is None or doc_id not in self.existentes:
+            self.total_projetos += 1
+        if doc_id is not None:
+            self.existentes[doc_id] = atual
+        lidos_antes, lidos_depois = estados_lidos(anterior), estados_lidos(atual)
+        self.projetos_por_estado.subtract(lidos_antes - lidos_depois)
+        self.projetos_por_estado.update(lidos_depois - lidos_antes)
+        self.estados_afetados |= antes | depois
+        if not self.importacao_em_lote:
+            # O trigger recalcula cada estado consultando os seus projetos ativos e aprovados
+            # e lendo o formulário de cada um (getFormData)
+            self.recalculos += len(antes | depois)
+            lidos = sum(self.projetos_por_estado[estado] for estado in antes | depois)
+            self.leituras_trigger += lidos
+            self.leituras_formularios += lidos
+
+    def finalizar(self):
+        resumo = super().finalizar()
+        if self._arquivo is not None:
+            self._arquivo.close()
+            os.replace(self._temporario, self.arquivo)
+
+        commits = self.gravados if self.modo == "individual" else -(-self.gravados // self.tamanho_lote)
+        plano = {
+            "escritas": self.gravados,
+            "inalterados": self.inalterados,
+            "commits": commits,
+            "modo": self.modo,
+            "estados_afetados": sorted(self.estados_afetados),
+            "recalculos_trigger": self.recalculos,
+            "leituras_trigger": self.leituras_trigger,
+            "leituras_formularios_trigger": self.leituras_formularios,
+            # Com --importacao-em-lote: os 27 estados recalculados ao final, com uma leitura de todos os projetos
+            "leituras_importacao_em_lote": self.total_projetos,
+            "com_existentes": self.com_existentes,
+            "qualidade": {nome: sum(registro.contadores.get(grupo, {}).values())
+                          for nome, grupo in CONTADORES_QUALIDADE.items()},
+            "arquivo": self.arquivo,
+        }
+        self._imprimir(plano)
+        resumo["plano"] = plano
+        return resumo
+
+    def _imprimir(self, plano):
+        registro.resumo("plano_escritas", f"Plano: {plano['escritas']} escritas em {plano['commits']} commits "
+                        f"(modo '{plano['modo']}'), {plano['inalterados']} projetos inalterados."
+                        + (f" Documentos em '{plano['arquivo']}'." if plano['arquivo'] else ""), **plano)
+        estados = plano['estados_afetados']
+        registro.resumo("plano_estados", f"Estados afetados ({len(estados)}): {', '.join(estados) or 'nenhum'}.")
+        minimo = "" if plano['com_existentes'] else " no mínimo (sem --snapshot, os projetos existentes não entram na conta)"
+        if self.importacao_em_lote:
+            registro.resumo("plano_trigger", f"Trigger alterarDadosEstados: nenhum recálculo durante a importação; os 27 "
+                            f"estados são recalculados ao final, com ~{plano['leituras_importacao_em_lote']} leituras "
+                            f"de projetos{minimo}.")
+        else:
+            registro.resumo("plano_trigger", f"Trigger alterarDadosEstados: {plano['recalculos_trigger']} recálculos, "
+                            f"~{plano['leituras_trigger']} leituras de projetos ativos e aprovados e "
+                            f"~{plano['leituras_formularios_trigger']} de formulários{minimo}. Com --importacao-em-lote, "
+                            f"seria um recálculo dos 27 estados, com ~{plano['leituras_importacao_em_lote']} leituras.")
+        qualidade = plano['qualidade']
+        registro.resumo("plano_qualidade", f"Qualidade dos dados: {qualidade['leis_sem_mapeamento']} registro(s) com lei "
+                        f"sem mapeamento, {qualidade['estados_nao_reconhecidos']} com estado não reconhecido e "
+                        f"{qualidade['municipios_sem_correspondencia']} com município sem correspondência "
+                        f"(detalhes no resumo abaixo).")
@@ -0,0 +1,265 @@
+"""
+Registro estruturado das importações.
+
+Cada mensagem vira um evento com nível, nome e campos, gravado em JSON Lines
+(se um arquivo for configurado) e exibido no terminal conforme a verbosidade:
+
+- "detalhado": tudo, inclusive uma linha por projeto gravado e por correção;
+- "normal": andamento da importação e erros; avisos só no resumo, agrupados
+  por evento e aba;
+- "resumo": apenas o resumo final. Os erros vão para o arquivo de erros.
+
+Também mede o tempo de cada etapa (leitura, limpeza, correção fuzzy, escrita)
+e imprime, ao final, uma tabela com vazão e percentis de latência, além dos
+contadores somados ao longo da importação (ex.: registros por lei).
+
+Os módulos usam a instância compartilhada `registro`, configurada pelo pipeline.
+"""
+import datetime
+import json
+import math
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+NIVEIS = {"DEBUG": 10, "INFO": 20, "AVISO": 30, "ERRO": 40, "RESUMO": 50}
+VERBOSIDADES = {"detalhado": NIVEIS["DEBUG"], "normal": NIVEIS["INFO"], "resumo": NIVEIS["RESUMO"]}
+PREFIXOS = {"AVISO": "AVISO: ", "ERRO": "ERRO! "}
+
+ARQUIVO_ERROS = "erros_importacao.jsonl"
+# Quantos tipos de aviso aparecem no resumo, dos mais frequentes aos menos
+MAX_AVISOS_RESUMO = 20
+
+
+class Etapa:
+    """Tempo acumulado, chamadas, linhas e latências de uma etapa."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.linhas = 0
+        self.duracao = 0.0
+        self.latencias = []
+
+    def registrar(self, duracao, linhas=0):
+        self.chamadas += 1
+        self.linhas += linhas
+        self.duracao += duracao
+        self.latencias.append(duracao)
+
+    def incorporar(self, outra):
+        self.chamadas += outra.chamadas
+        self.linhas += outra.linhas
+        self.duracao += outra.duracao
+        self.latencias.extend(outra.latencias)
+
+    def percentil(self, p):
+        """Percentil pelo método nearest-rank, em segundos."""
+        if not self.latencias:
+            return 0.0
+        ordenadas = sorted(self.latencias)
+        return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+class Registro:
+    def __init__(self, verbosidade="normal", arquivo_eventos=None, arquivo_erros=None):
+        self._saidas = {}
+        self.configurar(verbosidade, arquivo_eventos, arquivo_erros)
+
+    def configurar(self, verbosidade="normal", arquivo_eventos=None, arquivo_erros=None):
+        """Define a verbosidade e os arquivos, e zera avisos, erros, etapas e contadores."""
+        if verbosidade not in VERBOSIDADES:
+            raise ValueError(f"Verbosidade '{verbosidade}' inválida. Use uma de: {', '.join(VERBOSIDADES)}.")
+        self.fechar()
+        self.verbosidade = verbosidade
+        self.nivel_terminal = VERBOSIDADES[verbosidade]
+        self.arquivos = {"eventos": arquivo_eventos, "erros": arquivo_erros}
+        self.avisos = Counter()  # (evento, mensagem, aba) -> registros
+        self.erros = 0
+        self.etapas = {}
+        self.contadores = defaultdict(Counter)  # grupo -> {chave: quantidade}
+        self.aba = None
+        self._captura = None
+
+    # --- Eventos ---
+
+    def debug(self, evento, mensagem, **campos):
+        self._registrar("DEBUG", evento, mensagem, campos)
+
+    def info(self, evento, mensagem, **campos):
+        self._registrar("INFO", evento, mensagem, campos)
+
+    def aviso(self, evento, mensagem, **campos):
+        """
+        Aviso agrupado por evento, mensagem e aba; o campo `registros`, se houver,
+        é somado no resumo (1 por aviso, se não houver). Mantenha a mensagem fixa
+        e passe as quantidades em campos, para que os blocos de uma aba virem uma
+        só linha. No terminal, só aparece um a um no modo detalhado.
+        """
+        aba = campos.get("aba", self.aba)
+        self.avisos[(evento, mensagem, aba)] += campos.get("registros", 1)
+        self._registrar("AVISO", evento, mensagem, campos)
+
+    def erro(self, evento, mensagem, **campos):
+        self.erros += 1
+        self._registrar("ERRO", evento, mensagem, campos)
+
+    def resumo(self, evento, mensagem, **campos):
+        self._registrar("RESUMO", evento, mensagem, campos)
+
+    def _registrar(self, nivel, evento, mensagem, campos):
+        dados = {
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "nivel": nivel,
+            "evento": evento,
+            "mensagem": mensagem,
+            **({"aba": self.aba} if self.aba is not None else {}),
+            **campos,
+        }
+        if self._captura is not None:
+            self._captura.append(dados)
+        else:
+            self._emitir(dados)
+
+    def _emitir(self, dados):
+        nivel = dados["nivel"]
+        self._escrever("eventos", dados)
+        if nivel == "ERRO":
+            self._escrever("erros", dados)
+
+        # Avisos aparecem agrupados no resumo; um a um, só no modo detalhado
+        limiar = NIVEIS["DEBUG"] if nivel == "AVISO" else NIVEIS[nivel]
+        if limiar >= self.nivel_terminal:
+            quantidade = f" ({dados['registros']} registro(s))" if nivel == "AVISO" and "registros" in dados else ""
+            print(f"{PREFIXOS.get(nivel, '')}{dados['mensagem']}{quantidade}")
+
+    def _escrever(self, tipo, dados):
+        caminho = self.arquivos.get(tipo)
+        if not caminho:
+            return
+        if tipo not in self._saidas:
+            self._saidas[tipo] = open(caminho, "a", encoding="utf-8")
+        self._saidas[tipo].write(json.dumps(dados, ensure_ascii=False, default=str) + "\n")
+
+    def fechar(self):
+        for saida in self._saidas.values():
+            saida.close()
+        self._saidas = {}
+
+    @contextmanager
+    def na_aba(self, aba):
+        """Anexa `aba` aos eventos registrados dentro do bloco `with` (ex.: avisos da limpeza)."""
+        anterior, self.aba = self.aba, aba
+        try:
+            yield
+        finally:
+            self.aba = anterior
+
+    # --- Etapas ---
+
+    def medir(self, etapa, duracao, linhas=0):
+        self.etapas.setdefault(etapa, Etapa()).registrar(duracao, linhas)
+
+    @contextmanager
+    def etapa(self, nome, linhas=0):
+        """Mede o bloco `with` como uma chamada da etapa `nome`."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.medir(nome, time.perf_counter() - inicio, linhas)
+
+    def iterar(self, nome, iteravel, linhas=len):
+        """Repassa os itens de `iteravel`, medindo o tempo para obter cada um."""
+        iterador = iter(iteravel)
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(iterador)
+            except StopIteration:
+                return
+            self.medir(nome, time.perf_counter() - inicio, linhas(item) if linhas else 0)
+            yield item
+
+    # --- Contadores ---
+
+    def contar(self, grupo, chave, quantidade=1):
+        """Soma `quantidade` à `chave` do `grupo` (ex.: registros por lei); os grupos aparecem no resumo."""
+        self.contadores[grupo][chave] += quantidade
+
+    # --- Processos workers ---
+
+    def iniciar_captura(self):
+        """Passa a guardar os eventos e métricas em memória (usado nos processos workers)."""
+        self.avisos = Counter()
+        self.erros = 0
+        self.etapas = {}
+        self.contadores = defaultdict(Counter)
+        self._captura = []
+
+    def exportar_captura(self):
+        captura = {"eventos": self._captura or [], "avisos": self.avisos, "erros": self.erros, "etapas": self.etapas,
+                   "contadores": self.contadores}
+        self.iniciar_captura()
+        return captura
+
+    def incorporar(self, captura):
+        """Emite os eventos capturados em um worker e soma as suas métricas."""
+        for dados in captura["eventos"]:
+            self._emitir(dados)
+        self.avisos.update(captura["avisos"])
+        self.erros += captura["erros"]
+        for nome, etapa in captura["etapas"].items():
+            self.etapas.setdefault(nome, Etapa()).incorporar(etapa)
+        for grupo, contagens in captura["contadores"].items():
+            self.contadores[grupo].update(contagens)
+
+    # --- Resumo ---
+
+    def imprimir_resumo(self):
+        """Imprime (sempre) a tabela de etapas, os avisos agrupados e os contadores, e os grava no arquivo de eventos."""
+        linhas = [f"\n{'Etapa':<16} {'Chamadas':>9} {'Linhas':>9} {'Tempo (s)':>10} {'Linhas/s':>10} "
+                  f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}"]
+        metricas = {}
+        for nome, etapa in self.etapas.items():
+            vazao = etapa.linhas / etapa.duracao if etapa.duracao > 0 else 0.0
+            p50, p95, p99 = (1000 * etapa.percentil(p) for p in (50, 95, 99))
+            linhas.append(f"{nome:<16} {etapa.chamadas:>9} {etapa.linhas:>9} {etapa.duracao:>10.2f} {vazao:>10.1f} "
+                          f"{p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+            metricas[nome] = {
+                "chamadas": etapa.chamadas, "linhas": etapa.linhas, "duracao": etapa.duracao,
+                "linhas_por_segundo": vazao, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+            }
+
+        if self.avisos:
+            total = sum(self.avisos.values())
+            linhas.append(f"\nAvisos ({total} no total):")
+            mais_frequentes = self.avisos.most_common(MAX_AVISOS_RESUMO)
+            for (_, mensagem, aba), ocorrencias in mais_frequentes:
+                linhas.append(f"  {ocorrencias:>6}× {mensagem}" + (f" [aba '{aba}']" if aba is not None else ""))
+            if len(self.avisos) > len(mais_frequentes):
+                linhas.append(f"  ... e mais {len(self.avisos) - len(mais_frequentes)} tipos de aviso.")
+        for grupo, contagens in self.contadores.items():
+            linhas.append(f"\n{grupo}:")
+            mais_frequentes = contagens.most_common(MAX_AVISOS_RESUMO)
+            for chave, quantidade in mais_frequentes:
+                linhas.append(f"  {quantidade:>6}× {chave}")
+            if len(contagens) > len(mais_frequentes):
+                linhas.append(f"  ... e mais {len(contagens) - len(mais_frequentes)}.")
+        if self.erros:
+            destino = f" (detalhes em '{self.arquivos['erros']}')" if self.arquivos.get("erros") else ""
+            linhas.append(f"\n{self.erros} erro(s){destino}.")
+
+        print("\n".join(linhas))
+        self._escrever("eventos", {
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "nivel": "RESUMO",
+            "evento": "metricas",
+            "etapas": metricas,
+            "avisos": [{"evento": evento, "mensagem": mensagem, "aba": aba, "ocorrencias": ocorrencias}
+                       for (evento, mensagem, aba), ocorrencias in self.avisos.items()],
+            "contadores": {grupo: dict(contagens) for grupo, contagens in self.contadores.items()},
+            "erros": self.erros,
+        })
+
+
+registro = Registro()
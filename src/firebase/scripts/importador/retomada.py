@@ -0,0 +1,290 @@
+"""
+Checkpoint para retomar importações interrompidas e arquivo de falhas (dead-letter).
+
+O checkpoint guarda, por aba, a última linha cujo documento já foi gravado
+(ou pulado, ou registrado como falha), junto com tudo que vem antes dela; os
+contadores do GeradorIds até esse ponto, para que os IDs das linhas seguintes
+não mudem; e os IDs já gravados além desse ponto, que não são reenviados.
+
+Os documentos que falham de vez vão para o arquivo de falhas, em JSON Lines,
+e podem ser reenviados depois:
+    python -m importador.retomada falhas_importacao.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from importador.agregados import CAMPO_LOTE_IMPORTACAO
+from importador.conexao import conectar_firestore
+from importador.escrita import MODOS_ESCRITA, EscritorFirestore
+from importador.registro import registro
+
+ARQUIVO_CHECKPOINT = 'checkpoint_importacao.json'
+ARQUIVO_FALHAS = 'falhas_importacao.jsonl'
+VERSAO_CHECKPOINT = 1
+
+# Intervalo mínimo, em segundos, entre duas gravações do checkpoint (e do manifesto)
+INTERVALO_CHECKPOINT = 1.0
+
+
+class Checkpoint:
+    """
+    Acompanha, na ordem da planilha, os documentos enviados ao escritor e o
+    ponto até onde todos já têm resultado. O escritor avisa cada resultado
+    (`resolver`), possivelmente fora de ordem (modos "async" e "bulk"); o
+    ponto durável só avança quando todos os anteriores foram resolvidos.
+
+    É gravado depois dos commits, no máximo a cada `intervalo` segundos, junto
+    com o manifesto. Os métodos podem ser chamados de outras threads (callbacks
+    do BulkWriter).
+    """
+
+    def __init__(self, caminho, planilha, layout, abas, manifesto=None, intervalo=INTERVALO_CHECKPOINT):
+        self.caminho = caminho
+        self.manifesto = manifesto
+        self.intervalo = intervalo
+        estatisticas = os.stat(planilha)
+        self.origem = {
+            "planilha": os.path.abspath(planilha),
+            "tamanho": estatisticas.st_size,
+            "modificada_em": estatisticas.st_mtime,
+            "layout": layout,
+            "abas": list(abas),
+        }
+        self.abas = {}  # aba -> {"linha": última linha durável, "concluida": bool}
+        self.ocorrencias = Counter()  # contadores do GeradorIds até o ponto durável
+        self.gravados_adiante = set()  # IDs gravados depois do ponto durável
+
+        self._fila = deque()  # (doc_id ou None, aba, linha, chave) na ordem da planilha
+        self._origens = {}  # doc_id -> (aba, linha), enquanto não resolvido
+        self._resolvidos = set()
+        self._lock = threading.RLock()
+        self._alterado = False
+        self._ultimo_salvamento = 0.0
+
+    # --- Retomada ---
+
+    def carregar(self):
+        """Lê o checkpoint anterior. Retorna False se não existir ou for de outra planilha."""
+        if not os.path.exists(self.caminho):
+            registro.info("checkpoint_inexistente", f"Nenhum checkpoint em '{self.caminho}'. Importando desde o início.")
+            return False
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            conteudo = json.load(f)
+        if conteudo.get('versao') != VERSAO_CHECKPOINT or conteudo.get('origem') != self.origem:
+            registro.aviso("checkpoint_invalido", f"O checkpoint '{self.caminho}' é de outra planilha, layout ou "
+                           f"versão da planilha. Importando desde o início.")
+            return False
+
+        self.abas = conteudo['abas']
+        self.ocorrencias = Counter(conteudo['ocorrencias'])
+        self.gravados_adiante = set(conteudo['gravados_adiante'])
+        posicoes = [
+            f"'{aba}' concluída" if estado['concluida'] else f"'{aba}' após a linha {estado['linha'] + 2}"
+            for aba, estado in self.abas.items()
+        ]
+        registro.info("retomada", f"Retomando a importação: {', '.join(posicoes) or 'nenhuma linha concluída'}.",
+                      abas=self.abas)
+        return True
+
+    def concluida(self, aba):
+        return self.abas.get(aba, {}).get('concluida', False)
+
+    def retomar_apos(self):
+        """{aba: última linha já concluída} das abas em andamento, para o leitor pular."""
+        return {aba: estado['linha'] for aba, estado in self.abas.items() if not estado['concluida']}
+
+    def ja_gravado(self, doc_id):
+        return doc_id in self.gravados_adiante
+
+    # --- Andamento ---
+
+    def enviar(self, doc_id, aba, linha, chave):
+        """Registra um documento entregue ao escritor (antes de `adicionar`)."""
+        with self._lock:
+            self._fila.append((doc_id, aba, int(linha), chave))
+            self._origens[doc_id] = (aba, int(linha))
+
+    def marcar(self, aba, linha):
+        """Marca o fim de um bloco, para avançar também sobre linhas que não geraram documento."""
+        with self._lock:
+            self._fila.append((None, aba, int(linha), None))
+            self._avancar()
+
+    def concluir_aba(self, aba):
+        with self._lock:
+            self._fila.append((None, aba, None, None))
+            self._avancar()
+
+    def origem_de(self, doc_id):
+        """(aba, linha) de um documento ainda não resolvido, ou (None, None)."""
+        return self._origens.get(doc_id, (None, None))
+
+    def resolver(self, doc_id, gravado=True):
+        """Registra o resultado de um documento: gravado, pulado (inalterado) ou falha."""
+        with self._lock:
+            self._resolvidos.add(doc_id)
+            if gravado:
+                self.gravados_adiante.add(doc_id)
+            self._avancar()
+
+    def _avancar(self):
+        while self._fila:
+            doc_id, aba, linha, chave = self._fila[0]
+            if doc_id is not None:
+                if doc_id not in self._resolvidos:
+                    return
+                self._resolvidos.discard(doc_id)
+                self._origens.pop(doc_id, None)
+                self.gravados_adiante.discard(doc_id)
+                self.ocorrencias[chave] += 1
+            self._fila.popleft()
+
+            estado = self.abas.setdefault(aba, {"linha": -1, "concluida": False})
+            if linha is None:
+                estado['concluida'] = True
+            else:
+                estado['linha'] = max(estado['linha'], linha)
+            self._alterado = True
+
+    # --- Persistência ---
+
+    def salvar(self, forcar=False):
+        """Grava o checkpoint e o manifesto, se o ponto durável avançou e o intervalo passou."""
+        with self._lock:
+            agora = time.monotonic()
+            if not self._alterado or (not forcar and agora - self._ultimo_salvamento < self.intervalo):
+                return
+            conteudo = {
+                'versao': VERSAO_CHECKPOINT,
+                'origem': self.origem,
+                'abas': self.abas,
+                'ocorrencias': self.ocorrencias,
+                'gravados_adiante': sorted(self.gravados_adiante),
+            }
+            temporario = f"{self.caminho}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(conteudo, f, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+            # O manifesto vai junto, para que uma nova execução também pule o que já foi gravado
+            if self.manifesto is not None:
+                self.manifesto.salvar()
+            self._alterado = False
+            self._ultimo_salvamento = agora
+
+    def remover(self):
+        """Apaga o checkpoint depois de uma importação concluída."""
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+def codificar_json(valor):
+    if isinstance(valor, datetime.datetime):
+        return {"$datetime": valor.isoformat()}
+    return str(valor)
+
+
+def decodificar_json(objeto):
+    if set(objeto) == {"$datetime"}:
+        return datetime.datetime.fromisoformat(objeto["$datetime"])
+    return objeto
+
+
+class ArquivoFalhas:
+    """
+    Dead-letter: grava em JSON Lines os documentos que falharam de vez, com o
+    erro e, se houver checkpoint, a aba e a linha de origem. O arquivo só é
+    criado na primeira falha e as novas falhas são acrescentadas ao final.
+    """
+
+    def __init__(self, caminho=ARQUIVO_FALHAS, checkpoint=None):
+        self.caminho = caminho
+        self.checkpoint = checkpoint
+        self.quantidade = 0
+        self._arquivo = None
+        self._lock = threading.Lock()
+
+    def registrar(self, doc_id, rotulo, dados, erro):
+        aba, linha = self.checkpoint.origem_de(doc_id) if self.checkpoint is not None else (None, None)
+        entrada = {
+            "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+            "id": doc_id,
+            "rotulo": rotulo,
+            "aba": aba,
+            "linha": linha,
+            "erro": str(erro),
+            "dados": dados,
+        }
+        with self._lock:
+            if self._arquivo is None:
+                self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+            self._arquivo.write(json.dumps(entrada, ensure_ascii=False, default=codificar_json) + "\n")
+            self._arquivo.flush()
+            self.quantidade += 1
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def ler_falhas(caminho):
+    """Gera as entradas de um arquivo de falhas, com as datas de volta em datetime."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha, object_hook=decodificar_json)
+
+
+def reenviar_falhas(db, caminho=ARQUIVO_FALHAS, modo="lote"):
+    """
+    Reenvia os documentos de um arquivo de falhas. As entradas que falharem de
+    novo substituem o arquivo; se todas forem gravadas, ele é apagado.
+
+    O campo 'loteImportacao' é removido, para que o trigger recalcule os
+    estados de cada documento reenviado.
+    """
+    temporario = f"{caminho}.reenvio"
+    restantes = ArquivoFalhas(temporario)
+    escritor = EscritorFirestore(db, modo=modo, arquivo_falhas=restantes)
+    for entrada in ler_falhas(caminho):
+        dados = {campo: valor for campo, valor in entrada['dados'].items() if campo != CAMPO_LOTE_IMPORTACAO}
+        escritor.adicionar(dados, entrada['rotulo'], entrada['id'])
+    resumo = escritor.finalizar()
+    restantes.fechar()
+
+    if restantes.quantidade:
+        os.replace(temporario, caminho)
+        registro.resumo("reenvio", f"{restantes.quantidade} documento(s) falharam de novo e continuam em '{caminho}'.")
+    else:
+        os.remove(caminho)
+        registro.resumo("reenvio", f"Todos os documentos de '{caminho}' foram gravados.")
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m importador.retomada",
+        description="Reenvia ao Firestore os documentos de um arquivo de falhas da importação.",
+    )
+    parser.add_argument("arquivo", nargs="?", default=ARQUIVO_FALHAS, help="arquivo de falhas (JSON Lines)")
+    parser.add_argument("--modo-escrita", choices=MODOS_ESCRITA, default="lote")
+    parser.add_argument("--credencial", default="serviceAccountKey.json", help="chave de serviço do Firebase")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.arquivo):
+        registro.erro("arquivo_inexistente", f"O arquivo '{args.arquivo}' não foi encontrado.", arquivo=args.arquivo)
+        return 1
+    try:
+        resumo = reenviar_falhas(conectar_firestore(args.credencial), args.arquivo, args.modo_escrita)
+    finally:
+        registro.imprimir_resumo()
+        registro.fechar()
+    return 1 if resumo["falhas"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,13 @@
+import unicodedata
+
+
+def normalizar(texto):
+    """
+    Converte para minúsculas, remove acentos e espaços extras.
+    """
+    if not isinstance(texto, str):
+        return ""
+    # NFD normaliza para decompor caracteres (e.g., 'ç' -> 'c' + '̧')
+    texto = unicodedata.normalize('NFD', texto.lower().strip())
+    # Remove os diacríticos (acentos)
+    return "".join(c for c in texto if unicodedata.category(c) != 'Mn')
@@ -0,0 +1,199 @@
+"""
+Controle da vazão de escrita no Firestore, seguindo a regra "500/50/5".
+
+O Firestore recomenda começar com no máximo 500 operações por segundo em uma
+coleção e aumentar o tráfego em até 50% a cada 5 minutos. Acima disso, e com
+o trigger de 'dadosEstados' disparando a cada projeto, os commits começam a
+falhar com RESOURCE_EXHAUSTED ou contenção.
+
+O ControladorVazao distribui as escritas no tempo (cada commit reserva a sua
+fatia, em escritas/s) e ajusta o limite:
+- a cada `intervalo_crescimento` segundos em que o limite chegou a segurar as
+  escritas e a taxa de erros ficou abaixo de `limiar_erros`, ele cresce 50%;
+- a cada erro de sobrecarga (cota, contenção, indisponibilidade), ele cai
+  pela metade, até `vazao_minima`, e a contagem dos 5 minutos recomeça.
+
+As métricas (vazão real, limite atual, recuos, espera acumulada) são
+registradas a cada `intervalo_metricas` segundos e no resumo da escrita.
+O BulkWriter do SDK já aplica a mesma regra; o controlador é usado nos modos
+"individual", "lote" e "async".
+"""
+import threading
+import time
+from importador.registro import registro
+
+# Limite inicial (escritas/s) e fator de crescimento a cada intervalo sem erros
+VAZAO_INICIAL = 500
+FATOR_CRESCIMENTO = 1.5
+INTERVALO_CRESCIMENTO = 300
+# Fração de commits com erro de sobrecarga, no intervalo, acima da qual o limite não cresce
+LIMIAR_ERROS = 0.01
+# Fator aplicado ao limite a cada erro de sobrecarga, e o piso do limite
+FATOR_RECUO = 0.5
+VAZAO_MINIMA = 10
+# Erros em commits concorrentes, dentro deste intervalo (s), contam como um único recuo
+INTERVALO_RECUO = 1.0
+# Intervalo (s) entre os registros das métricas durante a escrita
+INTERVALO_METRICAS = 30
+
+
+def erro_sobrecarga(erro):
+    """Indica se o erro mostra que o Firestore está sobrecarregado (cota, contenção, indisponibilidade)."""
+    # Importado aqui, como o SDK do Firebase em conexao.py
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return isinstance(erro, TimeoutError)
+    return isinstance(erro, (
+        exceptions.ResourceExhausted, exceptions.TooManyRequests, exceptions.Aborted,
+        exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, TimeoutError,
+    ))
+
+
+class ControladorVazao:
+    """
+    Limita as escritas por segundo e ajusta o limite pela regra 500/50/5.
+    Pode ser usado por várias threads (o escritor assíncrono reserva as
+    escritas no event loop e informa os resultados na thread principal).
+
+    `vazao_maxima` (escritas/s) é um teto opcional para o crescimento.
+    """
+
+    def __init__(self, vazao_inicial=VAZAO_INICIAL, vazao_maxima=None, vazao_minima=VAZAO_MINIMA,
+                 intervalo_crescimento=INTERVALO_CRESCIMENTO, intervalo_metricas=INTERVALO_METRICAS):
+        if vazao_inicial <= 0:
+            raise ValueError("A vazão inicial deve ser maior que zero.")
+        self.vazao = float(vazao_inicial)
+        self.vazao_maxima = vazao_maxima
+        self.vazao_minima = min(vazao_minima, self.vazao)
+        self.intervalo_crescimento = intervalo_crescimento
+        self.intervalo_metricas = intervalo_metricas
+
+        self.escritas = 0
+        self.commits = 0
+        self.erros = 0
+        self.recuos = 0
+        self.aumentos = 0
+        self.espera_total = 0.0
+        self.pico = self.vazao
+
+        self._trava = threading.Lock()
+        self._inicio = time.monotonic()
+        self._proxima_vaga = self._inicio
+        self._ultimo_recuo = None
+        self._novo_intervalo(self._inicio)
+        self._metricas_em = self._inicio
+        self._escritas_metricas = 0
+
+    def _novo_intervalo(self, agora):
+        self._intervalo_desde = agora
+        self._commits_intervalo = 0
+        self._erros_intervalo = 0
+        self._limitou = False
+
+    def reservar(self, escritas):
+        """
+        Reserva a fatia de tempo de `escritas` escritas e retorna quantos
+        segundos esperar antes de enviá-las (0 se o limite não foi atingido).
+        """
+        with self._trava:
+            agora = time.monotonic()
+            self._ajustar_crescimento(agora)
+            inicio = max(agora, self._proxima_vaga)
+            self._proxima_vaga = inicio + escritas / self.vazao
+            espera = inicio - agora
+            if espera > 0:
+                self._limitou = True
+                self.espera_total += espera
+            return espera
+
+    def aguardar(self, escritas):
+        """Espera, nesta thread, até que `escritas` escritas possam ser enviadas."""
+        espera = self.reservar(escritas)
+        if espera > 0:
+            time.sleep(espera)
+
+    def sucesso(self, escritas):
+        """Informa um commit de `escritas` escritas concluído."""
+        with self._trava:
+            self.escritas += escritas
+            self.commits += 1
+            self._commits_intervalo += 1
+            self._escritas_metricas += escritas
+            agora = time.monotonic()
+            if agora - self._metricas_em >= self.intervalo_metricas:
+                self._registrar_metricas(agora)
+
+    def falha(self, erro):
+        """Informa um commit que falhou; erros de sobrecarga reduzem o limite."""
+        if not erro_sobrecarga(erro):
+            return
+        with self._trava:
+            agora = time.monotonic()
+            self.commits += 1
+            self.erros += 1
+            self._commits_intervalo += 1
+            self._erros_intervalo += 1
+            if self._ultimo_recuo is not None and agora - self._ultimo_recuo < INTERVALO_RECUO:
+                return
+            anterior = self.vazao
+            self.vazao = max(self.vazao_minima, self.vazao * FATOR_RECUO)
+            self._ultimo_recuo = agora
+            self.recuos += 1
+            # As reservas já feitas seguem o limite antigo; as próximas respeitam o novo
+            self._proxima_vaga = max(self._proxima_vaga, agora)
+            self._novo_intervalo(agora)
+        registro.aviso("vazao_recuo", f"Firestore sobrecarregado ({type(erro).__name__}); limite de escrita reduzido "
+                       f"de {anterior:.0f} para {self.vazao:.0f} escritas/s.",
+                       erro=str(erro), de=round(anterior), para=round(self.vazao))
+
+    def _ajustar_crescimento(self, agora):
+        """Aumenta o limite em 50% se o intervalo terminou sem erros acima do limiar."""
+        if agora - self._intervalo_desde < self.intervalo_crescimento:
+            return
+        commits, erros, limitou = self._commits_intervalo, self._erros_intervalo, self._limitou
+        self._novo_intervalo(agora)
+        # Só cresce se o limite estava segurando as escritas: a importação pode ser mais lenta que ele
+        if not limitou or not commits or erros / commits > LIMIAR_ERROS:
+            return
+        novo = self.vazao * FATOR_CRESCIMENTO
+        if self.vazao_maxima is not None:
+            novo = min(novo, self.vazao_maxima)
+        if novo <= self.vazao:
+            return
+        self.vazao = novo
+        self.aumentos += 1
+        self.pico = max(self.pico, novo)
+        registro.info("vazao_aumento", f"Limite de escrita aumentado para {novo:.0f} escritas/s.", vazao=round(novo))
+
+    def _registrar_metricas(self, agora):
+        duracao = agora - self._metricas_em
+        vazao_real = self._escritas_metricas / duracao if duracao > 0 else 0.0
+        self._metricas_em, self._escritas_metricas = agora, 0
+        registro.info("vazao", f"Escrita: {vazao_real:.0f} escritas/s (limite {self.vazao:.0f}/s), {self.escritas} "
+                      f"gravadas, {self.recuos} recuo(s), {self.espera_total:.1f}s de espera pelo limite.",
+                      **self.metricas(), vazao_real=round(vazao_real, 1))
+
+    def metricas(self):
+        """Métricas acumuladas desde a criação do controlador."""
+        duracao = time.monotonic() - self._inicio
+        return {
+            "limite": round(self.vazao, 1),
+            "pico": round(self.pico, 1),
+            "escritas": self.escritas,
+            "escritas_por_segundo": round(self.escritas / duracao, 1) if duracao > 0 else 0.0,
+            "commits": self.commits,
+            "erros_sobrecarga": self.erros,
+            "recuos": self.recuos,
+            "aumentos": self.aumentos,
+            "espera": round(self.espera_total, 2),
+        }
+
+    def resumir(self):
+        """Registra uma linha de resumo com as métricas e as retorna."""
+        metricas = self.metricas()
+        registro.resumo("resumo_vazao", f"Vazão: {metricas['escritas_por_segundo']:.0f} escritas/s em média, limite "
+                        f"final {metricas['limite']:.0f}/s (pico {metricas['pico']:.0f}/s), {metricas['recuos']} "
+                        f"recuo(s), {metricas['aumentos']} aumento(s), {metricas['espera']:.1f}s de espera pelo limite.",
+                        **metricas)
+        return metricas